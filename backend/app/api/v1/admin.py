@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional
+
+from ...core.database import Database
+from ...core.security import get_current_admin
+from ...core.profiling import profiler
+from ...services.plan_service import PlanService
+from ...schemas.response import ResponseBase
+
+router = APIRouter(prefix="/admin", tags=["管理"])
+
+
+@router.put("/profiling", response_model=ResponseBase[dict])
+async def configure_profiling(
+    enabled: Optional[bool] = None,
+    sample_rate: Optional[float] = Query(default=None, ge=0, le=1),
+    current_user: dict = Depends(get_current_admin)
+):
+    """开启/关闭请求剖析，设置采样率"""
+    profiler.configure(enabled=enabled, sample_rate=sample_rate)
+    return ResponseBase(data={"enabled": profiler.enabled, "sample_rate": profiler.sample_rate})
+
+
+@router.get("/pool-stats", response_model=ResponseBase[dict])
+async def pool_stats(current_user: dict = Depends(get_current_admin)):
+    """数据库连接池状态"""
+    return ResponseBase(data=Database.pool_stats())
+
+
+@router.get("/profiles", response_model=ResponseBase[List[dict]])
+async def list_profiles(current_user: dict = Depends(get_current_admin)):
+    """获取剖析结果列表"""
+    return ResponseBase(data=profiler.list_results())
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, current_user: dict = Depends(get_current_admin)):
+    """获取剖析结果 (collapsed-stack 文本，可直接生成火焰图)"""
+    result = profiler.get_result(profile_id)
+
+    if not result:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="剖析结果不存在")
+
+    return PlainTextResponse(result["collapsed"])
+
+
+@router.post("/profiles/devices/{device_id}", response_model=ResponseBase[bool])
+async def profile_device(
+    device_id: str,
+    messages: int = Query(default=100, ge=1, le=100_000),
+    current_user: dict = Depends(get_current_admin)
+):
+    """剖析设备WebSocket接下来N条消息的处理"""
+    profiler.arm_device(device_id, messages)
+    return ResponseBase(data=True, message=f"将剖析设备 {device_id} 接下来 {messages} 条消息")
+
+
+@router.post("/plans/generate", response_model=ResponseBase[dict], status_code=status.HTTP_202_ACCEPTED)
+async def generate_training_plans(
+    chunk_size: Optional[int] = Query(default=None, ge=100, le=50_000),
+    current_user: dict = Depends(get_current_admin)
+):
+    """在本进程后台为全部用户重新生成训练计划，返回任务 ID (大规模数据请用 python -m app.services.plan_service)"""
+    job = await PlanService.start_generate(chunk_size=chunk_size)
+    return ResponseBase(data=job, message="训练计划生成已开始")
+
+
+@router.get("/plans/generate/{job_id}", response_model=ResponseBase[dict])
+async def get_plan_generation_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_admin)
+):
+    """查询训练计划生成任务的状态与结果"""
+    job = await PlanService.get_job(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务不存在或已过期")
+
+    return ResponseBase(data=job)
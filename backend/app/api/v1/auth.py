@@ -35,7 +35,11 @@ async def login(request: LoginRequest):
             detail="用户名或密码错误"
         )
 
-    token = create_access_token(data={"sub": str(user.id), "username": user.username})
+    token = create_access_token(data={
+        "sub": str(user.id),
+        "username": user.username,
+        "is_admin": user.is_admin
+    })
 
     return ResponseBase(
         data=TokenResponse(
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
 
-from ...core.security import get_current_user
+from ...core.security import get_current_user, get_current_admin
 from ...services.device_service import DeviceService
-from ...models.device import Device, DeviceConfig, DeviceHeartbeat, DeviceStatus
+from ...services.config_push_service import ConfigPushService
+from ...services.history_service import HistoryService
+from ...models.device import Device, DeviceConfig, DeviceHeartbeat, DeviceStatus, BulkConfigRequest
 from ...schemas.response import ResponseBase
+from ...core.frame_cache import frame_cache
+from ...core.telemetry import telemetry, METRICS
+from ...core.config import get_settings
+from ...core.data_version import conditional_get
+from ...core.responses import TrustedRoute, trusted_output
+from ...core.admission import admit, heartbeat_limiter, HIGH
 
-router = APIRouter(prefix="/devices", tags=["设备"])
+router = APIRouter(prefix="/devices", tags=["设备"], route_class=TrustedRoute)
+settings = get_settings()
 
 
 @router.post("/register", response_model=ResponseBase[Device])
@@ -26,11 +35,13 @@ async def register_device(
 @router.post("/heartbeat")
 async def device_heartbeat(heartbeat: DeviceHeartbeat):
     """设备心跳上报"""
-    await DeviceService.heartbeat(heartbeat)
+    async with admit("devices:heartbeat", heartbeat_limiter, heartbeat.device_id, HIGH):
+        await DeviceService.heartbeat(heartbeat)
     return {"message": "心跳已接收"}
 
 
-@router.get("/", response_model=ResponseBase[List[Device]])
+@router.get("/", response_model=ResponseBase[List[Device]], dependencies=[Depends(conditional_get)])
+@trusted_output
 async def get_my_devices(current_user: dict = Depends(get_current_user)):
     """获取我的设备列表"""
     devices = await DeviceService.get_user_devices(current_user["sub"])
@@ -38,6 +49,7 @@ async def get_my_devices(current_user: dict = Depends(get_current_user)):
 
 
 @router.get("/all", response_model=ResponseBase[List[Device]])
+@trusted_output
 async def get_all_devices(
     skip: int = 0,
     limit: int = 50,
@@ -48,6 +60,36 @@ async def get_all_devices(
     return ResponseBase(data=devices)
 
 
+@router.get("/telemetry/summary", response_model=ResponseBase[dict])
+async def get_telemetry_summary(
+    minutes: float = Query(default=60, gt=0, le=settings.TELEMETRY_RETENTION_MINUTES),
+    device_id: Optional[str] = None,
+    metrics: Optional[str] = None,
+    quantiles: str = "0.5,0.95,0.99",
+    current_user: dict = Depends(get_current_user)
+):
+    """设备心跳指标分位数 (全体设备或单台设备，最近 minutes 分钟)
+
+    metrics / quantiles 为逗号分隔，如 metrics=temperature&quantiles=0.95。
+    分位数相对误差约 TELEMETRY_RELATIVE_ACCURACY。单台设备只能查询自己的设备。
+    """
+    if device_id is not None and not await DeviceService.is_owner(device_id, current_user["sub"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
+    names = metrics.split(",") if metrics else list(METRICS)
+    try:
+        qs = [float(q) for q in quantiles.split(",")]
+    except ValueError:
+        qs = []
+    if not qs or any(not 0 <= q <= 1 for q in qs) or any(n not in METRICS for n in names):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"quantiles 取值 0-1，metrics 仅支持 {', '.join(METRICS)}"
+        )
+
+    summary = await telemetry.summary(names, minutes, qs, device_id)
+    return ResponseBase(data={"minutes": minutes, "device_id": device_id, "metrics": summary})
+
+
 @router.get("/{device_id}", response_model=ResponseBase[Device])
 async def get_device(
     device_id: str,
@@ -62,21 +104,85 @@ async def get_device(
     return ResponseBase(data=device)
 
 
+@router.get("/{device_id}/snapshot", response_class=Response)
+async def get_device_snapshot(
+    device_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """获取设备最新画面 (直接返回缓存的JPEG，不重新编码)"""
+    if not await DeviceService.is_owner(device_id, current_user["sub"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
+    jpeg = frame_cache.latest_jpeg(device_id)
+
+    if jpeg is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="暂无画面")
+
+    return Response(content=jpeg, media_type="image/jpeg", headers={"Cache-Control": "no-store"})
+
+
+@router.get("/{device_id}/heartbeat/history", response_model=ResponseBase[dict])
+async def get_heartbeat_history(
+    device_id: str,
+    hours: float = Query(default=24, gt=0, le=24 * 366),
+    resolution: Optional[int] = Query(default=None, ge=0),
+    agg: str = "mean",
+    current_user: dict = Depends(get_current_user)
+):
+    """获取设备心跳指标历史 (resolution 为秒，不指定时按时间跨度自动选择)"""
+    if not await DeviceService.is_owner(device_id, current_user["sub"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
+    try:
+        history = await HistoryService.get_heartbeat_history(device_id, hours, resolution, agg)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return ResponseBase(data=history)
+
+
 @router.put("/{device_id}/config", response_model=ResponseBase[bool])
 async def update_device_config(
     device_id: str,
     config: DeviceConfig,
     current_user: dict = Depends(get_current_user)
 ):
-    """更新设备配置"""
-    success = await DeviceService.update_config(device_id, config)
+    """更新设备配置 (连接在本 worker 的设备立即下发，其余设备下次连接时补发)"""
+    if not await DeviceService.is_owner(device_id, current_user["sub"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
+    version = await DeviceService.update_config(device_id, config)
 
-    if not success:
+    if version is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
 
+    ConfigPushService.spawn(ConfigPushService.push(device_id, config, version))
     return ResponseBase(data=True, message="配置已更新")
 
 
+@router.post("/config/bulk", response_model=ResponseBase[dict], status_code=status.HTTP_202_ACCEPTED)
+async def bulk_update_device_config(
+    request: BulkConfigRequest,
+    current_user: dict = Depends(get_current_admin)
+):
+    """批量更新并下发设备配置 (后台执行)，返回任务 ID"""
+    job = await ConfigPushService.start_bulk(request.device_ids, request.config)
+    return ResponseBase(data=job, message="批量下发已开始")
+
+
+@router.get("/config/bulk/{job_id}", response_model=ResponseBase[dict])
+async def get_bulk_config_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_admin)
+):
+    """查询批量下发进度及每台设备的下发结果
+
+    status 为 offline 表示设备未连接到结果中 worker 所指的进程，下次连接时补发。
+    """
+    job = await ConfigPushService.get_bulk(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务不存在或已过期")
+
+    return ResponseBase(data=job)
+
+
 @router.put("/{device_id}/status", response_model=ResponseBase[bool])
 async def update_device_status(
     device_id: str,
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+
+from ...core.security import get_current_user
+from ...services.leaderboard_service import LeaderboardService, METRICS
+from ...schemas.response import ResponseBase
+
+router = APIRouter(prefix="/leaderboards", tags=["排行榜"])
+
+# 总榜不传 week；本周为 current，其他周为 ISO 周 (如 2026-W42)
+WEEK_PATTERN = r"^(current|\d{4}-W\d{2})$"
+
+
+def _board(metric: str, mode: Optional[str], week: Optional[str]):
+    if metric not in METRICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支持的指标，可选: {', '.join(METRICS)}"
+        )
+    return LeaderboardService.board(metric, mode, week)
+
+
+@router.get("/{metric}", response_model=ResponseBase[dict])
+async def get_leaderboard(
+    metric: str,
+    mode: Optional[str] = Query(None, max_length=50),
+    week: Optional[str] = Query(None, pattern=WEEK_PATTERN),
+    limit: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """排行榜前 limit 名及本人名次"""
+    board = _board(metric, mode, week)
+    leaderboard = await LeaderboardService.top(board, limit)
+    me = (await LeaderboardService.around(board, current_user["sub"], radius=0))["entries"]
+    leaderboard["me"] = me[0] if me else None
+    return ResponseBase(data=leaderboard)
+
+
+@router.get("/{metric}/around-me", response_model=ResponseBase[dict])
+async def get_leaderboard_around_me(
+    metric: str,
+    mode: Optional[str] = Query(None, max_length=50),
+    week: Optional[str] = Query(None, pattern=WEEK_PATTERN),
+    radius: int = Query(5, ge=0, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    """本人名次及前后各 radius 名"""
+    board = _board(metric, mode, week)
+    return ResponseBase(data=await LeaderboardService.around(board, current_user["sub"], radius))
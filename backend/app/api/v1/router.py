@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from . import auth, users, training, devices, dashboard
+from . import auth, users, training, devices, dashboard, admin, routing, leaderboards
 
 api_router = APIRouter()
 
@@ -9,3 +9,6 @@ api_router.include_router(users.router)
 api_router.include_router(training.router)
 api_router.include_router(devices.router)
 api_router.include_router(dashboard.router)
+api_router.include_router(leaderboards.router)
+api_router.include_router(admin.router)
+api_router.include_router(routing.router)
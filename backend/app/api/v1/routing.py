@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from ...core.routing import routing
+from ...core.security import get_current_user
+from ...schemas.response import ResponseBase
+from ...services.device_service import DeviceService
+from .websocket import device_route
+
+router = APIRouter(prefix="/routing", tags=["路由"])
+
+
+@router.get("/hint", response_model=ResponseBase[dict])
+async def get_routing_hint(
+    device_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """获取 WebSocket 连接的路由提示 (只能查询本人及本人设备)
+
+    返回所属 worker 以及带 route 参数的连接地址; 设备与其所属用户的观看端
+    使用相同的路由键，从而落在同一个 worker 上。
+    """
+    if device_id:
+        if not await DeviceService.is_owner(device_id, current_user["sub"]):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
+        route = await device_route(device_id)
+        path = f"/ws/device/{device_id}"
+    else:
+        if user_id and user_id != current_user["sub"]:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="只能查询本人的连接地址")
+        route = current_user["sub"]
+        path = f"/ws/user/{route}"
+
+    return ResponseBase(data={
+        "worker": routing.owner(route),
+        "url": routing.url_for(route, path)
+    })
@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
 from ...core.security import get_current_user
+from ...core.admission import admit, pose_limiter, user_metrics_limiter, CRITICAL, HIGH, NORMAL
+from ...core.compression import set_compression_level
+from ...core.data_version import conditional_get
+from ...core.responses import TrustedRoute, trusted_output
+from ...core.recorder import recorder, session_dir, recording_start, replay, KIND_JPEG, KIND_POSE, KIND_CONTENT_TYPES
 from ...services.training_service import TrainingService
-from ...models.training import TrainingSession, TrainingMetrics, PoseData, AIAnalysis
+from ...services.live_session_service import LiveSessionService
+from ...services.history_service import HistoryService
+from ...services.device_service import DeviceService
+from ...services.plan_service import PlanService
+from ...models.training import TrainingSession, TrainingMetrics, PoseData, AIAnalysis, TrainingPlan
 from ...schemas.response import ResponseBase
 
-router = APIRouter(prefix="/training", tags=["训练"])
+router = APIRouter(prefix="/training", tags=["训练"], route_class=TrustedRoute)
 
 
 class StartSessionRequest:
@@ -22,32 +33,103 @@ async def start_training_session(
     current_user: dict = Depends(get_current_user)
 ):
     """开始训练会话"""
-    session = await TrainingService.start_session(
-        user_id=current_user["sub"],
-        device_id=device_id,
-        mode=mode
-    )
+    async with admit("training:start", None, None, CRITICAL):
+        session = await TrainingService.start_session(
+            user_id=current_user["sub"],
+            device_id=device_id,
+            mode=mode
+        )
     return ResponseBase(data=session, message="训练已开始")
 
 
 @router.post("/sessions/{session_id}/end", response_model=ResponseBase[TrainingSession])
 async def end_training_session(
     session_id: str,
-    metrics: TrainingMetrics,
+    metrics: Optional[TrainingMetrics] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """结束训练会话"""
+    """结束训练会话 (指标由服务端实时累计，客户端提交的指标仅作后备)"""
     try:
-        session = await TrainingService.end_session(session_id, metrics)
+        async with admit("training:end", None, None, CRITICAL):
+            session = await TrainingService.end_session(session_id, metrics)
         return ResponseBase(data=session, message="训练已结束")
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
+@router.get("/sessions/{session_id}/live", response_model=ResponseBase[dict])
+async def get_live_session(
+    session_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """获取进行中会话的实时累计指标"""
+    live = LiveSessionService.get(session_id)
+
+    if not live or live.user_id != current_user["sub"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="会话不在进行中")
+
+    return ResponseBase(data=live.snapshot())
+
+
+REPLAY_KINDS = {
+    "all": (KIND_JPEG, KIND_POSE),
+    "frames": (KIND_JPEG,),
+    "pose": (KIND_POSE,),
+}
+
+
+def _multipart(records, boundary: str):
+    for timestamp, kind, payload in records:
+        yield (
+            f"--{boundary}\r\n"
+            f"Content-Type: {KIND_CONTENT_TYPES[kind]}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"X-Timestamp: {timestamp}\r\n\r\n"
+        ).encode() + payload + b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+@router.get("/sessions/{session_id}/replay")
+async def replay_training_session(
+    session_id: str,
+    request: Request,
+    start: int = 0,
+    end: Optional[int] = None,
+    kind: str = "all",
+    current_user: dict = Depends(get_current_user)
+):
+    """回放会话录像
+
+    start / end 为相对录制开始的毫秒数; 以 multipart/mixed 流式返回，
+    每部分为一帧 JPEG 或一条姿态 JSON，X-Timestamp 为记录时间 (毫秒)。
+    """
+    kinds = REPLAY_KINDS.get(kind)
+    if kinds is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="kind 仅支持 all / frames / pose")
+
+    session = await TrainingService.get_user_session(current_user["sub"], session_id)
+    directory = session_dir(recorder.root, session_id) if session else None
+    origin = recording_start(directory) if directory else None
+    if origin is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="该会话没有录像")
+
+    records = replay(directory, origin + start, origin + end if end is not None else None, kinds)
+    # JPEG 帧几乎压缩不动 (benchmarks/http_compression.py)，只压缩纯姿态回放
+    set_compression_level(request, 1 if kind == "pose" else 0)
+    boundary = uuid.uuid4().hex
+    # 同步生成器由 Starlette 放到线程池中迭代，文件读取不占用事件循环
+    return StreamingResponse(
+        _multipart(records, boundary),
+        media_type=f"multipart/mixed; boundary={boundary}",
+        headers={"Cache-Control": "no-store"}
+    )
+
+
 @router.post("/pose", status_code=status.HTTP_201_CREATED)
 async def upload_pose_data(pose_data: PoseData):
     """上传姿态数据"""
-    await TrainingService.save_pose_data(pose_data)
+    async with admit("training:pose", pose_limiter, pose_data.device_id, NORMAL):
+        await TrainingService.save_pose_data(pose_data)
     return {"message": "姿态数据已保存"}
 
 
@@ -58,15 +140,17 @@ async def upload_realtime_metrics(
     current_user: dict = Depends(get_current_user)
 ):
     """上传实时指标"""
-    await TrainingService.save_realtime_metrics(
-        user_id=current_user["sub"],
-        session_id=session_id,
-        metrics=metrics
-    )
+    async with admit("training:metrics", user_metrics_limiter, current_user["sub"], HIGH):
+        await TrainingService.save_realtime_metrics(
+            user_id=current_user["sub"],
+            session_id=session_id,
+            metrics=metrics
+        )
     return {"message": "指标已保存"}
 
 
-@router.get("/sessions", response_model=ResponseBase[List[TrainingSession]])
+@router.get("/sessions", response_model=ResponseBase[List[TrainingSession]], dependencies=[Depends(conditional_get)])
+@trusted_output
 async def get_training_sessions(
     days: int = 30,
     limit: int = 50,
@@ -81,7 +165,7 @@ async def get_training_sessions(
     return ResponseBase(data=sessions)
 
 
-@router.get("/stats", response_model=ResponseBase[dict])
+@router.get("/stats", response_model=ResponseBase[dict], dependencies=[Depends(conditional_get)])
 async def get_training_stats(
     days: int = 7,
     current_user: dict = Depends(get_current_user)
@@ -94,7 +178,7 @@ async def get_training_stats(
     return ResponseBase(data=stats)
 
 
-@router.get("/trends", response_model=ResponseBase[List[dict]])
+@router.get("/trends", response_model=ResponseBase[List[dict]], dependencies=[Depends(conditional_get)])
 async def get_training_trends(
     days: int = 30,
     current_user: dict = Depends(get_current_user)
@@ -107,6 +191,43 @@ async def get_training_trends(
     return ResponseBase(data=trends)
 
 
+@router.get("/pose/history", response_model=ResponseBase[dict])
+async def get_pose_history(
+    device_id: str,
+    hours: float = Query(default=1, gt=0, le=24 * 366),
+    resolution: Optional[int] = Query(default=None, ge=0),
+    fields: Optional[str] = None,
+    agg: str = "mean",
+    current_user: dict = Depends(get_current_user)
+):
+    """获取设备姿态历史
+
+    resolution 为秒，不指定时按时间跨度自动选择; fields 为逗号分隔的字段名
+    (如 kp0_x,kp0_y)。按分辨率从原始数据或降采样数据中查询。
+    """
+    if not await DeviceService.is_owner(device_id, current_user["sub"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="设备不存在")
+    try:
+        history = await HistoryService.get_pose_history(
+            device_id, hours, resolution, fields.split(",") if fields else None, agg
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return ResponseBase(data=history)
+
+
+@router.get("/sessions/{session_id}/pose-summary", response_model=ResponseBase[dict])
+async def get_session_pose_summary(
+    session_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """获取会话姿态汇总 (各关键点的 mean / min / max，会话结束后生成)"""
+    session = await TrainingService.get_user_session(current_user["sub"], session_id)
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="训练会话不存在")
+    return ResponseBase(data=await HistoryService.get_session_pose_summary(session))
+
+
 @router.get("/analysis/{session_id}", response_model=ResponseBase[AIAnalysis])
 async def get_ai_analysis(
     session_id: str,
@@ -118,3 +239,12 @@ async def get_ai_analysis(
         session_id=session_id
     )
     return ResponseBase(data=analysis)
+
+
+@router.get("/plan", response_model=ResponseBase[TrainingPlan])
+async def get_training_plan(current_user: dict = Depends(get_current_user)):
+    """获取个性化训练计划 (由批量任务预先生成)"""
+    plan = await PlanService.get_user_plan(current_user["sub"])
+    if plan is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="训练计划尚未生成")
+    return ResponseBase(data=plan)
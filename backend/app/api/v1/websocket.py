@@ -1,10 +1,105 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from typing import Dict, Optional, Set
 import json
 import asyncio
 
+from ...core.profiling import profiler
+from ...core.frame_cache import frame_cache
+from ...core.recorder import recorder
+from ...core.ws_compression import COMPRESSED_TYPES, MessageDeflater, negotiate
+from ...core.pose_codec import MAX_STREAMS, PoseEncoder, pack_batch
+from ...core.config import get_settings
+from ...core.routing import routing, RECONNECT_CLOSE_CODE
+from ...core.admission import DEVICE_MESSAGE_POLICY, shedder
+from ...services.live_session_service import LiveSessionService
+from ...services.config_push_service import ConfigPushService
+from ...services.device_service import DeviceService
+from ...core.metrics import (
+    WS_MESSAGES_RECEIVED, WS_BYTES_RECEIVED, WS_BYTES_SENT, WS_ACTIVE_CONNECTIONS, WS_ROUTING_REDIRECTS
+)
+
+settings = get_settings()
+
 router = APIRouter(tags=["WebSocket"])
 
+USER_ENDPOINT = "websocket_user"
+DEVICE_ENDPOINT = "websocket_device"
+USER_MESSAGE_TYPES = ("ping", "subscribe_device")
+DEVICE_MESSAGE_TYPES = ("pose_data", "metrics", "video_frame", "heartbeat", "config_ack")
+# 合并发送模式下按设备只保留最新一条的消息类型
+COALESCED_TYPES = frozenset(("pose_update", "metrics_update"))
+
+
+def _message_counters(endpoint: str, types) -> Dict[str, object]:
+    """预先取出按消息类型的计数器，热路径只做一次字典查找"""
+    counters = {t: WS_MESSAGES_RECEIVED.labels(endpoint, t) for t in types}
+    counters[None] = WS_MESSAGES_RECEIVED.labels(endpoint, "other")
+    return counters
+
+
+_user_msg_counters = _message_counters(USER_ENDPOINT, USER_MESSAGE_TYPES)
+_device_msg_counters = _message_counters(DEVICE_ENDPOINT, DEVICE_MESSAGE_TYPES)
+_user_bytes_in = WS_BYTES_RECEIVED.labels(USER_ENDPOINT)
+_device_bytes_in = WS_BYTES_RECEIVED.labels(DEVICE_ENDPOINT)
+_user_bytes_out = WS_BYTES_SENT.labels(USER_ENDPOINT)
+_device_bytes_out = WS_BYTES_SENT.labels(DEVICE_ENDPOINT)
+
+
+def encode_message(message: dict) -> str:
+    """编码消息 (ensure_ascii 保证字符数即字节数)"""
+    return json.dumps(message, separators=(",", ":"))
+
+
+async def receive_message(websocket: WebSocket, counters: Dict[str, object], bytes_in) -> dict:
+    """接收并解析一条消息，同时计数"""
+    text = await websocket.receive_text()
+    bytes_in.inc(len(text))
+    data = json.loads(text)
+    msg_type = data.get("type")
+    counter = counters.get(msg_type) if msg_type.__class__ is str else None
+    (counter or counters[None]).inc()
+    return data
+
+
+async def send_message(websocket: WebSocket, message: dict, bytes_out):
+    text = encode_message(message)
+    await websocket.send_text(text)
+    bytes_out.inc(len(text))
+
+
+class ViewerCoalescer:
+    """观看端合并发送状态: 每个 tick 最多发送一次，包含各设备的最新状态"""
+
+    __slots__ = ("websocket", "interval", "pending", "dirty", "task", "last_flush")
+
+    def __init__(self, websocket: WebSocket, hz: float):
+        self.websocket = websocket
+        self.interval = 1 / hz
+        # (device_id, 消息类型) -> (已编码消息, 姿态数据)
+        self.pending: Dict[tuple, tuple] = {}
+        self.dirty = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.last_flush = 0.0
+
+    def put(self, key: tuple, text: str, pose=None):
+        self.pending[key] = (text, pose)
+        self.dirty.set()
+
+
+def coalesce_rate(websocket: WebSocket) -> float:
+    """读取连接参数 coalesce (Hz)，未开启返回 0"""
+    try:
+        hz = float(websocket.query_params.get("coalesce", 0))
+    except ValueError:
+        return 0
+    return min(hz, settings.WS_COALESCE_MAX_HZ) if hz >= 1 else 0
+
+
+async def device_route(device_id: str) -> str:
+    """设备的路由键: 所属用户 (其观看端按 user_id 路由)，未登记时为 device_id"""
+    device = await DeviceService.get_device(device_id)
+    return device.owner_id if device is not None and device.owner_id else device_id
+
 
 class ConnectionManager:
     """WebSocket连接管理"""
@@ -14,18 +109,66 @@ class ConnectionManager:
         self.user_connections: Dict[str, Set[WebSocket]] = {}
         # 设备连接: {device_id: websocket}
         self.device_connections: Dict[str, WebSocket] = {}
+        # 协商了应用层压缩的观看端连接
+        self.deflaters: Dict[WebSocket, MessageDeflater] = {}
+        # 选择了紧凑姿态编码的观看端连接: {websocket: {device_id: encoder}}
+        self.pose_encoders: Dict[WebSocket, Dict[str, PoseEncoder]] = {}
+        # 开启了合并发送的观看端连接
+        self.coalescers: Dict[WebSocket, ViewerCoalescer] = {}
 
-    async def connect_user(self, websocket: WebSocket, user_id: str):
-        await websocket.accept()
+        WS_ACTIVE_CONNECTIONS.labels("user").set_function(self.count_user_connections)
+        WS_ACTIVE_CONNECTIONS.labels("device").set_function(lambda: len(self.device_connections))
+
+    def count_user_connections(self) -> int:
+        return sum(len(sockets) for sockets in self.user_connections.values())
+
+    async def connect_user(self, websocket: WebSocket, user_id: str) -> bool:
+        subprotocol = negotiate(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        if routing.enabled and not await self.check_route(websocket, "user", user_id, f"/ws/user/{user_id}"):
+            return False
+        if subprotocol:
+            self.deflaters[websocket] = MessageDeflater()
+        hz = coalesce_rate(websocket)
+        if hz:
+            coalescer = self.coalescers[websocket] = ViewerCoalescer(websocket, hz)
+            coalescer.task = asyncio.create_task(self._coalesce_loop(coalescer))
         if user_id not in self.user_connections:
             self.user_connections[user_id] = set()
         self.user_connections[user_id].add(websocket)
+        return True
 
-    async def connect_device(self, websocket: WebSocket, device_id: str):
+    async def connect_device(self, websocket: WebSocket, device_id: str) -> bool:
         await websocket.accept()
+        if routing.enabled:
+            route = websocket.query_params.get("route") or await device_route(device_id)
+            if not await self.check_route(websocket, "device", route, f"/ws/device/{device_id}"):
+                return False
         self.device_connections[device_id] = websocket
+        return True
+
+    async def check_route(self, websocket: WebSocket, kind: str, route: str, path: str) -> bool:
+        """连接落在路由键所属的 worker 上时返回 True，否则发送重连提示并关闭连接"""
+        owner = routing.owner(route)
+        bytes_out = _user_bytes_out if kind == "user" else _device_bytes_out
+        if owner == routing.worker_id:
+            await send_message(websocket, {"type": "routed", "worker": owner, "route": route}, bytes_out)
+            return True
+        WS_ROUTING_REDIRECTS.labels(kind).inc()
+        await send_message(websocket, {
+            "type": "reconnect",
+            "worker": owner,
+            "url": routing.url_for(route, path)
+        }, bytes_out)
+        await websocket.close(code=RECONNECT_CLOSE_CODE)
+        return False
 
     def disconnect_user(self, websocket: WebSocket, user_id: str):
+        self.deflaters.pop(websocket, None)
+        self.pose_encoders.pop(websocket, None)
+        coalescer = self.coalescers.pop(websocket, None)
+        if coalescer is not None:
+            coalescer.task.cancel()
         if user_id in self.user_connections:
             self.user_connections[user_id].discard(websocket)
             if not self.user_connections[user_id]:
@@ -37,19 +180,147 @@ class ConnectionManager:
 
     async def send_to_user(self, user_id: str, message: dict):
         if user_id in self.user_connections:
-            for ws in self.user_connections[user_id]:
+            msg_type = message.get("type")
+            await self.send_text_to_user(
+                user_id, encode_message(message), msg_type in COMPRESSED_TYPES,
+                (message.get("device_id"), msg_type) if msg_type in COALESCED_TYPES else None
+            )
+
+    async def send_text_to_user(
+        self, user_id: str, text: str, compressible: bool = False, coalesce_key: Optional[tuple] = None
+    ):
+        """发送已编码的消息 (同一消息只编码一次，再分发给该用户的所有连接)
+
+        compressible 为 True 时，对协商了压缩的连接发送压缩后的二进制帧;
+        给出 coalesce_key 时，开启合并发送的连接只暂存最新一条，由 tick 统一发送。
+        """
+        sockets = self.user_connections.get(user_id)
+        if sockets:
+            coalescers = self.coalescers if coalesce_key is not None else None
+            for ws in list(sockets):
+                coalescer = coalescers.get(ws) if coalescers else None
+                if coalescer is not None:
+                    coalescer.put(coalesce_key, text)
+                    continue
                 try:
-                    await ws.send_json(message)
+                    await self.send_text_to_socket(ws, text, compressible)
                 except Exception:
                     pass
 
-    async def send_to_device(self, device_id: str, message: dict):
-        if device_id in self.device_connections:
+    async def send_text_to_socket(self, ws: WebSocket, text: str, compressible: bool = False):
+        deflater = self.deflaters.get(ws) if compressible else None
+        if deflater is None:
+            await ws.send_text(text)
+            _user_bytes_out.inc(len(text))
+        else:
+            # 同一连接的压缩与发送串行执行，帧的送达顺序与压缩上下文一致
+            async with deflater.lock:
+                payload = deflater.compress(text)
+                try:
+                    await ws.send_bytes(payload)
+                except Exception:
+                    # 该帧未送达，观看端之后的帧都无法解压: 断开连接，由观看端重连后重建上下文
+                    self.deflaters.pop(ws, None)
+                    try:
+                        await ws.close(code=status.WS_1011_INTERNAL_ERROR)
+                    except Exception:
+                        pass
+                    raise
+                _user_bytes_out.inc(len(payload))
+
+    def select_pose_encoding(self, websocket: WebSocket, device_id: str) -> Optional[int]:
+        """为该连接上的设备启用紧凑姿态编码，返回分配的 stream 编号"""
+        encoders = self.pose_encoders.setdefault(websocket, {})
+        encoder = encoders.get(device_id)
+        if encoder is not None:
+            stream = encoder.stream
+        elif len(encoders) < MAX_STREAMS:
+            stream = len(encoders)
+        else:
+            return None
+        # 重新订阅时从关键帧开始
+        encoders[device_id] = PoseEncoder(stream)
+        return stream
+
+    def pose_encoder(self, websocket: WebSocket, device_id: str) -> Optional[PoseEncoder]:
+        encoders = self.pose_encoders.get(websocket)
+        return encoders.get(device_id) if encoders else None
+
+    async def send_pose_to_user(self, user_id: str, device_id: str, text: str, pose):
+        """转发姿态: 选择了紧凑编码的连接按连接各自编码，其余连接发送 JSON"""
+        sockets = self.user_connections.get(user_id)
+        if not sockets:
+            return
+        if not self.pose_encoders and not self.coalescers:
+            await self.send_text_to_user(user_id, text, compressible=True)
+            return
+        for ws in list(sockets):
+            coalescer = self.coalescers.get(ws)
+            if coalescer is not None:
+                # 编码推迟到发送时，增量始终相对观看端实际收到的上一帧
+                coalescer.put((device_id, "pose_update"), text, pose)
+                continue
             try:
-                await self.device_connections[device_id].send_json(message)
+                await self.send_pose_to_socket(ws, device_id, text, pose)
             except Exception:
                 pass
 
+    async def send_pose_to_socket(self, ws: WebSocket, device_id: str, text: str, pose):
+        encoder = self.pose_encoder(ws, device_id)
+        payload = encoder.encode(pose) if encoder is not None else None
+        if payload is None:
+            await self.send_text_to_socket(ws, text, compressible=True)
+        else:
+            await ws.send_bytes(payload)
+            _user_bytes_out.inc(len(payload))
+
+    async def _coalesce_loop(self, coalescer: ViewerCoalescer):
+        """有待发送数据时等到下一个 tick 发送，延迟不超过一个 tick"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await coalescer.dirty.wait()
+            delay = coalescer.last_flush + coalescer.interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            coalescer.dirty.clear()
+            coalescer.last_flush = loop.time()
+            try:
+                await self._flush_coalesced(coalescer)
+            except Exception:
+                pass
+
+    async def _flush_coalesced(self, coalescer: ViewerCoalescer):
+        pending, coalescer.pending = coalescer.pending, {}
+        ws = coalescer.websocket
+        texts = []
+        encoded = []
+        for (device_id, msg_type), (text, pose) in pending.items():
+            encoder = self.pose_encoder(ws, device_id) if msg_type == "pose_update" else None
+            payload = encoder.encode(pose) if encoder is not None else None
+            if payload is None:
+                texts.append(text)
+            else:
+                encoded.append(payload)
+        if texts:
+            # 各条消息已是 JSON 文本，直接拼接，无需重新编码
+            batch = '{"type":"batch","updates":[' + ",".join(texts) + "]}"
+            await self.send_text_to_socket(ws, batch, compressible=True)
+        if encoded:
+            payload = pack_batch(encoded)
+            await ws.send_bytes(payload)
+            _user_bytes_out.inc(len(payload))
+
+    async def send_to_device(self, device_id: str, message: dict) -> bool:
+        """发送消息给设备，设备不在线或发送失败时返回 False"""
+        websocket = self.device_connections.get(device_id)
+        if websocket is None:
+            return False
+        try:
+            await send_message(websocket, message, _device_bytes_out)
+            return True
+        except Exception:
+            return False
+
     async def broadcast_to_users(self, message: dict):
         for user_id in self.user_connections:
             await self.send_to_user(user_id, message)
@@ -61,78 +332,153 @@ manager = ConnectionManager()
 @router.websocket("/ws/user/{user_id}")
 async def websocket_user(websocket: WebSocket, user_id: str):
     """用户WebSocket连接 - 接收实时数据"""
-    await manager.connect_user(websocket, user_id)
+    if not await manager.connect_user(websocket, user_id):
+        return
 
     try:
         while True:
             # 接收用户命令
-            data = await websocket.receive_json()
+            data = await receive_message(websocket, _user_msg_counters, _user_bytes_in)
             msg_type = data.get("type")
 
             if msg_type == "ping":
-                await websocket.send_json({"type": "pong"})
+                await send_message(websocket, {"type": "pong"}, _user_bytes_out)
 
             elif msg_type == "subscribe_device":
                 # 订阅设备数据流
                 device_id = data.get("device_id")
-                await websocket.send_json({
-                    "type": "subscribed",
-                    "device_id": device_id
-                })
+                reply = {"type": "subscribed", "device_id": device_id}
+                # 可选紧凑姿态编码 (见 core/pose_codec.py)
+                if data.get("pose_encoding") == "quantized" and isinstance(device_id, str):
+                    stream = manager.select_pose_encoding(websocket, device_id)
+                    if stream is not None:
+                        reply["pose_encoding"] = "quantized"
+                        reply["stream"] = stream
+                await send_message(websocket, reply, _user_bytes_out)
+                if isinstance(device_id, str) and await DeviceService.is_owner(device_id, user_id):
+                    await send_cached_state(websocket, device_id)
 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # 任何异常退出 (非法 JSON、发送失败等) 都要注销连接并停止合并发送任务
         manager.disconnect_user(websocket, user_id)
 
 
+async def send_cached_state(websocket: WebSocket, device_id: str):
+    """新订阅者立即收到设备最新的视频帧和姿态 (缓存的已编码消息，调用方需先确认设备归属)"""
+    frame = frame_cache.latest_frame(device_id)
+    if frame is not None:
+        await manager.send_text_to_socket(websocket, frame.message)
+    pose = frame_cache.latest_pose(device_id)
+    if pose is not None:
+        await manager.send_pose_to_socket(websocket, device_id, pose.message, json.loads(pose.message)["data"])
+
+
+async def handle_device_message(websocket: WebSocket, device_id: str, data: dict):
+    """处理一条设备消息"""
+    msg_type = data.get("type")
+
+    if msg_type == "pose_data":
+        # 转发姿态数据给订阅用户
+        text = encode_message({
+            "type": "pose_update",
+            "device_id": device_id,
+            "data": data.get("data")
+        })
+        frame_cache.put_pose(device_id, text)
+        if recorder.enabled:
+            session_id = LiveSessionService.session_for_device(device_id)
+            if session_id:
+                recorder.record_pose(session_id, data.get("data"))
+        user_id = data.get("user_id")
+        if user_id:
+            await manager.send_pose_to_user(user_id, device_id, text, data.get("data"))
+
+    elif msg_type == "metrics":
+        # 合并到会话实时累计，并转发实时指标
+        LiveSessionService.ingest_device(device_id, data.get("data"))
+        user_id = data.get("user_id")
+        if user_id:
+            await manager.send_to_user(user_id, {
+                "type": "metrics_update",
+                "device_id": device_id,
+                "data": data.get("data")
+            })
+
+    elif msg_type == "video_frame":
+        # 转发视频帧（Base64编码的JPEG图片 + 姿态数据 + 指标）
+        timestamp = data.get("timestamp")
+        text = encode_message({
+            "type": "video_frame",
+            "device_id": device_id,
+            "frame": data.get("frame"),
+            "pose": data.get("pose"),
+            "metrics": data.get("metrics"),
+            "timestamp": timestamp
+        })
+        frame_cache.put_frame(device_id, text, timestamp)
+        if recorder.enabled:
+            session_id = LiveSessionService.session_for_device(device_id)
+            if session_id:
+                recorder.record_frame(session_id, data.get("frame"), data.get("pose"))
+        user_id = data.get("user_id")
+        if user_id:
+            await manager.send_text_to_user(user_id, text)
+
+    elif msg_type == "heartbeat":
+        # 心跳响应
+        await send_message(websocket, {"type": "heartbeat_ack"}, _device_bytes_out)
+
+    elif msg_type == "config_ack":
+        # 设备确认已应用配置
+        await ConfigPushService.handle_ack(device_id, data)
+
+
+async def _profile_device_message(websocket: WebSocket, device_id: str, data: dict):
+    """剖析模式下处理设备消息 (仅对被剖析的设备采样)"""
+    profile = profiler.device_profile(device_id)
+    if profile is None:
+        await handle_device_message(websocket, device_id, data)
+        return
+
+    profile.sampler.active = True
+    try:
+        await handle_device_message(websocket, device_id, data)
+    finally:
+        profiler.finish_device_message(device_id, profile)
+
+
 @router.websocket("/ws/device/{device_id}")
 async def websocket_device(websocket: WebSocket, device_id: str):
     """设备WebSocket连接 - 上报实时数据"""
-    await manager.connect_device(websocket, device_id)
+    if not await manager.connect_device(websocket, device_id):
+        return
+    # 补发离线期间未确认的配置
+    ConfigPushService.spawn(ConfigPushService.on_device_connected(device_id))
 
     try:
         while True:
-            data = await websocket.receive_json()
-            msg_type = data.get("type")
-
-            if msg_type == "pose_data":
-                # 转发姿态数据给订阅用户
-                user_id = data.get("user_id")
-                if user_id:
-                    await manager.send_to_user(user_id, {
-                        "type": "pose_update",
-                        "device_id": device_id,
-                        "data": data.get("data")
-                    })
-
-            elif msg_type == "metrics":
-                # 转发实时指标
-                user_id = data.get("user_id")
-                if user_id:
-                    await manager.send_to_user(user_id, {
-                        "type": "metrics_update",
-                        "device_id": device_id,
-                        "data": data.get("data")
-                    })
-
-            elif msg_type == "video_frame":
-                # 转发视频帧（Base64编码的JPEG图片 + 姿态数据 + 指标）
-                user_id = data.get("user_id")
-                if user_id:
-                    await manager.send_to_user(user_id, {
-                        "type": "video_frame",
-                        "device_id": device_id,
-                        "frame": data.get("frame"),
-                        "pose": data.get("pose"),
-                        "metrics": data.get("metrics"),
-                        "timestamp": data.get("timestamp")
-                    })
-
-            elif msg_type == "heartbeat":
-                # 心跳响应
-                await websocket.send_json({"type": "heartbeat_ack"})
+            data = await receive_message(websocket, _device_msg_counters, _device_bytes_in)
+            policy = DEVICE_MESSAGE_POLICY.get(data.get("type"))
+            if policy is not None:
+                # 准入控制: 超出该设备速率或全局繁忙时直接丢弃 (低优先级先丢)
+                limiter, priority, scope = policy
+                if not await limiter.allow(device_id) or not shedder.try_enter(priority, scope):
+                    continue
+            try:
+                if profiler.ws_armed:
+                    await _profile_device_message(websocket, device_id, data)
+                else:
+                    await handle_device_message(websocket, device_id, data)
+            finally:
+                if policy is not None:
+                    shedder.exit()
 
     except WebSocketDisconnect:
         manager.disconnect_device(device_id)
+        if profiler.ws_armed:
+            profiler.disarm_device(device_id)
 
 
 def get_connection_manager() -> ConnectionManager:
@@ -0,0 +1,216 @@
+"""准入控制 - 按设备/用户的令牌桶限流 + 按优先级的全局并发卸载
+
+限流: 每个键一个进程内令牌桶 (快速路径，不访问 Redis)。开启
+RATE_LIMIT_REDIS 时，令牌还需从 Redis 按窗口批量租用 (INCRBY 一次取
+RATE_LIMIT_LEASE 个)，多副本共享同一个窗口计数; Redis 不可用时只用
+进程内令牌桶 (放行): 出错的键在本窗口剩余时间内只用本地租约，所有键
+在 RATE_LIMIT_REDIS_BACKOFF 秒内都不再访问 Redis，避免每条消息都等待
+连接超时。
+
+卸载: 全局在途请求数超过 ADMISSION_MAX_INFLIGHT 的一定比例时，先拒绝
+低优先级流量 (视频帧)，再拒绝姿态，最后才是指标/心跳; 会话开始/结束
+不卸载。
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+from .config import get_settings
+from .database import Database
+from .metrics import ADMISSION_INFLIGHT, ADMISSION_REJECTED
+
+settings = get_settings()
+
+# 优先级 (数值越小越重要) 及可占用的在途请求比例
+CRITICAL = 0
+HIGH = 1
+NORMAL = 2
+LOW = 3
+
+SHED_THRESHOLDS = {
+    HIGH: 0.9,
+    NORMAL: 0.75,
+    LOW: 0.5,
+}
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+
+
+class _Lease:
+    __slots__ = ("window", "remaining", "exhausted")
+
+    def __init__(self, window: int, remaining: int, exhausted: bool = False):
+        self.window = window
+        self.remaining = remaining
+        self.exhausted = exhausted
+
+
+class RateLimiter:
+    """单个限流维度 (如 "device:video_frame")，按键限速"""
+
+    # Redis 出错后暂停访问到该时刻 (所有限流器共用)
+    _redis_retry_at = 0.0
+
+    def __init__(self, scope: str, rate: float, burst_seconds: float = settings.RATE_LIMIT_BURST_SECONDS,
+                 max_keys: int = 100_000):
+        self.scope = scope
+        self.rate = rate
+        self.burst = max(rate * burst_seconds, 1.0)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._leases: Dict[str, _Lease] = {}
+        self._rejected = ADMISSION_REJECTED.labels(scope, "rate_limited")
+
+    def _take_local(self, key: str, now: float) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                evicted, _ = self._buckets.popitem(last=False)
+                self._leases.pop(evicted, None)
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+            bucket.updated_at = now
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    async def _take_shared(self, key: str, now: float) -> bool:
+        """从 Redis 租用令牌; 本地租约未用完时不访问 Redis"""
+        window_seconds = settings.RATE_LIMIT_WINDOW
+        window = int(now // window_seconds)
+        lease = self._leases.get(key)
+        if lease is not None and lease.window == window:
+            if lease.remaining > 0:
+                lease.remaining -= 1
+                return True
+            if lease.exhausted:
+                # 本窗口的共享配额已用完，窗口结束前不再访问 Redis
+                return False
+
+        if now < RateLimiter._redis_retry_at:
+            return True
+
+        limit = int(self.rate * window_seconds + self.burst)
+        size = settings.RATE_LIMIT_LEASE
+        redis_key = f"rl:{self.scope}:{key}:{window}"
+        try:
+            redis = Database.get_redis()
+            used = await redis.incrby(redis_key, size)
+            if used == size:
+                await redis.expire(redis_key, int(window_seconds * 2) + 1)
+        except Exception:
+            # Redis 不可用时退化为进程内限流: 本键在窗口内只用本地租约，且暂停访问 Redis
+            RateLimiter._redis_retry_at = time.time() + settings.RATE_LIMIT_REDIS_BACKOFF
+            self._leases[key] = _Lease(window, limit - 1)
+            return True
+
+        granted = min(size, limit - (used - size))
+        if granted <= 0:
+            self._leases[key] = _Lease(window, 0, exhausted=True)
+            return False
+        self._leases[key] = _Lease(window, granted - 1, exhausted=granted < size)
+        return True
+
+    async def allow(self, key: str) -> bool:
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+        now = time.time()
+        if not self._take_local(key, now) or (
+            settings.RATE_LIMIT_REDIS and not await self._take_shared(key, now)
+        ):
+            self._rejected.inc()
+            return False
+        return True
+
+
+class LoadShedder:
+    """全局在途请求计数，按优先级决定是否接受"""
+
+    def __init__(self, max_inflight: int):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self._limits = {p: int(max_inflight * f) for p, f in SHED_THRESHOLDS.items()}
+        self._rejected: Dict[str, object] = {}
+        ADMISSION_INFLIGHT.set_function(lambda: self.inflight)
+
+    def try_enter(self, priority: int, scope: str) -> bool:
+        limit = self._limits.get(priority)
+        if limit is not None and self.inflight >= limit:
+            counter = self._rejected.get(scope)
+            if counter is None:
+                counter = self._rejected[scope] = ADMISSION_REJECTED.labels(scope, "shed")
+            counter.inc()
+            return False
+        self.inflight += 1
+        return True
+
+    def exit(self):
+        self.inflight -= 1
+
+
+shedder = LoadShedder(settings.ADMISSION_MAX_INFLIGHT)
+
+# 设备消息 (WebSocket 与 HTTP 上报共用同一组限流器)
+video_frame_limiter = RateLimiter("device:video_frame", settings.RATE_LIMIT_VIDEO_FRAME)
+pose_limiter = RateLimiter("device:pose", settings.RATE_LIMIT_POSE)
+device_metrics_limiter = RateLimiter("device:metrics", settings.RATE_LIMIT_METRICS)
+heartbeat_limiter = RateLimiter("device:heartbeat", settings.RATE_LIMIT_HEARTBEAT)
+user_metrics_limiter = RateLimiter("user:metrics", settings.RATE_LIMIT_METRICS)
+
+# 设备 WebSocket 消息类型 -> (限流器, 优先级, 卸载计数的 scope)
+DEVICE_MESSAGE_POLICY = {
+    "video_frame": (video_frame_limiter, LOW, "ws:video_frame"),
+    "pose_data": (pose_limiter, NORMAL, "ws:pose_data"),
+    "metrics": (device_metrics_limiter, HIGH, "ws:metrics"),
+    "heartbeat": (heartbeat_limiter, HIGH, "ws:heartbeat"),
+}
+
+
+class Admission:
+    """HTTP 接口的准入控制，用法:
+
+        async with admit("training:pose", pose_limiter, device_id, NORMAL):
+            ...
+    """
+
+    __slots__ = ("scope", "limiter", "key", "priority")
+
+    def __init__(self, scope: str, limiter: Optional[RateLimiter], key: Optional[str], priority: int):
+        self.scope = scope
+        self.limiter = limiter
+        self.key = key
+        self.priority = priority
+
+    async def __aenter__(self):
+        if self.limiter is not None and self.key is not None and not await self.limiter.allow(self.key):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="请求过于频繁",
+                headers={"Retry-After": "1"}
+            )
+        if not shedder.try_enter(self.priority, self.scope):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="服务繁忙，请稍后重试",
+                headers={"Retry-After": "1"}
+            )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        shedder.exit()
+        return False
+
+
+def admit(scope: str, limiter: Optional[RateLimiter], key: Optional[str], priority: int) -> Admission:
+    return Admission(scope, limiter, key, priority)
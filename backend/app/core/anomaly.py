@@ -0,0 +1,191 @@
+"""设备心跳在线异常检测
+
+每台设备每个指标维护指数加权均值与方差 (EWMA / EWMVar)，新样本的
+z = (x - 均值) / 标准差。|z| 连续 ANOMALY_CONSECUTIVE 次超过 ANOMALY_Z
+判为异常 (中间任一次正常即重新计数); 之后连续 ANOMALY_RECOVERY 次正常
+即恢复。温度超过
+ANOMALY_TEMPERATURE_MAX 时直接判为异常，不依赖基线。
+
+- 温度异常 -> DeviceStatus.ERROR (过热)
+- CPU / 网络延迟异常 -> DeviceStatus.MAINTENANCE (性能下降)
+
+每台设备只保存固定个数的数值，单次更新为常数时间 (见
+benchmarks/anomaly.py)。异常样本不计入方差、只以 1/10 的权重更新均值，
+故障期间基线不会被迅速拉偏；持续很久的水平变化 (默认参数下约数百次
+心跳) 最终会成为新基线。检测状态在进程内，多副本时各自维护；写入的异常
+状态在设备文档中标记 status_source = "anomaly"，任一副本确认 recovered()
+后即可清除 (见 DeviceService.heartbeat)。
+"""
+import math
+from collections import OrderedDict
+from typing import Optional
+
+from .config import get_settings
+
+settings = get_settings()
+
+ONLINE = "online"
+ERROR = "error"
+MAINTENANCE = "maintenance"
+# 设备文档 status_source 字段: 状态由异常检测写入 (人工设置的状态没有该标记)
+SOURCE = "anomaly"
+
+# 指标 -> (标准差下限, 异常时的设备状态)；下限避免平稳指标的微小抖动被判为异常
+METRICS = (
+    ("temperature", 0.5, ERROR),
+    ("cpu_usage", 2.0, MAINTENANCE),
+    ("network_latency", 2.0, MAINTENANCE),
+)
+# 状态严重程度，多个指标同时异常时取最严重的
+SEVERITY = {ONLINE: 0, MAINTENANCE: 1, ERROR: 2}
+
+
+class AnomalyEvent:
+    """设备异常状态变化"""
+
+    __slots__ = ("device_id", "status", "metric", "value", "zscore", "baseline")
+
+    def __init__(self, device_id: str, status: str, metric: Optional[str], value: Optional[float],
+                 zscore: Optional[float], baseline: Optional[float]):
+        self.device_id = device_id
+        self.status = status
+        self.metric = metric
+        self.value = value
+        self.zscore = zscore
+        self.baseline = baseline
+
+    def to_message(self) -> dict:
+        return {
+            "type": "device_alert" if self.status != ONLINE else "device_recovered",
+            "device_id": self.device_id,
+            "status": self.status,
+            "metric": self.metric,
+            "value": self.value,
+            "zscore": None if self.zscore is None else round(self.zscore, 2),
+            "baseline": None if self.baseline is None else round(self.baseline, 3),
+        }
+
+
+class _DeviceState:
+    # 每个指标: 均值、方差、样本数、连续异常数、连续正常数、是否处于异常
+    __slots__ = ("mean", "var", "count", "abnormal", "normal", "active", "status")
+
+    def __init__(self):
+        n = len(METRICS)
+        self.mean = [0.0] * n
+        self.var = [0.0] * n
+        self.count = [0] * n
+        self.abnormal = [0] * n
+        self.normal = [0] * n
+        self.active = [False] * n
+        self.status = ONLINE
+
+
+class AnomalyDetector:
+    def __init__(self, alpha: float, z_threshold: float, warmup: int, consecutive: int, recovery: int,
+                 temperature_max: float, max_devices: int = 100_000):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.consecutive = consecutive
+        self.recovery = recovery
+        self.temperature_max = temperature_max
+        self.max_devices = max_devices
+        self._devices: "OrderedDict[str, _DeviceState]" = OrderedDict()
+
+    def status(self, device_id: str) -> str:
+        state = self._devices.get(device_id)
+        return state.status if state is not None else ONLINE
+
+    def recovered(self, device_id: str, metric: Optional[str] = None) -> bool:
+        """本进程看到的最近心跳已全部正常: 每个有样本的指标都连续 recovery 次正常
+
+        metric 为触发异常的指标时，该指标还必须有样本且已过预热期，避免重启或
+        淘汰后新建的检测状态在基线建立前就清除异常。
+        """
+        state = self._devices.get(device_id)
+        if state is None or state.status != ONLINE:
+            return False
+        seen = False
+        for i, (name, _, _) in enumerate(METRICS):
+            if state.count[i] == 0:
+                if name == metric:
+                    return False
+                continue
+            if state.active[i] or state.normal[i] < self.recovery:
+                return False
+            if name == metric and state.count[i] <= self.warmup:
+                return False
+            seen = True
+        return seen
+
+    def observe(self, device_id: str, values) -> Optional[AnomalyEvent]:
+        """处理一次心跳 (含 METRICS 字段的对象)，设备状态变化时返回事件"""
+        state = self._devices.get(device_id)
+        if state is None:
+            if len(self._devices) >= self.max_devices:
+                self._devices.popitem(last=False)
+            state = self._devices[device_id] = _DeviceState()
+        else:
+            self._devices.move_to_end(device_id)
+
+        alpha = self.alpha
+        worst = ONLINE
+        trigger = None
+        for i, (metric, min_std, abnormal_status) in enumerate(METRICS):
+            x = getattr(values, metric, None)
+            if x is None:
+                continue
+            count = state.count[i]
+            mean = state.mean[i]
+            if count == 0:
+                state.mean[i] = x
+                state.count[i] = 1
+                continue
+
+            diff = x - mean
+            z = diff / max(math.sqrt(state.var[i]), min_std)
+            anomalous = (count >= self.warmup and abs(z) > self.z_threshold) or (
+                metric == "temperature" and x >= self.temperature_max
+            )
+
+            # Finch 增量 EWMA / EWMVar；异常样本只以降低的权重更新均值，不计入方差
+            if anomalous:
+                state.mean[i] = mean + alpha / 10 * diff
+            else:
+                state.mean[i] = mean + alpha * diff
+                state.var[i] = (1 - alpha) * (state.var[i] + alpha * diff * diff)
+            state.count[i] = count + 1
+
+            if anomalous:
+                state.abnormal[i] += 1
+                state.normal[i] = 0
+                if state.abnormal[i] >= self.consecutive:
+                    state.active[i] = True
+            else:
+                state.abnormal[i] = 0
+                state.normal[i] += 1
+                if state.normal[i] >= self.recovery:
+                    state.active[i] = False
+
+            # 已处于异常的指标在恢复前保持异常
+            if state.active[i] and SEVERITY[abnormal_status] > SEVERITY[worst]:
+                worst = abnormal_status
+                trigger = (metric, x, z, mean)
+
+        if worst == state.status:
+            return None
+        state.status = worst
+        if trigger is None:
+            return AnomalyEvent(device_id, worst, None, None, None, None)
+        return AnomalyEvent(device_id, worst, *trigger)
+
+
+detector = AnomalyDetector(
+    alpha=settings.ANOMALY_ALPHA,
+    z_threshold=settings.ANOMALY_Z,
+    warmup=settings.ANOMALY_WARMUP,
+    consecutive=settings.ANOMALY_CONSECUTIVE,
+    recovery=settings.ANOMALY_RECOVERY,
+    temperature_max=settings.ANOMALY_TEMPERATURE_MAX,
+)
@@ -0,0 +1,202 @@
+"""已完成会话的列式归档 (Arrow IPC 文件，需要 pyarrow)
+
+会话结束后姿态序列与指标不再变化，归档为按用户、月份分区的列式文件，
+跨会话分析 (关节角度分布、群体指标统计等) 直接扫描本地文件，不再向
+Influx / Mongo 做逐行查询。
+
+目录结构: ARCHIVE_DIR/user=<user_id>/month=<YYYY-MM>/<session_id>.arrow
+    (hive 风格分区，pyarrow.dataset 等外部工具可直接识别)
+
+每个文件一个会话、一个记录批次，不压缩:
+    time        timestamp[ns, UTC]          每帧时间戳
+    keypoints   fixed_size_list<float32>[68] 17 个关键点 × (x, y, z, visibility)
+    confidence  float32
+会话信息 (session_id / user_id / device_id / 起止时间 / 训练模式 / 指标)
+以 JSON 存在 schema 元数据的 "session" 键中，只读元数据时不触及帧数据。
+
+读取用内存映射，open_session() 返回的数组是文件页上的零拷贝视图
+(poses 形状为 (N, 17, 4))，扫描数月数据的速度取决于磁盘而非解码。
+选择不压缩的 Arrow IPC 而不是 Parquet 正是为了零拷贝映射: Parquet 的
+编码/压缩页必须先解码才能得到数组。
+
+统计归档数据:
+    python -m app.core.archive stats --since 2026-01 --until 2026-06 --joint 5 7 9
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from .config import get_settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # 可选依赖
+    pa = None
+
+settings = get_settings()
+
+KEYPOINTS = 17
+CHANNELS = 4  # x, y, z, visibility
+METADATA_KEY = b"session"
+SUFFIX = ".arrow"
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def _require():
+    if pa is None:
+        raise RuntimeError("会话归档需要安装 pyarrow")
+
+
+def _schema():
+    return pa.schema([
+        ("time", pa.timestamp("ns", tz="UTC")),
+        ("keypoints", pa.list_(pa.float32(), KEYPOINTS * CHANNELS)),
+        ("confidence", pa.float32()),
+    ])
+
+
+def session_path(root: str, user_id: str, month: str, session_id: str) -> str:
+    return os.path.join(root, f"user={user_id}", f"month={month}", session_id + SUFFIX)
+
+
+def write_session(root: str, meta: dict, times: np.ndarray, poses: np.ndarray,
+                  confidence: np.ndarray) -> str:
+    """写出一个会话 (同步，经 IO 线程池调用)
+
+    meta 至少包含 session_id / user_id / month；times 为 int64 纳秒，
+    poses 为 (N, 17, 4)。先写临时文件再改名，读取方不会看到写了一半的文件。
+    """
+    _require()
+    path = session_path(root, meta["user_id"], meta["month"], meta["session_id"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    flat = np.ascontiguousarray(poses, dtype=np.float32).reshape(-1)
+    batch = pa.record_batch([
+        pa.array(np.asarray(times, dtype=np.int64), pa.int64()).cast(pa.timestamp("ns", tz="UTC")),
+        pa.FixedSizeListArray.from_arrays(pa.array(flat), KEYPOINTS * CHANNELS),
+        pa.array(np.asarray(confidence, dtype=np.float32)),
+    ], schema=_schema().with_metadata({METADATA_KEY: json.dumps(meta, ensure_ascii=False).encode()}))
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    os.replace(tmp, path)
+    return path
+
+
+class ArchivedSession(NamedTuple):
+    meta: dict
+    times: np.ndarray       # int64 纳秒
+    poses: np.ndarray       # (N, 17, 4) float32
+    confidence: np.ndarray  # float32
+
+
+def read_meta(path: str) -> dict:
+    """只读 schema 元数据 (不映射帧数据)"""
+    _require()
+    with pa.memory_map(path) as source:
+        return json.loads(pa.ipc.open_file(source).schema.metadata[METADATA_KEY])
+
+
+def open_session(path: str) -> ArchivedSession:
+    """内存映射一个会话文件，数组为零拷贝视图 (映射随数组一起释放)"""
+    _require()
+    reader = pa.ipc.open_file(pa.memory_map(path))
+    meta = json.loads(reader.schema.metadata[METADATA_KEY])
+    if reader.num_record_batches == 0:
+        empty = np.empty(0, np.float32)
+        return ArchivedSession(meta, np.empty(0, np.int64), empty.reshape(0, KEYPOINTS, CHANNELS), empty)
+    batch = reader.get_batch(0)
+    times = batch.column(0).cast(pa.int64()).to_numpy(zero_copy_only=True)
+    poses = batch.column(1).flatten().to_numpy(zero_copy_only=True).reshape(-1, KEYPOINTS, CHANNELS)
+    return ArchivedSession(meta, times, poses, batch.column(2).to_numpy(zero_copy_only=True))
+
+
+def session_files(root: str, user_id: Optional[str] = None, since: Optional[str] = None,
+                  until: Optional[str] = None) -> Iterator[str]:
+    """按分区裁剪列出会话文件；since / until 为 YYYY-MM (含)"""
+    users = [f"user={user_id}"] if user_id else sorted(os.listdir(root)) if os.path.isdir(root) else []
+    for user in users:
+        for month_dir in sorted(glob.glob(os.path.join(root, user, "month=*"))):
+            month = os.path.basename(month_dir)[len("month="):]
+            if (since and month < since) or (until and month > until):
+                continue
+            yield from sorted(glob.glob(os.path.join(month_dir, "*" + SUFFIX)))
+
+
+def scan(root: str, user_id: Optional[str] = None, since: Optional[str] = None,
+         until: Optional[str] = None) -> Iterator[ArchivedSession]:
+    for path in session_files(root, user_id, since, until):
+        yield open_session(path)
+
+
+def joint_angles(poses: np.ndarray, a: int, b: int, c: int) -> np.ndarray:
+    """每帧关节 b 处 a-b-c 的夹角 (度)，只用 x / y / z"""
+    u = poses[:, a, :3] - poses[:, b, :3]
+    v = poses[:, c, :3] - poses[:, b, :3]
+    cos = (u * v).sum(axis=1) / (np.linalg.norm(u, axis=1) * np.linalg.norm(v, axis=1) + 1e-9)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+# ==================== 命令行 ====================
+
+METRIC_FIELDS = ("hit_rate", "reaction_time", "accuracy", "fatigue_level")
+
+
+def stats(root: str, user_id: Optional[str], since: Optional[str], until: Optional[str],
+          joint: tuple) -> dict:
+    """扫描归档: 会话数、帧数、各指标均值与关节角度分布 (按 0.1 度直方图累加)"""
+    started_at = time.perf_counter()
+    histogram = np.zeros(1801, np.int64)
+    totals = dict.fromkeys(METRIC_FIELDS, 0.0)
+    sessions = frames = size = 0
+    for path in session_files(root, user_id, since, until):
+        session = open_session(path)
+        sessions += 1
+        frames += len(session.times)
+        size += os.path.getsize(path)
+        metrics = session.meta.get("metrics") or {}
+        for field in METRIC_FIELDS:
+            totals[field] += metrics.get(field, 0.0)
+        if len(session.times):
+            angles = joint_angles(session.poses, *joint)
+            histogram += np.bincount(np.rint(angles * 10).astype(np.int64), minlength=1801)
+    elapsed = time.perf_counter() - started_at
+
+    result = {"sessions": sessions, "frames": frames, "mb": round(size / 1e6, 1),
+              "seconds": round(elapsed, 2), "mb_per_sec": round(size / 1e6 / elapsed, 1) if elapsed else 0}
+    if sessions:
+        result.update({f"avg_{f}": round(totals[f] / sessions, 2) for f in METRIC_FIELDS})
+    if frames:
+        cumulative = np.cumsum(histogram)
+        for q in (50, 95):
+            result[f"angle_p{q}"] = int(np.searchsorted(cumulative, frames * q / 100)) / 10
+        result["angle_mean"] = round(float((histogram * np.arange(1801)).sum()) / frames / 10, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话列式归档")
+    parser.add_argument("command", choices=["stats"])
+    parser.add_argument("--dir", default=settings.ARCHIVE_DIR)
+    parser.add_argument("--user")
+    parser.add_argument("--since", help="YYYY-MM")
+    parser.add_argument("--until", help="YYYY-MM")
+    parser.add_argument("--joint", type=int, nargs=3, default=(5, 7, 9), metavar=("A", "B", "C"),
+                        help="关节角度 A-B-C (默认左肩-左肘-左腕)")
+    args = parser.parse_args()
+    _require()
+    print(json.dumps(stats(args.dir, args.user, args.since, args.until, tuple(args.joint)), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""HTTP 响应压缩 (纯 ASGI 中间件)
+
+- 按 Accept-Encoding 协商 br (已安装 brotli 时) / gzip，q=0 视为不接受
+- 响应体小于 COMPRESSION_MIN_SIZE 时原样返回
+- 流式响应逐块压缩: 压缩器有输出就发送，未输出的原始字节累计超过
+  COMPRESSION_FLUSH_BYTES 时强制 flush，避免长时间积压
+- 已编码 (带 Content-Encoding) 或本身已压缩的类型 (图片/音视频/压缩包)
+  不处理; HEAD 与无响应体的状态码不处理
+- 压缩级别默认 COMPRESSION_LEVEL，单个路由可通过依赖覆盖:
+
+      @router.get("/replay", dependencies=[Depends(compression_level(1))])
+
+  或在处理函数内调用 set_compression_level(request, level)。
+  级别为 0 表示不压缩。brotli 级别按 gzip 级别 (1-9) 映射到 0-11。
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+
+from .config import get_settings
+from .metrics import HTTP_COMPRESSION_BYTES
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+settings = get_settings()
+
+SCOPE_KEY = "compression_level"
+
+# 已压缩或不应缓冲的类型
+SKIP_CONTENT_TYPES = (
+    "image/", "video/", "audio/", "font/woff2",
+    "application/zip", "application/gzip", "application/x-gzip",
+    "application/octet-stream", "text/event-stream",
+)
+
+NO_BODY_STATUS = {204, 304}
+
+
+def set_compression_level(request: Request, level: int):
+    """在处理函数内按请求参数覆盖本次响应的压缩级别 (0 为不压缩)"""
+    request.scope[SCOPE_KEY] = level
+
+
+def compression_level(level: int):
+    """路由依赖: 覆盖该路由的压缩级别 (0 为不压缩)"""
+    def dependency(request: Request):
+        set_compression_level(request, level)
+    return dependency
+
+
+def select_encoding(accept_encoding: str) -> Optional[str]:
+    """按客户端 q 值选择编码，同等优先时 br 优先"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    wildcard = accepted.get("*", 0.0)
+    candidates = ("br", "gzip") if brotli is not None else ("gzip",)
+    best, best_q = None, 0.0
+    for name in candidates:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class _Gzip:
+    __slots__ = ("_compressor",)
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    __slots__ = ("_compressor",)
+
+    def __init__(self, level: int):
+        # gzip 1-9 -> brotli 1-11，文本 JSON 在 4-5 附近性价比最高
+        quality = min(11, max(0, round(level * 11 / 9)))
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+ENCODERS = {"gzip": _Gzip, "br": _Brotli}
+
+
+def compress_body(encoding: str, level: int, body: bytes) -> bytes:
+    encoder = ENCODERS[encoding](level)
+    return encoder.compress(body) + encoder.finish()
+
+
+class CompressionMiddleware:
+    """按需压缩 HTTP 响应"""
+
+    def __init__(self, app, level: int = settings.COMPRESSION_LEVEL,
+                 min_size: int = settings.COMPRESSION_MIN_SIZE,
+                 flush_bytes: int = settings.COMPRESSION_FLUSH_BYTES):
+        self.app = app
+        self.level = level
+        self.min_size = min_size
+        self.flush_bytes = flush_bytes
+        self._bytes = {
+            (name, direction): HTTP_COMPRESSION_BYTES.labels(name, direction)
+            for name in ENCODERS for direction in ("in", "out")
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or self.level <= 0:
+            await self.app(scope, receive, send)
+            return
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self, scope, encoding, send).run(receive)
+
+
+class _CompressedResponse:
+    """单个响应的压缩状态"""
+
+    def __init__(self, middleware: CompressionMiddleware, scope, encoding: str, send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        # None: 尚未决定; False: 原样转发; 否则为压缩器
+        self.encoder = None
+        self.pending = 0
+        self.bytes_in = middleware._bytes[(encoding, "in")]
+        self.bytes_out = middleware._bytes[(encoding, "out")]
+
+    async def run(self, receive):
+        await self.middleware.app(self.scope, receive, self.wrapped_send)
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if self.start_message["status"] < 200 or self.start_message["status"] in NO_BODY_STATUS:
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith(SKIP_CONTENT_TYPES):
+            return False
+        return self.scope.get(SCOPE_KEY, self.middleware.level) > 0
+
+    def _start_encoding(self, headers: MutableHeaders):
+        level = self.scope.get(SCOPE_KEY, self.middleware.level)
+        self.encoder = ENCODERS[self.encoding](level)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "content-length" in headers:
+            del headers["content-length"]
+
+    async def wrapped_send(self, message):
+        if message["type"] == "http.response.start":
+            # 等到第一块响应体再决定是否压缩
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not self._compressible(headers):
+                self.encoder = False
+            elif not more_body:
+                # 完整响应: 小于阈值不压缩，压缩后不变小也按原样返回
+                if len(body) < self.middleware.min_size:
+                    self.encoder = False
+                else:
+                    level = self.scope.get(SCOPE_KEY, self.middleware.level)
+                    compressed = compress_body(self.encoding, level, body)
+                    self.bytes_in.inc(len(body))
+                    if len(compressed) < len(body):
+                        self.bytes_out.inc(len(compressed))
+                        headers["Content-Encoding"] = self.encoding
+                        headers.add_vary_header("Accept-Encoding")
+                        headers["Content-Length"] = str(len(compressed))
+                        await self.send(self.start_message)
+                        await self.send({"type": "http.response.body", "body": compressed})
+                        return
+                    self.bytes_out.inc(len(body))
+                    self.encoder = False
+            elif int(headers.get("content-length", self.middleware.min_size)) < self.middleware.min_size:
+                self.encoder = False
+            else:
+                self._start_encoding(headers)
+            await self.send(self.start_message)
+
+        if self.encoder is False:
+            await self.send(message)
+            return
+
+        self.bytes_in.inc(len(body))
+        self.pending += len(body)
+        chunk = self.encoder.compress(body) if body else b""
+        if not more_body:
+            chunk += self.encoder.finish()
+        elif self.pending >= self.middleware.flush_bytes:
+            chunk += self.encoder.flush()
+            self.pending = 0
+        if chunk or not more_body:
+            self.bytes_out.inc(len(chunk))
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -17,6 +17,13 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24小时
     ALGORITHM: str = "HS256"
 
+    # 存储后端: live = MongoDB/InfluxDB/Redis, memory = 进程内存 (压测/基准测试/CI)
+    STORAGE_BACKEND: str = "live"
+    # 内存后端保留的最近写入点数 (加载的种子点另计，不会被截断)
+    MEMORY_INFLUX_MAX_POINTS: int = 100_000
+    # python -m app.datagen --target files 的输出目录，内存后端启动时加载
+    MEMORY_SEED_DIR: str = ""
+
     # MongoDB配置 (支持 MongoDB Atlas URL)
     MONGO_URL: str = ""
     MONGO_HOST: str = "localhost"
@@ -24,6 +31,13 @@ class Settings(BaseSettings):
     MONGO_DB: str = "sports_vision"
     MONGO_USER: str = ""
     MONGO_PASSWORD: str = ""
+    # MongoDB连接池
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: int = 60_000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 5_000
+    MONGO_CONNECT_TIMEOUT_MS: int = 10_000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 10_000
 
     @property
     def mongo_uri(self) -> str:
@@ -43,11 +57,115 @@ class Settings(BaseSettings):
     INFLUX_TOKEN: str = "your-influxdb-token"
     INFLUX_ORG: str = "sports_vision"
     INFLUX_BUCKET: str = "training_data"
+    INFLUX_TIMEOUT_MS: int = 10_000
+    INFLUX_POOL_MAXSIZE: int = 16
+    # 分层保留与降采样 (app/core/retention.py)
+    INFLUX_RETENTION_ENABLED: bool = False
+    INFLUX_RAW_RETENTION_DAYS: int = 7
+    INFLUX_DOWNSAMPLED_BUCKET: str = "training_data_ds"
+    INFLUX_DOWNSAMPLED_RETENTION_DAYS: int = 365
 
     # Redis配置
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    # Redis连接池 (池满时最多等待 REDIS_POOL_TIMEOUT 秒)
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+
+    # 进行中会话超过该时长(秒)无数据视为已放弃
+    LIVE_SESSION_IDLE_TIMEOUT: int = 4 * 3600
+
+    # 设备最新帧缓存 (新订阅者秒开 / 快照接口)
+    FRAME_CACHE_FRAMES_PER_DEVICE: int = 3
+    FRAME_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # 观看端应用层压缩级别 (pose_update / metrics_update)
+    WS_COMPRESSION_LEVEL: int = 6
+
+    # 连接亲和路由: 本 worker 标识与直连 worker 列表 ("w0=ws://host:8001,w1=ws://host:8002")
+    # 配置了 ROUTING_PEERS 时 WORKER_ID (默认主机名) 必须是其中的名称，否则启动失败
+    WORKER_ID: str = ""
+    ROUTING_PEERS: str = ""
+    ROUTING_VNODES: int = 64
+
+    # 观看端合并发送 (/ws/user/{id}?coalesce=Hz) 允许的最高频率
+    WS_COALESCE_MAX_HZ: int = 30
+
+    # 准入控制: 每台设备/每个用户的速率 (次/秒)，突发量为速率 × RATE_LIMIT_BURST_SECONDS
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS: bool = True
+    RATE_LIMIT_WINDOW: float = 10.0
+    RATE_LIMIT_LEASE: int = 20
+    RATE_LIMIT_REDIS_BACKOFF: float = 5.0  # Redis 出错后暂停访问的秒数
+    RATE_LIMIT_BURST_SECONDS: float = 2.0
+    RATE_LIMIT_VIDEO_FRAME: float = 30.0
+    RATE_LIMIT_POSE: float = 60.0
+    RATE_LIMIT_METRICS: float = 20.0
+    RATE_LIMIT_HEARTBEAT: float = 2.0
+    ADMISSION_MAX_INFLIGHT: int = 512
+
+    # 设备配置下发
+    CONFIG_ACK_TIMEOUT: float = 5.0
+    CONFIG_PUSH_RETRIES: int = 2
+    CONFIG_PUSH_CONCURRENCY: int = 50
+
+    # 训练会话录制 (默认关闭)
+    RECORDING_ENABLED: bool = False
+    RECORDING_DIR: str = "recordings"
+    RECORDING_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    RECORDING_QUEUE_SIZE: int = 2048
+
+    # 设备遥测分位数 (心跳指标，按时间桶聚合，经 Redis 跨副本合并)
+    TELEMETRY_BUCKET_SECONDS: int = 60
+    TELEMETRY_DEVICE_BUCKET_SECONDS: int = 300
+    TELEMETRY_RETENTION_MINUTES: int = 6 * 60
+    TELEMETRY_FLUSH_SECONDS: float = 5.0
+    TELEMETRY_RELATIVE_ACCURACY: float = 0.01
+
+    # 心跳异常检测 (每台设备每个指标的 EWMA 均值/方差 + z 分数)
+    ANOMALY_ENABLED: bool = True
+    ANOMALY_ALPHA: float = 0.05
+    ANOMALY_Z: float = 4.0
+    ANOMALY_WARMUP: int = 20
+    ANOMALY_CONSECUTIVE: int = 3
+    ANOMALY_RECOVERY: int = 5
+    ANOMALY_TEMPERATURE_MAX: float = 85.0
+
+    # 训练排行榜 (Redis 有序集合，周榜保留周数)
+    LEADERBOARD_WEEKS: int = 8
+
+    # 训练计划批量生成 (python -m app.services.plan_service)
+    PLAN_WINDOW_DAYS: int = 90
+    PLAN_HALF_LIFE_DAYS: float = 14.0
+    PLAN_CHUNK_USERS: int = 2000
+    PLAN_WORKERS: int = 0
+
+    # 共享执行器 (CPU 密集任务用进程池，阻塞 I/O 用线程池；CPU_WORKERS=0 为 CPU 核数 - 1)
+    EXECUTOR_CPU_WORKERS: int = 0
+    EXECUTOR_IO_WORKERS: int = 8
+    EXECUTOR_CPU_QUEUE: int = 64
+    EXECUTOR_IO_QUEUE: int = 256
+    EXECUTOR_SHM_MIN_BYTES: int = 64 * 1024
+
+    # 已完成会话的列式归档 (需要 pyarrow，按用户/月份分区，见 core/archive.py)
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_DELAY_SECONDS: float = 10.0
+
+    # HTTP 响应压缩 (gzip，已安装 brotli 时支持 br)
+    COMPRESSION_LEVEL: int = 6
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_FLUSH_BYTES: int = 64 * 1024
+
+    # 性能剖析 (默认关闭，可通过管理接口在运行时开启)
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_MS: float = 2.0
+    PROFILING_MAX_RESULTS: int = 50
 
     # CORS配置
     CORS_ORIGINS: list[str] = [
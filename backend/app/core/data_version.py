@@ -0,0 +1,79 @@
+"""按用户的数据版本号与条件 GET
+
+用户的训练会话或设备发生变化时递增其版本号 (Redis 键 dv:{user_id})。
+历史/趋势/统计/设备列表接口的 ETag 由版本号、路径、查询参数和当天日期计算，
+If-None-Match 命中时直接返回 304，只需一次 Redis 读取，不查询 Mongo。
+
+版本号首次读取时以毫秒时间戳初始化，Redis 数据丢失后重新初始化的
+版本号不会与之前签发的 ETag 冲突。Redis 不可用时不做条件 GET。
+"""
+import hashlib
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from .database import Database
+from .security import get_current_user
+
+
+class DataVersions:
+    """按用户的数据版本号"""
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"dv:{user_id}"
+
+    @classmethod
+    async def get(cls, user_id: str) -> Optional[int]:
+        try:
+            redis = Database.get_redis()
+            value = await redis.get(cls._key(user_id))
+            if value is None:
+                value = int(time.time() * 1000)
+                if not await redis.set(cls._key(user_id), value, nx=True):
+                    value = await redis.get(cls._key(user_id))
+            return int(value)
+        except Exception:
+            return None
+
+    @classmethod
+    async def bump(cls, *user_ids: Optional[str]):
+        """递增用户的数据版本号 (使其已签发的 ETag 失效)"""
+        try:
+            redis = Database.get_redis()
+            for user_id in dict.fromkeys(user_ids):
+                if not user_id:
+                    continue
+                if await redis.incr(cls._key(user_id)) == 1:
+                    # 键不存在时 INCR 从 1 开始，改为时间戳避免与旧 ETag 冲突
+                    await redis.set(cls._key(user_id), int(time.time() * 1000))
+        except Exception:
+            pass
+
+
+def make_etag(user_id: str, version: int, path: str, query: str) -> str:
+    # 带上当天日期: "最近 N 天" 的统计窗口每天滚动，数据不变时结果也会变
+    day = datetime.utcnow().strftime("%Y%m%d")
+    digest = hashlib.blake2b(f"{user_id}|{path}|{query}|{day}".encode(), digest_size=8).hexdigest()
+    return f'W/"{version:x}-{digest}"'
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user)
+):
+    """路由依赖: If-None-Match 与当前 ETag 一致时返回 304，否则为响应加上 ETag"""
+    version = await DataVersions.get(current_user["sub"])
+    if version is None:
+        return
+
+    etag = make_etag(current_user["sub"], version, request.url.path, request.url.query)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
@@ -2,13 +2,43 @@ from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import ASYNCHRONOUS
 import redis.asyncio as redis
+from collections import deque
 from typing import Optional
 
 from .config import get_settings
+from .pool_stats import MongoPoolListener, InstrumentedRedisPool, influx_pool_snapshot
+from .metrics import MongoCommandListener, INFLUX_WRITE_QUEUE_DEPTH
+from .memory_backend import MemoryMongoClient, MemoryInfluxClient, MemoryRedis, load_seed_files
 
 settings = get_settings()
 
 
+class TrackedWriteApi:
+    """记录未完成异步写入数的 Influx WriteApi 包装"""
+
+    def __init__(self, write_api):
+        self._write_api = write_api
+        self._pending = deque()
+
+    def write(self, *args, **kwargs):
+        result = self._write_api.write(*args, **kwargs)
+        pending = self._pending
+        # 写入大体按提交顺序完成，从队头摊还清理即可
+        while pending and pending[0].ready():
+            pending.popleft()
+        pending.append(result)
+        return result
+
+    def pending(self) -> int:
+        pending = self._pending
+        while pending and pending[0].ready():
+            pending.popleft()
+        return len(pending)
+
+    def close(self):
+        self._write_api.close()
+
+
 class Database:
     """数据库连接管理"""
 
@@ -16,40 +46,91 @@ class Database:
     mongo_db: Optional[AsyncIOMotorDatabase] = None
     influx_client: Optional[InfluxDBClient] = None
     redis_client: Optional[redis.Redis] = None
+    mongo_pool_listener: Optional[MongoPoolListener] = None
+    redis_pool: Optional[InstrumentedRedisPool] = None
+    influx_write_api: Optional[TrackedWriteApi] = None
 
     @classmethod
     async def connect(cls):
         """建立数据库连接"""
+        if settings.STORAGE_BACKEND == "memory":
+            cls.connect_memory()
+            return
+        if settings.STORAGE_BACKEND != "live":
+            raise ValueError(f"未知的存储后端: {settings.STORAGE_BACKEND}")
+
         # MongoDB
-        cls.mongo_client = AsyncIOMotorClient(settings.mongo_uri)
+        cls.mongo_pool_listener = MongoPoolListener()
+        cls.mongo_client = AsyncIOMotorClient(
+            settings.mongo_uri,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[cls.mongo_pool_listener, MongoCommandListener()]
+        )
         cls.mongo_db = cls.mongo_client[settings.MONGO_DB]
 
         # InfluxDB
         cls.influx_client = InfluxDBClient(
             url=settings.INFLUX_URL,
             token=settings.INFLUX_TOKEN,
-            org=settings.INFLUX_ORG
+            org=settings.INFLUX_ORG,
+            timeout=settings.INFLUX_TIMEOUT_MS,
+            connection_pool_maxsize=settings.INFLUX_POOL_MAXSIZE
         )
+        cls.influx_write_api = TrackedWriteApi(
+            cls.influx_client.write_api(write_options=ASYNCHRONOUS)
+        )
+        INFLUX_WRITE_QUEUE_DEPTH.set_function(cls.influx_write_api.pending)
 
         # Redis
-        cls.redis_client = redis.Redis(
+        cls.redis_pool = InstrumentedRedisPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
             db=settings.REDIS_DB,
-            decode_responses=True
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
         )
+        cls.redis_client = redis.Redis(connection_pool=cls.redis_pool)
 
         print("[DB] 数据库连接已建立")
 
+    @classmethod
+    def connect_memory(cls):
+        """使用进程内存后端 (无需外部服务)"""
+        cls.mongo_client = MemoryMongoClient()
+        cls.mongo_db = cls.mongo_client[settings.MONGO_DB]
+        cls.influx_client = MemoryInfluxClient(max_points=settings.MEMORY_INFLUX_MAX_POINTS)
+        cls.influx_write_api = cls.influx_client.write_api()
+        cls.redis_client = MemoryRedis()
+        INFLUX_WRITE_QUEUE_DEPTH.set_function(cls.influx_write_api.pending)
+
+        print("[DB] 使用内存存储后端")
+        if settings.MEMORY_SEED_DIR:
+            counts = load_seed_files(cls.mongo_db, cls.influx_write_api, settings.MEMORY_SEED_DIR,
+                                     settings.INFLUX_BUCKET)
+            print(f"[DB] 已加载种子数据 {settings.MEMORY_SEED_DIR}: {counts}")
+
     @classmethod
     async def disconnect(cls):
         """关闭数据库连接"""
         if cls.mongo_client:
             cls.mongo_client.close()
+        if cls.influx_write_api:
+            cls.influx_write_api.close()
         if cls.influx_client:
             cls.influx_client.close()
         if cls.redis_client:
             await cls.redis_client.close()
+        if cls.redis_pool:
+            await cls.redis_pool.disconnect()
 
         print("[DB] 数据库连接已关闭")
 
@@ -59,7 +140,7 @@ class Database:
 
     @classmethod
     def get_influx_write_api(cls):
-        return cls.influx_client.write_api(write_options=ASYNCHRONOUS)
+        return cls.influx_write_api
 
     @classmethod
     def get_influx_query_api(cls):
@@ -68,3 +149,15 @@ class Database:
     @classmethod
     def get_redis(cls) -> redis.Redis:
         return cls.redis_client
+
+    @classmethod
+    def pool_stats(cls) -> dict:
+        """连接池状态: 使用中/空闲/排队等待/借出耗时"""
+        stats = {}
+        if cls.mongo_pool_listener:
+            stats["mongo"] = cls.mongo_pool_listener.snapshot()
+        if cls.redis_pool:
+            stats["redis"] = cls.redis_pool.snapshot()
+        if isinstance(cls.influx_client, InfluxDBClient):
+            stats["influx"] = influx_pool_snapshot(cls.influx_client, settings.INFLUX_POOL_MAXSIZE)
+        return stats
@@ -0,0 +1,238 @@
+"""共享执行器 - 把 CPU 密集与阻塞 I/O 的工作移出事件循环
+
+两个池，按任务类型路由 (TASK_ROUTES):
+
+- cpu: 进程池 (spawn)，姿态分析、JPEG 处理、分析规则、训练计划计算等
+- io:  线程池，同步 Influx 客户端、归档文件写入等阻塞调用
+
+``await executors.run("influx", fn, *args)`` 提交任务并等待结果:
+
+- 有界队列: 每个池的排队+执行中任务数超过 EXECUTOR_*_QUEUE 时立即抛出
+  ExecutorBusy (503)，不在事件循环里积压
+- 取消: 等待方被取消或超时 (timeout) 时取消尚未开始的任务；已在运行的
+  任务无法中断，结束后结果被丢弃，名额在任务真正结束时才释放
+- 指标: executor_task_duration_seconds{pool,task,stage}，stage 为 wait
+  (排队) 与 run (执行)；executor_tasks_total{pool,task,outcome}
+
+进程池任务的 NumPy 参数 (可嵌套在 tuple/list/dict 中) 不小于
+EXECUTOR_SHM_MIN_BYTES 时经共享内存传递，子进程直接映射为数组视图 (只在
+任务执行期间有效，不要在返回值中引用)。共享内存段由主进程创建，在任务
+结束或被取消后删除。返回值照常 pickle，应保持较小 (如汇总结果)。
+
+未启动 (命令行工具、子进程) 时 cpu 任务在当前线程直接执行，io 任务用
+asyncio.to_thread。函数必须可被 pickle (模块级函数)。
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+
+from .config import get_settings
+from .metrics import EXECUTOR_QUEUE_DEPTH, EXECUTOR_TASK_DURATION, EXECUTOR_TASKS
+
+settings = get_settings()
+
+CPU = "cpu"
+IO = "io"
+
+# 任务类型 -> 池
+TASK_ROUTES: Dict[str, str] = {
+    "pose_analysis": CPU,
+    "jpeg": CPU,
+    "ai_analysis": CPU,
+    "plan_compute": CPU,
+    "influx": IO,
+    "archive": IO,
+}
+
+
+class ExecutorBusy(HTTPException):
+    """池的队列已满"""
+
+    def __init__(self, pool: str):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后重试",
+            headers={"Retry-After": "1"},
+        )
+        self.pool = pool
+
+
+# --- 共享内存传递 NumPy 数组 ---
+
+class _SharedArray:
+    """共享内存中数组的引用 (可 pickle)"""
+
+    __slots__ = ("name", "shape", "dtype")
+
+    def __init__(self, name: str, shape: tuple, dtype: str):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __getstate__(self):
+        return self.name, self.shape, self.dtype
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+
+def _to_shared(array: np.ndarray, segments: List[shared_memory.SharedMemory]) -> _SharedArray:
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    segments.append(shm)
+    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+    return _SharedArray(shm.name, array.shape, array.dtype.str)
+
+
+def _pack(value, segments: List[shared_memory.SharedMemory], min_bytes: int):
+    """把大数组替换为共享内存引用"""
+    if isinstance(value, np.ndarray):
+        if value.nbytes >= min_bytes and value.dtype != object:
+            return _to_shared(value, segments)
+        return value
+    if isinstance(value, tuple):
+        items = [_pack(v, segments, min_bytes) for v in value]
+        return type(value)(*items) if hasattr(value, "_fields") else tuple(items)
+    if isinstance(value, list):
+        return [_pack(v, segments, min_bytes) for v in value]
+    if isinstance(value, dict):
+        return {k: _pack(v, segments, min_bytes) for k, v in value.items()}
+    return value
+
+
+def _attach(value, segments: List[shared_memory.SharedMemory]):
+    """把共享内存引用还原为共享内存上的数组视图"""
+    if isinstance(value, _SharedArray):
+        shm = shared_memory.SharedMemory(name=value.name)
+        segments.append(shm)
+        return np.ndarray(value.shape, np.dtype(value.dtype), buffer=shm.buf)
+    if isinstance(value, tuple):
+        items = [_attach(v, segments) for v in value]
+        return type(value)(*items) if hasattr(value, "_fields") else tuple(items)
+    if isinstance(value, list):
+        return [_attach(v, segments) for v in value]
+    if isinstance(value, dict):
+        return {k: _attach(v, segments) for k, v in value.items()}
+    return value
+
+
+def _release(segments: List[shared_memory.SharedMemory], unlink: bool):
+    for shm in segments:
+        try:
+            shm.close()
+            if unlink:
+                shm.unlink()
+        except (BufferError, FileNotFoundError):
+            pass
+    segments.clear()
+
+
+def _invoke(fn: Callable, args: tuple, kwargs: dict) -> Tuple[Any, float, float]:
+    """在池中执行，返回 (结果, 开始时刻, 结束时刻)；时刻为 time.monotonic (跨进程可比)"""
+    started = time.monotonic()
+    segments: List[shared_memory.SharedMemory] = []
+    try:
+        result = fn(*_attach(args, segments), **_attach(kwargs, segments))
+    finally:
+        _release(segments, unlink=False)
+    return result, started, time.monotonic()
+
+
+def _warmup():
+    return os.getpid()
+
+
+class Executors:
+    def __init__(self):
+        self._pools: Dict[str, Executor] = {}
+        self._limits: Dict[str, int] = {}
+        self._inflight: Dict[str, int] = {CPU: 0, IO: 0}
+        for pool in (CPU, IO):
+            EXECUTOR_QUEUE_DEPTH.labels(pool).set_function(lambda pool=pool: self._inflight[pool])
+
+    @property
+    def started(self) -> bool:
+        return bool(self._pools)
+
+    def start(self):
+        cpu_workers = settings.EXECUTOR_CPU_WORKERS or max((os.cpu_count() or 2) - 1, 1)
+        self._pools = {
+            CPU: ProcessPoolExecutor(cpu_workers, mp_context=multiprocessing.get_context("spawn")),
+            IO: ThreadPoolExecutor(settings.EXECUTOR_IO_WORKERS, thread_name_prefix="io"),
+        }
+        self._limits = {CPU: settings.EXECUTOR_CPU_QUEUE, IO: settings.EXECUTOR_IO_QUEUE}
+        # 预先启动子进程并完成导入，避免首个请求承担 spawn 开销
+        for _ in range(cpu_workers):
+            self._pools[CPU].submit(_warmup)
+
+    async def stop(self):
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+    def _done(self, pool: str, segments: List[shared_memory.SharedMemory]):
+        self._inflight[pool] -= 1
+        _release(segments, unlink=True)
+
+    async def run(self, task: str, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """按任务类型把 fn(*args, **kwargs) 提交到对应的池并等待结果"""
+        pool_name = TASK_ROUTES[task]
+        pool = self._pools.get(pool_name)
+        if pool is None:
+            if pool_name == IO:
+                return await asyncio.to_thread(fn, *args, **kwargs)
+            return fn(*args, **kwargs)
+
+        if self._inflight[pool_name] >= self._limits[pool_name]:
+            EXECUTOR_TASKS.labels(pool_name, task, "rejected").inc()
+            raise ExecutorBusy(pool_name)
+
+        loop = asyncio.get_running_loop()
+        segments: List[shared_memory.SharedMemory] = []
+        submitted = time.monotonic()
+        try:
+            if pool_name == CPU:
+                min_bytes = settings.EXECUTOR_SHM_MIN_BYTES
+                args, kwargs = _pack(args, segments, min_bytes), _pack(kwargs, segments, min_bytes)
+            future = pool.submit(_invoke, fn, args, kwargs)
+        except BaseException:
+            _release(segments, unlink=True)
+            raise
+        self._inflight[pool_name] += 1
+
+        def on_done(_):
+            # 名额与共享内存在任务真正结束 (含取消) 时释放；回调可能在池的线程中执行
+            try:
+                loop.call_soon_threadsafe(self._done, pool_name, segments)
+            except RuntimeError:
+                _release(segments, unlink=True)
+
+        future.add_done_callback(on_done)
+
+        outcome = "error"
+        try:
+            result, started, finished = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            if outcome != "ok":
+                future.cancel()
+            EXECUTOR_TASKS.labels(pool_name, task, outcome).inc()
+
+        EXECUTOR_TASK_DURATION.labels(pool_name, task, "wait").observe(max(started - submitted, 0.0))
+        EXECUTOR_TASK_DURATION.labels(pool_name, task, "run").observe(finished - started)
+        return result
+
+
+executors = Executors()
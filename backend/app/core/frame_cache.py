@@ -0,0 +1,128 @@
+"""设备最新帧缓存 - 每台设备保留最近 K 个已编码的转发消息
+
+缓存的是转发给观看端的 JSON 文本本身，新订阅者直接发送即可，无需
+再次编码; 全局字节上限按设备 LRU 淘汰 (最久未更新的设备先丢最旧的帧)。
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict, deque
+from typing import Deque, Optional
+
+from .config import get_settings
+
+settings = get_settings()
+
+
+class CachedFrame:
+    """一条已编码的转发消息"""
+
+    __slots__ = ("timestamp", "message", "jpeg")
+
+    def __init__(self, timestamp, message: str):
+        self.timestamp = timestamp
+        self.message = message
+        # 快照接口首次请求时才解码
+        self.jpeg: Optional[bytes] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.message) + (len(self.jpeg) if self.jpeg is not None else 0)
+
+
+class _DeviceFrames:
+    __slots__ = ("frames", "poses")
+
+    def __init__(self):
+        self.frames: Deque[CachedFrame] = deque()
+        self.poses: Deque[CachedFrame] = deque()
+
+
+class FrameCache:
+    """按设备的环形缓冲 + 全局内存上限"""
+
+    def __init__(self, frames_per_device: int, max_bytes: int):
+        self.frames_per_device = frames_per_device
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        # 按最近更新时间排序，队头为最久未更新的设备
+        self._devices: "OrderedDict[str, _DeviceFrames]" = OrderedDict()
+
+    def _device(self, device_id: str) -> _DeviceFrames:
+        entry = self._devices.get(device_id)
+        if entry is None:
+            entry = self._devices[device_id] = _DeviceFrames()
+        else:
+            self._devices.move_to_end(device_id)
+        return entry
+
+    def _push(self, ring: Deque[CachedFrame], item: CachedFrame):
+        ring.append(item)
+        self.total_bytes += item.size
+        if len(ring) > self.frames_per_device:
+            self.total_bytes -= ring.popleft().size
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._devices:
+            device_id, entry = next(iter(self._devices.items()))
+            ring = entry.frames if entry.frames else entry.poses
+            if ring:
+                self.total_bytes -= ring.popleft().size
+                self.evictions += 1
+            if not entry.frames and not entry.poses:
+                del self._devices[device_id]
+
+    def put_frame(self, device_id: str, message: str, timestamp=None):
+        self._push(self._device(device_id).frames, CachedFrame(timestamp, message))
+
+    def put_pose(self, device_id: str, message: str, timestamp=None):
+        self._push(self._device(device_id).poses, CachedFrame(timestamp, message))
+
+    def latest_frame(self, device_id: str) -> Optional[CachedFrame]:
+        entry = self._devices.get(device_id)
+        return entry.frames[-1] if entry and entry.frames else None
+
+    def latest_pose(self, device_id: str) -> Optional[CachedFrame]:
+        entry = self._devices.get(device_id)
+        return entry.poses[-1] if entry and entry.poses else None
+
+    def recent_frames(self, device_id: str) -> list:
+        entry = self._devices.get(device_id)
+        return list(entry.frames) if entry else []
+
+    def latest_jpeg(self, device_id: str) -> Optional[bytes]:
+        """最新帧的 JPEG 原始字节 (只做 Base64 解码，不重新编码图像)"""
+        frame = self.latest_frame(device_id)
+        if frame is None:
+            return None
+        if frame.jpeg is None:
+            encoded = json.loads(frame.message).get("frame")
+            if not isinstance(encoded, str):
+                return None
+            # 兼容 data URL 形式 (data:image/jpeg;base64,...)
+            encoded = encoded.rpartition(",")[2]
+            try:
+                frame.jpeg = base64.b64decode(encoded)
+            except (binascii.Error, ValueError):
+                return None
+            self.total_bytes += len(frame.jpeg)
+        return frame.jpeg
+
+    def discard(self, device_id: str):
+        entry = self._devices.pop(device_id, None)
+        if entry is not None:
+            self.total_bytes -= sum(f.size for f in entry.frames) + sum(p.size for p in entry.poses)
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self._devices),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+frame_cache = FrameCache(settings.FRAME_CACHE_FRAMES_PER_DEVICE, settings.FRAME_CACHE_MAX_BYTES)
@@ -0,0 +1,1158 @@
+"""内存存储后端 - 无需 MongoDB / InfluxDB / Redis 即可运行真实服务代码
+
+实现服务层用到的 Motor / influxdb-client / redis.asyncio 接口子集，
+用于压测、基准测试和 CI。语义尽量贴近原库: 读出的文档是副本，
+枚举按值存储 (与 BSON 编码一致)，未覆盖的操作符直接抛 NotImplementedError
+而不是静默返回错误结果。
+"""
+import bisect
+import fnmatch
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+_MISSING = object()
+
+
+# ==================== 文档工具 ====================
+
+def _copy(value):
+    """复制文档 (只含 dict/list/标量，比 deepcopy 快得多)，枚举转为其值"""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, tuple):
+        return [_copy(v) for v in value]
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _get_path(doc, path: str):
+    """按点号路径取值，不存在返回 _MISSING"""
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            index = int(part)
+            value = value[index] if index < len(value) else _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(doc: dict, path: str, value):
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        child = target.get(part)
+        if not isinstance(child, dict):
+            child = target[part] = {}
+        target = child
+    target[parts[-1]] = value
+
+
+def _unset_path(doc: dict, path: str):
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        target = target.get(part)
+        if not isinstance(target, dict):
+            return
+    target.pop(parts[-1], None)
+
+
+def _type_rank(value) -> int:
+    # 近似 BSON 比较顺序: null < 数字 < 字符串 < 对象 < 数组 < ObjectId < bool < 日期
+    if value is None or value is _MISSING:
+        return 0
+    if isinstance(value, bool):
+        return 6
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, ObjectId):
+        return 5
+    if isinstance(value, datetime):
+        return 7
+    return 8
+
+
+def _sort_key(value):
+    rank = _type_rank(value)
+    if rank in (0, 3, 4, 8):
+        return (rank, 0)
+    return (rank, value)
+
+
+def _compare(a, b) -> Optional[int]:
+    """同类型比较，类型不同返回 None (与 MongoDB 一样不参与范围匹配)"""
+    if a is _MISSING or b is _MISSING:
+        return None
+    ra, rb = _type_rank(a), _type_rank(b)
+    if ra != rb or ra in (0, 3, 4, 8):
+        return 0 if a == b else None
+    return (a > b) - (a < b)
+
+
+# ==================== 查询匹配 ====================
+
+def _match_operator(value, op: str, arg) -> bool:
+    if op == "$eq":
+        return _match_value(value, arg)
+    if op == "$ne":
+        return not _match_value(value, arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        candidates = value if isinstance(value, list) else [value]
+        for candidate in candidates:
+            c = _compare(candidate, arg)
+            if c is None:
+                continue
+            if (op == "$gt" and c > 0) or (op == "$gte" and c >= 0) \
+                    or (op == "$lt" and c < 0) or (op == "$lte" and c <= 0):
+                return True
+        return False
+    if op == "$in":
+        return any(_match_value(value, a) for a in arg)
+    if op == "$nin":
+        return not any(_match_value(value, a) for a in arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$regex":
+        return isinstance(value, str) and re.search(arg, value) is not None
+    raise NotImplementedError(f"内存后端不支持查询操作符 {op}")
+
+
+def _match_value(value, expected) -> bool:
+    if isinstance(expected, Enum):
+        expected = expected.value
+    if value is _MISSING:
+        return expected is None
+    if value == expected:
+        return True
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return False
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    """判断文档是否满足查询条件"""
+    if not query:
+        return True
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+            continue
+        if key == "$nor":
+            if any(matches(doc, q) for q in condition):
+                return False
+            continue
+
+        value = _get_path(doc, key)
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            for op, arg in condition.items():
+                if op == "$options":
+                    continue
+                if op == "$regex" and "$options" in condition:
+                    arg = f"(?{condition['$options']}){arg}"
+                if not _match_operator(value, op, arg):
+                    return False
+        elif not _match_value(value, condition):
+            return False
+    return True
+
+
+# ==================== 表达式 / 更新 ====================
+
+_DATE_FORMAT_MAP = {"%Y": "%Y", "%m": "%m", "%d": "%d", "%H": "%H", "%M": "%M", "%S": "%S", "%j": "%j"}
+
+
+def _date_to_string(fmt: str, date: datetime) -> str:
+    result = fmt
+    for mongo_spec, py_spec in _DATE_FORMAT_MAP.items():
+        result = result.replace(mongo_spec, date.strftime(py_spec))
+    return result.replace("%L", f"{date.microsecond // 1000:03d}")
+
+
+def evaluate(expr, doc: dict):
+    """计算聚合表达式"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get_path(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, list):
+        return [evaluate(e, doc) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) == 1:
+        op, arg = next(iter(expr.items()))
+        if op.startswith("$"):
+            return _evaluate_operator(op, arg, doc)
+    return {k: evaluate(v, doc) for k, v in expr.items()}
+
+
+def _evaluate_operator(op: str, arg, doc: dict):
+    if op == "$literal":
+        return arg
+    if op == "$dateToString":
+        date = evaluate(arg["date"], doc)
+        return None if date is None else _date_to_string(arg.get("format", "%Y-%m-%dT%H:%M:%S.%LZ"), date)
+
+    args = evaluate(arg, doc)
+    if op == "$add":
+        if any(isinstance(a, datetime) for a in args):
+            base = next(a for a in args if isinstance(a, datetime))
+            ms = sum(a for a in args if not isinstance(a, datetime))
+            return base + timedelta(milliseconds=ms)
+        return sum(a for a in args if a is not None)
+    if op == "$subtract":
+        a, b = args
+        if isinstance(a, datetime) and isinstance(b, datetime):
+            return (a - b).total_seconds() * 1000
+        return a - b
+    if op == "$multiply":
+        result = 1
+        for a in args:
+            result *= a
+        return result
+    if op == "$divide":
+        return args[0] / args[1]
+    if op in ("$toInt", "$toLong"):
+        return None if args is None else int(args)
+    if op == "$toDouble":
+        return None if args is None else float(args)
+    if op == "$ifNull":
+        return next((a for a in args if a is not None), None)
+    if op in ("$max", "$min"):
+        values = [a for a in (args if isinstance(args, list) else [args]) if a is not None]
+        if not values:
+            return None
+        return max(values, key=_sort_key) if op == "$max" else min(values, key=_sort_key)
+    raise NotImplementedError(f"内存后端不支持表达式 {op}")
+
+
+def apply_update(doc: dict, update, is_insert: bool = False):
+    """原地应用更新 (操作符文档或聚合管道)"""
+    if isinstance(update, list):
+        for stage in update:
+            (op, spec), = stage.items()
+            if op in ("$set", "$addFields"):
+                values = {k: _copy(evaluate(v, doc)) for k, v in spec.items()}
+                for path, value in values.items():
+                    _set_path(doc, path, value)
+            elif op in ("$unset",):
+                for path in ([spec] if isinstance(spec, str) else spec):
+                    _unset_path(doc, path)
+            else:
+                raise NotImplementedError(f"内存后端不支持更新管道阶段 {op}")
+        return
+
+    for op, spec in update.items():
+        if op == "$set":
+            for path, value in spec.items():
+                _set_path(doc, path, _copy(value))
+        elif op == "$setOnInsert":
+            if is_insert:
+                for path, value in spec.items():
+                    _set_path(doc, path, _copy(value))
+        elif op == "$unset":
+            for path in spec:
+                _unset_path(doc, path)
+        elif op == "$inc":
+            for path, amount in spec.items():
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + amount)
+        elif op in ("$max", "$min"):
+            for path, value in spec.items():
+                current = _get_path(doc, path)
+                c = None if current is _MISSING else _compare(value, current)
+                if current is _MISSING or (op == "$max" and c and c > 0) or (op == "$min" and c and c < 0):
+                    _set_path(doc, path, _copy(value))
+        elif op == "$push":
+            for path, value in spec.items():
+                current = _get_path(doc, path)
+                items = current if isinstance(current, list) else []
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(_copy(value["$each"]))
+                    if "$slice" in value:
+                        n = value["$slice"]
+                        items[:] = items[n:] if n < 0 else items[:n]
+                else:
+                    items.append(_copy(value))
+                _set_path(doc, path, items)
+        elif op == "$addToSet":
+            for path, value in spec.items():
+                current = _get_path(doc, path)
+                items = current if isinstance(current, list) else []
+                if value not in items:
+                    items.append(_copy(value))
+                _set_path(doc, path, items)
+        else:
+            raise NotImplementedError(f"内存后端不支持更新操作符 {op}")
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v}
+    if include:
+        result = {}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for path in include:
+            if path == "_id":
+                continue
+            value = _get_path(doc, path)
+            if value is not _MISSING:
+                _set_path(result, path, value)
+        return result
+    for path in projection:
+        _unset_path(doc, path)
+    return doc
+
+
+def _sort_docs(docs: List[dict], spec: List[Tuple[str, int]]) -> List[dict]:
+    # 从次要键到主要键依次稳定排序
+    for field, direction in reversed(spec):
+        docs.sort(key=lambda d: _sort_key(_get_path(d, field)), reverse=direction < 0)
+    return docs
+
+
+def _normalize_sort(key_or_list, direction=None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+# ==================== 聚合 ====================
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class _Accumulator:
+    __slots__ = ("op", "expr", "value", "count")
+
+    def __init__(self, op: str, expr):
+        self.op = op
+        self.expr = expr
+        self.value = [] if op in ("$push", "$addToSet") else None
+        self.count = 0
+
+    def add(self, doc: dict):
+        value = evaluate(self.expr, doc)
+        op = self.op
+        if op == "$sum":
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.value = (self.value or 0) + value
+            elif self.value is None:
+                self.value = 0
+        elif op == "$avg":
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.value = (self.value or 0) + value
+                self.count += 1
+        elif op in ("$max", "$min"):
+            if value is None:
+                return
+            if self.value is None:
+                self.value = value
+            else:
+                c = _compare(value, self.value)
+                if c is not None and ((op == "$max" and c > 0) or (op == "$min" and c < 0)):
+                    self.value = value
+        elif op == "$first":
+            if self.count == 0:
+                self.value = value
+            self.count += 1
+        elif op == "$last":
+            self.value = value
+        elif op == "$push":
+            self.value.append(value)
+        elif op == "$addToSet":
+            if value not in self.value:
+                self.value.append(value)
+        else:
+            raise NotImplementedError(f"内存后端不支持累加器 {op}")
+
+    def result(self):
+        if self.op == "$avg":
+            return self.value / self.count if self.count else None
+        return self.value
+
+
+def _group(docs: Iterable[dict], spec: dict) -> List[dict]:
+    id_expr = spec["_id"]
+    fields = {k: v for k, v in spec.items() if k != "_id"}
+    groups: Dict[Any, Tuple[Any, Dict[str, _Accumulator]]] = {}
+    for doc in docs:
+        group_id = evaluate(id_expr, doc)
+        key = _freeze(group_id)
+        entry = groups.get(key)
+        if entry is None:
+            accumulators = {}
+            for name, acc_spec in fields.items():
+                (op, expr), = acc_spec.items()
+                accumulators[name] = _Accumulator(op, expr)
+            entry = groups[key] = (group_id, accumulators)
+        for accumulator in entry[1].values():
+            accumulator.add(doc)
+    return [
+        {"_id": group_id, **{name: acc.result() for name, acc in accumulators.items()}}
+        for group_id, accumulators in groups.values()
+    ]
+
+
+def aggregate(docs: List[dict], pipeline: List[dict]) -> List[dict]:
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = [d for d in docs if matches(d, spec)]
+        elif op == "$group":
+            docs = _group(docs, spec)
+        elif op == "$sort":
+            docs = _sort_docs(docs, list(spec.items()))
+        elif op == "$limit":
+            docs = docs[:spec]
+        elif op == "$skip":
+            docs = docs[spec:]
+        elif op == "$project":
+            flags = {k: v for k, v in spec.items() if isinstance(v, (bool, int)) and v in (0, 1)}
+            computed = {k: v for k, v in spec.items() if k not in flags}
+            projected = []
+            for d in docs:
+                base = _project(dict(d), flags) if flags or not computed else (
+                    {"_id": d["_id"]} if "_id" in d else {})
+                for k, v in computed.items():
+                    _set_path(base, k, evaluate(v, d))
+                projected.append(base)
+            docs = projected
+        elif op in ("$set", "$addFields"):
+            for d in docs:
+                apply_update(d, [stage])
+        elif op == "$count":
+            docs = [{spec: len(docs)}]
+        else:
+            raise NotImplementedError(f"内存后端不支持聚合阶段 {op}")
+    return docs
+
+
+# ==================== Motor 接口 ====================
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.upserted_ids: Dict[int, Any] = {}
+        self.acknowledged = True
+
+
+class MemoryCursor:
+    """find() / aggregate() 返回的游标"""
+
+    def __init__(self, producer):
+        self._producer = producer
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._docs: Optional[List[dict]] = None
+
+    def sort(self, key_or_list, direction=None) -> "MemoryCursor":
+        self._sort.extend(_normalize_sort(key_or_list, direction))
+        return self
+
+    def skip(self, n: int) -> "MemoryCursor":
+        self._skip = n
+        return self
+
+    def limit(self, n: int) -> "MemoryCursor":
+        self._limit = n
+        return self
+
+    def batch_size(self, n: int) -> "MemoryCursor":
+        return self
+
+    def _materialize(self) -> List[dict]:
+        if self._docs is None:
+            docs = self._producer()
+            if self._sort:
+                docs = _sort_docs(docs, self._sort)
+            if self._skip:
+                docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._docs = docs
+        return self._docs
+
+    def __aiter__(self):
+        self._iter = iter(self._materialize())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        docs = self._materialize()
+        return list(docs if length is None else docs[:length])
+
+
+class MemoryCollection:
+    """AsyncIOMotorCollection 子集"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, dict] = {}
+
+    # --- 内部 ---
+
+    def _iter_matching(self, query: Optional[dict]):
+        if query and "_id" in query and not isinstance(query["_id"], dict):
+            doc = self._docs.get(query["_id"])
+            if doc is not None and matches(doc, query):
+                yield doc
+            return
+        for doc in self._docs.values():
+            if matches(doc, query):
+                yield doc
+
+    def _first_matching(self, query: Optional[dict], sort=None) -> Optional[dict]:
+        if sort:
+            docs = _sort_docs(list(self._iter_matching(query)), _normalize_sort(sort))
+            return docs[0] if docs else None
+        return next(self._iter_matching(query), None)
+
+    def _insert(self, document: dict):
+        doc = _copy(document)
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        if doc["_id"] in self._docs:
+            raise ValueError(f"E11000 duplicate key error collection: {self.name}")
+        self._docs[doc["_id"]] = doc
+        # 与 pymongo 一致: 把生成的 _id 写回调用方的字典
+        document.setdefault("_id", doc["_id"])
+        return doc["_id"]
+
+    def _upsert_doc(self, query: dict, update) -> dict:
+        doc = {k: _copy(v) for k, v in (query or {}).items()
+               if not k.startswith("$") and not (isinstance(v, dict) and any(op.startswith("$") for op in v))}
+        apply_update(doc, update, is_insert=True)
+        self._insert(doc)
+        return self._docs[doc["_id"]]
+
+    # --- 写入 ---
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        return InsertOneResult(self._insert(document))
+
+    async def insert_many(self, documents: Iterable[dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        return InsertManyResult([self._insert(d) for d in documents])
+
+    async def update_one(self, filter: dict, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        doc = self._first_matching(filter)
+        if doc is None:
+            if upsert:
+                return UpdateResult(0, 0, self._upsert_doc(filter, update)["_id"])
+            return UpdateResult(0, 0)
+        before = _copy(doc)
+        apply_update(doc, update)
+        return UpdateResult(1, int(doc != before))
+
+    async def update_many(self, filter: dict, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched = modified = 0
+        for doc in list(self._iter_matching(filter)):
+            before = _copy(doc)
+            apply_update(doc, update)
+            matched += 1
+            modified += int(doc != before)
+        if matched == 0 and upsert:
+            return UpdateResult(0, 0, self._upsert_doc(filter, update)["_id"])
+        return UpdateResult(matched, modified)
+
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        doc = self._first_matching(filter)
+        if doc is None:
+            if upsert:
+                new_doc = _copy(replacement)
+                return UpdateResult(0, 0, self._insert(new_doc))
+            return UpdateResult(0, 0)
+        new_doc = _copy(replacement)
+        new_doc["_id"] = doc["_id"]
+        self._docs[doc["_id"]] = new_doc
+        return UpdateResult(1, int(new_doc != doc))
+
+    async def find_one_and_update(self, filter: dict, update, projection: Optional[dict] = None,
+                                  sort=None, upsert: bool = False, return_document: bool = False,
+                                  **kwargs) -> Optional[dict]:
+        doc = self._first_matching(filter, sort)
+        if doc is None:
+            if not upsert:
+                return None
+            doc = self._upsert_doc(filter, update)
+            return _project(_copy(doc), projection) if return_document else None
+        before = _copy(doc)
+        apply_update(doc, update)
+        return _project(_copy(doc) if return_document else before, projection)
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        doc = self._first_matching(filter)
+        if doc is None:
+            return DeleteResult(0)
+        del self._docs[doc["_id"]]
+        return DeleteResult(1)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        ids = [d["_id"] for d in self._iter_matching(filter)]
+        for _id in ids:
+            del self._docs[_id]
+        return DeleteResult(len(ids))
+
+    async def bulk_write(self, requests: Iterable, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        """执行 pymongo 的 InsertOne / UpdateOne / UpdateMany / ReplaceOne / DeleteOne / DeleteMany"""
+        result = BulkWriteResult()
+        for i, request in enumerate(requests):
+            kind = type(request).__name__
+            if kind == "InsertOne":
+                await self.insert_one(request._doc)
+                result.inserted_count += 1
+                continue
+            if kind in ("DeleteOne", "DeleteMany"):
+                method = self.delete_one if kind == "DeleteOne" else self.delete_many
+                result.deleted_count += (await method(request._filter)).deleted_count
+                continue
+            if kind == "ReplaceOne":
+                r = await self.replace_one(request._filter, request._doc, upsert=request._upsert)
+            elif kind in ("UpdateOne", "UpdateMany"):
+                method = self.update_one if kind == "UpdateOne" else self.update_many
+                r = await method(request._filter, request._doc, upsert=request._upsert)
+            else:
+                raise TypeError(f"unsupported bulk operation: {kind}")
+            result.matched_count += r.matched_count
+            result.modified_count += r.modified_count
+            if r.upserted_id is not None:
+                result.upserted_count += 1
+                result.upserted_ids[i] = r.upserted_id
+        return result
+
+    # --- 读取 ---
+
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None,
+                       sort=None, **kwargs) -> Optional[dict]:
+        doc = self._first_matching(filter, sort)
+        return None if doc is None else _project(_copy(doc), projection)
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> MemoryCursor:
+        return MemoryCursor(lambda: [_project(_copy(d), projection) for d in self._iter_matching(filter)])
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> MemoryCursor:
+        def run():
+            # 首个 $match 先过滤再复制，和服务端走索引一样只处理命中的文档
+            if pipeline and "$match" in pipeline[0]:
+                return aggregate([_copy(d) for d in self._iter_matching(pipeline[0]["$match"])], pipeline[1:])
+            return aggregate([_copy(d) for d in self._docs.values()], pipeline)
+
+        return MemoryCursor(run)
+
+    async def count_documents(self, filter: Optional[dict] = None, **kwargs) -> int:
+        return sum(1 for _ in self._iter_matching(filter))
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    async def distinct(self, key: str, filter: Optional[dict] = None, **kwargs) -> list:
+        seen = {}
+        for doc in self._iter_matching(filter):
+            value = _get_path(doc, key)
+            if value is _MISSING:
+                continue
+            for item in value if isinstance(value, list) else (value,):
+                seen.setdefault(_freeze(item), _copy(item))
+        return list(seen.values())
+
+    async def create_index(self, keys, **kwargs) -> str:
+        return "_".join(f"{k}_{d}" for k, d in _normalize_sort(keys, 1))
+
+
+class MemoryDatabase:
+    """AsyncIOMotorDatabase 子集"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(name)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+
+class MemoryMongoClient:
+    """AsyncIOMotorClient 子集"""
+
+    def __init__(self):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = MemoryDatabase(name)
+        return database
+
+    def close(self):
+        pass
+
+
+# ==================== InfluxDB ====================
+
+class CapturingWriteApi:
+    """记录写入点的 Influx WriteApi (保留最近 max_points 个)"""
+
+    def __init__(self, max_points: int = 100_000):
+        self.max_points = max_points
+        self.points = deque(maxlen=max_points)
+        self.writes = 0
+
+    def reserve(self, count: int):
+        """扩容使已有的点与之后的 count 个点都能保留，并仍留出 max_points 个位置给运行期写入"""
+        needed = len(self.points) + count + self.max_points
+        if needed > self.points.maxlen:
+            self.points = deque(self.points, maxlen=needed)
+
+    def write(self, bucket: str, record=None, **kwargs):
+        self.writes += 1
+        records = record if isinstance(record, list) else [record]
+        for r in records:
+            self.points.append((bucket, r))
+
+    def pending(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+    def points_for(self, measurement: str) -> list:
+        return [p for _, p in self.points if getattr(p, "_name", None) == measurement]
+
+
+class MemoryQueryApi:
+    """记录 Flux 查询，返回空结果"""
+
+    def __init__(self):
+        self.queries: List[str] = []
+
+    def query(self, query: str, org=None, params=None, **kwargs) -> list:
+        self.queries.append(query)
+        return []
+
+
+class MemoryInfluxClient:
+    """InfluxDBClient 子集"""
+
+    def __init__(self, max_points: int = 100_000):
+        self.write_api_instance = CapturingWriteApi(max_points)
+        self.query_api_instance = MemoryQueryApi()
+
+    def write_api(self, **kwargs) -> CapturingWriteApi:
+        return self.write_api_instance
+
+    def query_api(self, **kwargs) -> MemoryQueryApi:
+        return self.query_api_instance
+
+    def close(self):
+        pass
+
+
+# ==================== Redis ====================
+
+class _SortedSet:
+    """有序集合: 成员 -> 分数，另按 (分数, 成员) 保持有序 (与 Redis 的排序规则一致)"""
+
+    __slots__ = ("scores", "order")
+
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self.order: List[Tuple[float, str]] = []
+
+    def add(self, member: str, score: float):
+        old = self.scores.get(member)
+        if old is not None:
+            del self.order[bisect.bisect_left(self.order, (old, member))]
+        self.scores[member] = score
+        bisect.insort(self.order, (score, member))
+
+    def remove(self, member: str) -> bool:
+        old = self.scores.pop(member, None)
+        if old is None:
+            return False
+        del self.order[bisect.bisect_left(self.order, (old, member))]
+        return True
+
+    def rank(self, member: str) -> Optional[int]:
+        score = self.scores.get(member)
+        return None if score is None else bisect.bisect_left(self.order, (score, member))
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+
+class MemoryRedis:
+    """redis.asyncio.Redis 子集 (decode_responses=True 语义: 返回 str)"""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expire_at: Dict[str, float] = {}
+
+    # --- 内部 ---
+
+    def _alive(self, key: str) -> bool:
+        expire_at = self._expire_at.get(key)
+        if expire_at is not None and expire_at <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expire_at[key]
+            return False
+        return key in self._data
+
+    def _get(self, key: str, factory=None):
+        if not self._alive(key):
+            if factory is None:
+                return None
+            self._data[key] = factory()
+        return self._data[key]
+
+    @staticmethod
+    def _str(value) -> str:
+        if isinstance(value, bytes):
+            return value.decode()
+        if isinstance(value, float):
+            return repr(value)
+        return str(value)
+
+    # --- 通用 ---
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+    async def flushdb(self):
+        self._data.clear()
+        self._expire_at.clear()
+
+    async def exists(self, *keys: str) -> int:
+        return sum(1 for k in keys if self._alive(k))
+
+    async def delete(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                removed += 1
+            self._expire_at.pop(key, None)
+        return removed
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        if not self._alive(key):
+            return False
+        self._expire_at[key] = time.monotonic() + seconds
+        return True
+
+    async def ttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        expire_at = self._expire_at.get(key)
+        return -1 if expire_at is None else max(int(expire_at - time.monotonic()), 0)
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        return [k for k in list(self._data) if self._alive(k) and fnmatch.fnmatchcase(k, pattern)]
+
+    async def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None):
+        for key in await self.keys(match or "*"):
+            yield key
+
+    # --- 字符串 ---
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._get(key)
+
+    async def mget(self, keys, *args) -> List[Optional[str]]:
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        return [self._get(k) for k in keys + list(args)]
+
+    async def set(self, key: str, value, ex: Optional[int] = None, px: Optional[int] = None,
+                  nx: bool = False, xx: bool = False) -> Optional[bool]:
+        exists = self._alive(key)
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._data[key] = self._str(value)
+        self._expire_at.pop(key, None)
+        if ex is not None:
+            self._expire_at[key] = time.monotonic() + ex
+        elif px is not None:
+            self._expire_at[key] = time.monotonic() + px / 1000
+        return True
+
+    async def incrby(self, key: str, amount: int = 1) -> int:
+        value = int(self._get(key) or 0) + amount
+        self._data[key] = str(value)
+        return value
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        return await self.incrby(key, amount)
+
+    async def incrbyfloat(self, key: str, amount: float = 1.0) -> float:
+        value = float(self._get(key) or 0) + amount
+        self._data[key] = repr(value)
+        return value
+
+    # --- 哈希 ---
+
+    async def hset(self, name: str, key: Optional[str] = None, value=None, mapping: Optional[dict] = None) -> int:
+        h = self._get(name, dict)
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        added = sum(1 for k in items if k not in h)
+        for k, v in items.items():
+            h[self._str(k)] = self._str(v)
+        return added
+
+    async def hget(self, name: str, key: str) -> Optional[str]:
+        h = self._get(name)
+        return None if h is None else h.get(key)
+
+    async def hgetall(self, name: str) -> Dict[str, str]:
+        return dict(self._get(name) or {})
+
+    async def hdel(self, name: str, *keys: str) -> int:
+        h = self._get(name) or {}
+        return sum(1 for k in keys if h.pop(k, None) is not None)
+
+    async def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        h = self._get(name, dict)
+        value = int(h.get(key, 0)) + amount
+        h[key] = str(value)
+        return value
+
+    async def hincrbyfloat(self, name: str, key: str, amount: float = 1.0) -> float:
+        h = self._get(name, dict)
+        value = float(h.get(key, 0)) + amount
+        h[key] = repr(value)
+        return value
+
+    async def hmget(self, name: str, keys, *args) -> List[Optional[str]]:
+        h = self._get(name) or {}
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        return [h.get(k) for k in keys + list(args)]
+
+    # --- 有序集合 ---
+
+    async def zadd(self, name: str, mapping: Dict[str, float], nx: bool = False, xx: bool = False,
+                   gt: bool = False, lt: bool = False) -> int:
+        z = self._get(name, _SortedSet)
+        added = 0
+        for member, score in mapping.items():
+            member, score = self._str(member), float(score)
+            old = z.scores.get(member)
+            if (nx and old is not None) or (xx and old is None):
+                continue
+            if old is not None and ((gt and score <= old) or (lt and score >= old)):
+                continue
+            added += old is None
+            z.add(member, score)
+        return added
+
+    async def zincrby(self, name: str, amount: float, value) -> float:
+        z = self._get(name, _SortedSet)
+        member = self._str(value)
+        score = z.scores.get(member, 0.0) + amount
+        z.add(member, score)
+        return score
+
+    async def zrem(self, name: str, *values) -> int:
+        z = self._get(name)
+        return 0 if z is None else sum(1 for v in values if z.remove(self._str(v)))
+
+    async def zscore(self, name: str, value) -> Optional[float]:
+        z = self._get(name)
+        return None if z is None else z.scores.get(self._str(value))
+
+    async def zcard(self, name: str) -> int:
+        z = self._get(name)
+        return 0 if z is None else len(z)
+
+    async def zrank(self, name: str, value) -> Optional[int]:
+        z = self._get(name)
+        return None if z is None else z.rank(self._str(value))
+
+    async def zrevrank(self, name: str, value) -> Optional[int]:
+        rank = await self.zrank(name, value)
+        return None if rank is None else len(self._get(name)) - 1 - rank
+
+    async def zrange(self, name: str, start: int, end: int, desc: bool = False, withscores: bool = False):
+        z = self._get(name)
+        if z is None:
+            return []
+        n = len(z)
+        start = max(start + n if start < 0 else start, 0)
+        end = min(end + n if end < 0 else end, n - 1)
+        if start > end:
+            return []
+        if desc:
+            items = z.order[n - 1 - end:n - start][::-1]
+        else:
+            items = z.order[start:end + 1]
+        return [(m, s) for s, m in items] if withscores else [m for _, m in items]
+
+    async def zrevrange(self, name: str, start: int, end: int, withscores: bool = False):
+        return await self.zrange(name, start, end, desc=True, withscores=withscores)
+
+    async def rename(self, src: str, dst: str) -> bool:
+        if not self._alive(src):
+            raise KeyError("no such key")
+        self._data[dst] = self._data.pop(src)
+        self._expire_at.pop(dst, None)
+        if src in self._expire_at:
+            self._expire_at[dst] = self._expire_at.pop(src)
+        return True
+
+    # --- 管道 ---
+
+    def pipeline(self, transaction: bool = True) -> "MemoryPipeline":
+        return MemoryPipeline(self)
+
+
+class MemoryPipeline:
+    """收集命令，execute() 时按顺序执行"""
+
+    def __init__(self, redis_client: MemoryRedis):
+        self._redis = redis_client
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or not hasattr(self._redis, name):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return command
+
+    async def execute(self) -> list:
+        results = []
+        for name, args, kwargs in self._commands:
+            results.append(await getattr(self._redis, name)(*args, **kwargs))
+        self._commands = []
+        return results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._commands = []
+
+
+# ==================== 种子数据 ====================
+
+def load_seed_files(database: MemoryDatabase, write_api: CapturingWriteApi, path: str,
+                    bucket: str) -> Dict[str, int]:
+    """加载 app.datagen --target files 生成的 <集合>-<worker>.jsonl 与 pose_data-<worker>.jsonl
+
+    姿态点写入 bucket (与运行期写入同一个桶)，写入缓冲按种子点数扩容，不会截断。
+    """
+    import glob
+    import json
+    import os
+
+    from bson import json_util
+    from influxdb_client import Point
+
+    counts: Dict[str, int] = {}
+    for file in sorted(glob.glob(os.path.join(path, "*-*.jsonl"))):
+        name = os.path.basename(file).rsplit("-", 1)[0]
+        loaded = 0
+        with open(file, encoding="utf-8") as f:
+            if name == "pose_data":
+                write_api.reserve(sum(1 for _ in f))
+                f.seek(0)
+                for line in f:
+                    p = json.loads(line)
+                    point = Point(name).time(p["time"])
+                    for key, value in p["tags"].items():
+                        point.tag(key, value)
+                    for key, value in p["fields"].items():
+                        point.field(key, value)
+                    write_api.write(bucket=bucket, record=point)
+                    loaded += 1
+            else:
+                docs = database[name]._docs
+                for line in f:
+                    doc = json_util.loads(line)
+                    docs[doc["_id"]] = doc
+                    loaded += 1
+        counts[name] = counts.get(name, 0) + loaded
+    return counts
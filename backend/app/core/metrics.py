@@ -0,0 +1,328 @@
+"""Prometheus 指标 - 轻量注册表与热路径埋点
+
+设计约束: 指标会留在视频转发热路径上，因此
+- 不加锁: 事件循环单线程更新; Mongo 命令监听在 Motor 线程池中触发，
+  依赖 GIL 下 int/float 自增的近似原子性，偶发丢计数可以接受
+- 热路径不分配标签字典: labels() 返回按标签值元组缓存的子指标，
+  调用方应预先取出子指标并复用
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """指标基类: 按标签值缓存子指标"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return "\n".join(lines)
+
+    def _render_child(self, values, child):
+        yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """采集时调用 function 取值，适合从现有数据结构读取的量"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._children[()].set_function(function)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # 最后一格为 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """直方图 (渲染时再累加成 Prometheus 的累积桶)"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _render_child(self, values, child):
+        cumulative = 0
+        counts = list(child.counts)
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+        labels = _format_labels(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in list(self._metrics.values())) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route")
+)
+HTTP_COMPRESSION_BYTES = REGISTRY.counter(
+    "http_compression_bytes_total", "HTTP response bytes before (in) and after (out) compression",
+    ("encoding", "direction")
+)
+
+# WebSocket
+WS_MESSAGES_RECEIVED = REGISTRY.counter(
+    "ws_messages_received_total", "WebSocket messages received by endpoint and type",
+    ("endpoint", "type")
+)
+WS_BYTES_RECEIVED = REGISTRY.counter(
+    "ws_received_bytes_total", "WebSocket payload bytes received", ("endpoint",)
+)
+WS_BYTES_SENT = REGISTRY.counter(
+    "ws_sent_bytes_total", "WebSocket payload bytes sent", ("endpoint",)
+)
+WS_ACTIVE_CONNECTIONS = REGISTRY.gauge(
+    "ws_active_connections", "Active WebSocket connections", ("kind",)
+)
+WS_ROUTING_REDIRECTS = REGISTRY.counter(
+    "ws_routing_redirects_total", "WebSocket connections redirected to the owning worker", ("kind",)
+)
+
+# 准入控制
+ADMISSION_REJECTED = REGISTRY.counter(
+    "admission_rejected_total", "Requests and device messages rejected by admission control",
+    ("scope", "reason")
+)
+ADMISSION_INFLIGHT = REGISTRY.gauge(
+    "admission_inflight", "Admitted requests and device messages currently being handled"
+)
+
+# 存储
+INFLUX_WRITE_QUEUE_DEPTH = REGISTRY.gauge(
+    "influx_write_queue_depth", "Influx asynchronous writes not yet completed"
+)
+MONGO_COMMAND_DURATION = REGISTRY.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection",
+    ("collection", "command")
+)
+
+# 执行器
+EXECUTOR_TASK_DURATION = REGISTRY.histogram(
+    "executor_task_duration_seconds", "Executor task queue wait and run time by pool and task type",
+    ("pool", "task", "stage")
+)
+EXECUTOR_TASKS = REGISTRY.counter(
+    "executor_tasks_total", "Executor tasks by pool, task type and outcome", ("pool", "task", "outcome")
+)
+EXECUTOR_QUEUE_DEPTH = REGISTRY.gauge(
+    "executor_queue_depth", "Executor tasks queued or running", ("pool",)
+)
+
+# 归档
+ARCHIVE_SESSIONS = REGISTRY.counter(
+    "archive_sessions_total", "Completed sessions written to the columnar archive by outcome", ("outcome",)
+)
+
+# 设备
+DEVICE_ANOMALIES = REGISTRY.counter(
+    "device_anomalies_total", "Device status changes raised by heartbeat anomaly detection",
+    ("metric", "status")
+)
+
+
+class MetricsMiddleware:
+    """按路由模板记录请求耗时 (纯 ASGI 中间件)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            template = route.path if route is not None else "__unmatched__"
+            HTTP_REQUEST_DURATION.labels(scope["method"], template).observe(
+                time.perf_counter() - started_at
+            )
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """MongoDB 命令耗时 (按集合)"""
+
+    def __init__(self):
+        # (connection_id, request_id) -> collection
+        self._pending: Dict[tuple, str] = {}
+
+    def started(self, event):
+        command = event.command
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        else:
+            collection = command.get(event.command_name)
+        if isinstance(collection, str):
+            self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), None)
+        if collection is not None:
+            MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(
+                event.duration_micros / 1_000_000
+            )
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
@@ -0,0 +1,143 @@
+"""训练计划批量计算 (NumPy 向量化)
+
+输入为一批用户的会话历史 (按列展开的数组)，一次计算出全部用户的:
+
+- 近期加权平均: 按会话距今天数指数衰减 (半衰期 PLAN_HALF_LIFE_DAYS)
+- 趋势: 各指标对时间的最小二乘斜率 (每周变化量)
+- 训练频率: 最近 4 周平均每周会话数
+- 薄弱项: 与 generate_ai_analysis 相同的阈值，或趋势明显变差
+- 目标指标、每周次数、单次时长、重点与建议
+
+所有按用户的累加都用 np.bincount 完成，不按用户循环；薄弱项组合成位掩码
+后查表得到重点与建议文本。内存只与本批会话数成正比，由调用方分批控制。
+"""
+from typing import List, NamedTuple
+
+import numpy as np
+
+# 会话列 (顺序即 SessionBatch.values 的列)
+FIELDS = (
+    "hit_rate", "reaction_time", "accuracy", "fatigue_level",
+    "calories_burned", "total_hits", "successful_hits", "duration_seconds",
+)
+HIT, REACTION, ACCURACY, FATIGUE, CALORIES, TOTAL_HITS, SUCCESSFUL_HITS, DURATION = range(len(FIELDS))
+
+# 薄弱项位掩码 -> (重点, 建议)
+WEAKNESSES = (
+    ("击球回传率", "建议降低发球速度，专注于击球准确性"),
+    ("反应速度", "增加反应训练，从低频率发球开始"),
+    ("姿态准确度", "关注动作规范性，可观看教学视频"),
+    ("体能恢复", "近期疲劳度偏高，适当缩短单次训练并安排休息日"),
+    ("训练频率", "保持每周至少 3 次训练，巩固动作记忆"),
+)
+LOW_HIT, SLOW_REACTION, LOW_ACCURACY, HIGH_FATIGUE, LOW_FREQUENCY = (1 << i for i in range(len(WEAKNESSES)))
+
+# 没有训练记录的用户使用入门计划
+STARTER_TARGETS = {
+    "hit_rate": 60.0, "reaction_time": 500.0, "accuracy": 70.0, "fatigue_level": 50.0,
+    "calories_burned": 150.0, "total_hits": 100, "successful_hits": 60,
+}
+STARTER_FOCUS = ["基础训练"]
+STARTER_RECOMMENDATIONS = ["从低速发球开始，逐步建立击球节奏"]
+# 没有薄弱项时
+STEADY_FOCUS = ["保持当前训练节奏"]
+STEADY_RECOMMENDATIONS = ["各项指标稳定，可逐步提高发球速度与频率"]
+
+
+class SessionBatch(NamedTuple):
+    """一批用户的会话: user_index[i] 为第 i 个会话所属用户在本批中的下标"""
+    user_index: np.ndarray  # int64 (k,)
+    age_days: np.ndarray    # float64 (k,) 会话距今天数
+    values: np.ndarray      # float64 (k, len(FIELDS))
+
+
+class PlanArrays(NamedTuple):
+    """按用户的计算结果 (长度均为本批用户数)"""
+    sessions: np.ndarray
+    targets: np.ndarray          # (n, 7) 依次为 STARTER_TARGETS 的键
+    weekly_sessions: np.ndarray
+    duration_minutes: np.ndarray
+    weakness_mask: np.ndarray
+    trends: np.ndarray           # (n, 3) hit_rate / reaction_time / accuracy 每周变化量
+
+
+def _focus_table() -> List[tuple]:
+    table = []
+    for mask in range(1 << len(WEAKNESSES)):
+        picked = [w for i, w in enumerate(WEAKNESSES) if mask >> i & 1]
+        if not picked:
+            table.append((STEADY_FOCUS, STEADY_RECOMMENDATIONS))
+            continue
+        table.append(([f for f, _ in picked], [r for _, r in picked]))
+    return table
+
+
+FOCUS_TABLE = _focus_table()
+
+
+def compute(batch: SessionBatch, users: int, half_life_days: float = 14.0) -> PlanArrays:
+    idx, age, x = batch
+    count = np.bincount(idx, minlength=users).astype(np.float64)
+    has = count > 0
+
+    def per_user(weights):
+        return np.bincount(idx, weights=weights, minlength=users)
+
+    # 近期加权平均
+    w = np.exp2(-age / half_life_days)
+    wsum = per_user(w)
+    wsum = np.where(wsum > 0, wsum, 1.0)
+    mean = np.stack([per_user(w * x[:, j]) for j in range(len(FIELDS))], axis=1) / wsum[:, None]
+
+    # 最小二乘斜率 (t 为天，取负的距今天数使时间向前为正)
+    t = -age
+    st, stt = per_user(t), per_user(t * t)
+    denom = count * stt - st * st
+    denom_ok = np.abs(denom) > 1e-9
+    trends = np.empty((users, 3))
+    for col, j in enumerate((HIT, REACTION, ACCURACY)):
+        sx, stx = per_user(x[:, j]), per_user(t * x[:, j])
+        slope = np.where(denom_ok, (count * stx - st * sx) / np.where(denom_ok, denom, 1.0), 0.0)
+        trends[:, col] = slope * 7
+
+    recent = per_user((age < 28).astype(np.float64)) / 4
+
+    mask = (
+        np.where((mean[:, HIT] < 60) | (trends[:, 0] < -1), LOW_HIT, 0)
+        | np.where((mean[:, REACTION] > 500) | (trends[:, 1] > 10), SLOW_REACTION, 0)
+        | np.where((mean[:, ACCURACY] < 70) | (trends[:, 2] < -1), LOW_ACCURACY, 0)
+        | np.where(mean[:, FATIGUE] > 60, HIGH_FATIGUE, 0)
+        | np.where(recent < 2, LOW_FREQUENCY, 0)
+    )
+    tired = (mask & HIGH_FATIGUE) > 0
+
+    # 目标: 在近期水平上提升一步，薄弱项步子更大；已在进步时按 4 周趋势外推 (有上限)
+    def raise_to(col, trend, weak_bit, step, cap, low, high):
+        weak = (mask & weak_bit) > 0
+        gain = np.minimum(np.maximum(np.where(weak, step * 1.5, step), trend * 4), cap)
+        return np.clip(mean[:, col] + gain, low, high)
+
+    hit = raise_to(HIT, trends[:, 0], LOW_HIT, 3.0, 10.0, 0, 100)
+    accuracy = raise_to(ACCURACY, trends[:, 2], LOW_ACCURACY, 3.0, 10.0, 0, 100)
+    rt_gain = np.minimum(np.maximum(np.where((mask & SLOW_REACTION) > 0, 30.0, 20.0), -trends[:, 1] * 4), 60.0)
+    reaction = np.maximum(mean[:, REACTION] - rt_gain, 150.0)
+    fatigue = np.clip(mean[:, FATIGUE] - np.where(tired, 10.0, 0.0), 0, 60)
+    calories = mean[:, CALORIES] * np.where(tired, 1.0, 1.05)
+    total_hits = np.rint(mean[:, TOTAL_HITS] * np.where(tired, 1.0, 1.1))
+    successful = np.rint(total_hits * hit / 100)
+
+    targets = np.stack([hit, reaction, accuracy, fatigue, calories, total_hits, successful], axis=1)
+    starter = np.array(list(STARTER_TARGETS.values()), dtype=np.float64)
+    targets = np.where(has[:, None], targets, starter)
+
+    weekly = np.where(tired, np.clip(np.rint(recent), 2, 5), np.clip(np.rint(recent) + 1, 3, 6))
+    minutes = np.clip(np.rint(mean[:, DURATION] / 60 / 5) * 5 - np.where(tired, 10, 0), 20, 60)
+
+    return PlanArrays(
+        sessions=count.astype(np.int64),
+        targets=targets,
+        weekly_sessions=np.where(has, weekly, 3).astype(np.int64),
+        duration_minutes=np.where(has, minutes, 30).astype(np.int64),
+        weakness_mask=np.where(has, mask, 0).astype(np.int64),
+        trends=np.where(has[:, None], trends, 0.0),
+    )
@@ -0,0 +1,183 @@
+"""连接池监控 - MongoDB CMAP 事件监听 + Redis 连接池计数"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+from pymongo import monitoring
+import redis.asyncio as redis
+
+
+class CheckoutLatency:
+    """借出连接耗时统计 (毫秒)"""
+
+    __slots__ = ("count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class _MongoPoolCounters:
+    """单个 MongoDB 服务器地址的连接池计数"""
+
+    __slots__ = ("total", "in_use", "waiters", "checkout_failed", "latency")
+
+    def __init__(self):
+        self.total = 0
+        self.in_use = 0
+        self.waiters = 0
+        self.checkout_failed = 0
+        self.latency = CheckoutLatency()
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """MongoDB CMAP 连接池事件监听器
+
+    Motor 在线程池中执行 pymongo 调用，同一次借出的 started/checked_out
+    事件在同一线程上依次触发，因此用线程局部变量记录借出开始时间。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pools: Dict[str, _MongoPoolCounters] = {}
+
+    def _counters(self, address) -> _MongoPoolCounters:
+        key = f"{address[0]}:{address[1]}"
+        counters = self._pools.get(key)
+        if counters is None:
+            counters = self._pools.setdefault(key, _MongoPoolCounters())
+        return counters
+
+    def pool_created(self, event):
+        with self._lock:
+            self._counters(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._counters(event.address).total += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._counters(event.address).total -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started_at = time.perf_counter()
+        with self._lock:
+            self._counters(event.address).waiters += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            counters = self._counters(event.address)
+            counters.waiters -= 1
+            counters.checkout_failed += 1
+
+    def connection_checked_out(self, event):
+        started_at = getattr(self._local, "started_at", None)
+        with self._lock:
+            counters = self._counters(event.address)
+            counters.waiters -= 1
+            counters.in_use += 1
+            if started_at is not None:
+                counters.latency.observe((time.perf_counter() - started_at) * 1000)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._counters(event.address).in_use -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                address: {
+                    "total": c.total,
+                    "in_use": c.in_use,
+                    "idle": max(c.total - c.in_use, 0),
+                    "waiters": max(c.waiters, 0),
+                    "checkout_failed": c.checkout_failed,
+                    "checkout_latency": c.latency.snapshot(),
+                }
+                for address, c in self._pools.items()
+            }
+
+
+class InstrumentedRedisPool(redis.BlockingConnectionPool):
+    """带计数的 Redis 阻塞连接池 (池满时排队等待而不是直接报错)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiters = 0
+        self.checkout_timeouts = 0
+        self.latency = CheckoutLatency()
+
+    async def get_connection(self, command_name, *keys, **options):
+        started_at = time.perf_counter()
+        self.waiters += 1
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except redis.ConnectionError as e:
+            # 池满等待超时 (区别于连接建立失败)
+            if isinstance(e.__cause__, asyncio.TimeoutError):
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            self.waiters -= 1
+        self.latency.observe((time.perf_counter() - started_at) * 1000)
+        return connection
+
+    def snapshot(self) -> dict:
+        in_use = len(self._in_use_connections)
+        idle = len(self._available_connections)
+        return {
+            "max_connections": self.max_connections,
+            "total": in_use + idle,
+            "in_use": in_use,
+            "idle": idle,
+            "waiters": self.waiters,
+            "checkout_timeouts": self.checkout_timeouts,
+            "checkout_latency": self.latency.snapshot(),
+        }
+
+
+def influx_pool_snapshot(influx_client, maxsize: int) -> dict:
+    """InfluxDB HTTP 连接池 (urllib3) 状态"""
+    pools = {}
+    rest_client = getattr(influx_client.api_client, "rest_client", None)
+    pool_manager: Optional[object] = getattr(rest_client, "pool_manager", None)
+    if pool_manager is not None:
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{pool.host}:{pool.port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+            }
+    return {"max_connections": maxsize, "pools": pools}
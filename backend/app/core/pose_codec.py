@@ -0,0 +1,187 @@
+"""姿态关键点紧凑编码 - 观看端订阅时可选 (pose_encoding="quantized")
+
+每条 pose_update 的 JSON 约 550 字节，编码后增量帧约 50 字节:
+
+- 坐标按 SCALE 量化为 int16 (归一化坐标精度 1e-4)
+- 关键帧携带全部量化值; 其余帧携带变化位图 (每分量 1 bit) 与变化分量
+  相对上一帧的差值 (zigzag varint，小幅移动每个分量 1 字节)
+- 每 KEYFRAME_INTERVAL 帧或关键点数量变化时发送关键帧
+
+二进制帧格式 (小端):
+    tag u8 = TAG_POSE | flags u8 | stream u8 | seq u16 | count u8 | dims u8
+    | confidence u8 (0-254, 255 表示缺省或非有限值)
+    | 关键帧: count*dims 个 int16 / 增量帧: 变化位图 + varint 差值
+
+stream 为订阅时分配给该设备的编号，随 "subscribed" 回复下发。
+只携带 keypoints 与 confidence，其余字段不转发。
+"""
+import math
+import struct
+from typing import Dict, List, Optional
+
+TAG_POSE = 0x02
+# 合并发送: tag u8 + 若干 (长度 u16 + 单条姿态编码)
+TAG_POSE_BATCH = 0x03
+
+FLAG_KEYFRAME = 0x01
+
+SCALE = 10000
+KEYFRAME_INTERVAL = 30
+MAX_STREAMS = 255
+
+_HEADER = struct.Struct("<BBBHBBB")
+_LENGTH = struct.Struct("<H")
+_INT16_MIN, _INT16_MAX = -32768, 32767
+# 可量化的取值范围 (超出时整条姿态改发 JSON，不截断)
+_VALUE_MIN, _VALUE_MAX = _INT16_MIN / SCALE, _INT16_MAX / SCALE
+
+
+def quantize(keypoints) -> Optional[List[int]]:
+    """展平并量化关键点，格式不符或取值超出 int16 范围 (含 NaN / inf) 时返回 None"""
+    values = []
+    dims = None
+    for point in keypoints:
+        if not isinstance(point, (list, tuple)) or (dims is not None and len(point) != dims):
+            return None
+        dims = len(point)
+        for v in point:
+            # NaN 与任何值比较都为 False，一并排除
+            if not isinstance(v, (int, float)) or not _VALUE_MIN <= v <= _VALUE_MAX:
+                return None
+            values.append(round(v * SCALE))
+    return values
+
+
+def _write_varint(out: bytearray, value: int):
+    value = (value << 1) ^ (value >> 31)  # zigzag
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class PoseEncoder:
+    """单个观看端连接上单个设备的编码状态"""
+
+    __slots__ = ("stream", "seq", "previous", "since_keyframe")
+
+    def __init__(self, stream: int):
+        self.stream = stream
+        self.seq = 0
+        self.previous: Optional[List[int]] = None
+        self.since_keyframe = 0
+
+    def encode(self, pose) -> Optional[bytes]:
+        """编码一条姿态数据 (dict，含 keypoints)，无法编码时返回 None"""
+        keypoints = pose.get("keypoints") if isinstance(pose, dict) else None
+        if not isinstance(keypoints, list) or not 0 < len(keypoints) <= 255:
+            return None
+        values = quantize(keypoints)
+        if not values:
+            return None
+        dims = len(values) // len(keypoints)
+        if dims > 255:
+            return None
+
+        confidence = pose.get("confidence")
+        confidence = (
+            min(max(int(confidence * 254 + 0.5), 0), 254)
+            if isinstance(confidence, (int, float)) and math.isfinite(confidence) else 255
+        )
+        previous = self.previous
+        keyframe = (
+            previous is None or len(previous) != len(values) or self.since_keyframe >= KEYFRAME_INTERVAL
+        )
+
+        out = bytearray(_HEADER.pack(
+            TAG_POSE, FLAG_KEYFRAME if keyframe else 0, self.stream, self.seq,
+            len(keypoints), dims, confidence
+        ))
+        if keyframe:
+            out += struct.pack(f"<{len(values)}h", *values)
+            self.since_keyframe = 0
+        else:
+            # 变化位图 + 仅变化分量的差值 (可见度等静止分量不占字节)
+            mask = bytearray((len(values) + 7) // 8)
+            deltas = bytearray()
+            for i, (current, last) in enumerate(zip(values, previous)):
+                if current != last:
+                    mask[i >> 3] |= 1 << (i & 7)
+                    _write_varint(deltas, current - last)
+            out += mask
+            out += deltas
+            self.since_keyframe += 1
+
+        self.previous = values
+        self.seq = (self.seq + 1) & 0xFFFF
+        return bytes(out)
+
+
+def pack_batch(payloads: List[bytes]) -> bytes:
+    out = bytearray((TAG_POSE_BATCH,))
+    for payload in payloads:
+        out += _LENGTH.pack(len(payload))
+        out += payload
+    return bytes(out)
+
+
+class PoseDecoder:
+    """参考解码器: 按 stream 维护上一帧，还原为 {"keypoints", "confidence"}"""
+
+    def __init__(self):
+        self._previous: Dict[int, List[int]] = {}
+        self._seq: Dict[int, int] = {}
+
+    def decode_batch(self, payload: bytes) -> List[dict]:
+        if not payload or payload[0] != TAG_POSE_BATCH:
+            raise ValueError("unknown payload tag")
+        poses = []
+        offset = 1
+        while offset < len(payload):
+            (length,) = _LENGTH.unpack_from(payload, offset)
+            offset += _LENGTH.size
+            poses.append(self.decode(payload[offset:offset + length]))
+            offset += length
+        return poses
+
+    def decode(self, payload: bytes) -> dict:
+        tag, flags, stream, seq, count, dims, confidence = _HEADER.unpack_from(payload)
+        if tag != TAG_POSE:
+            raise ValueError("unknown payload tag")
+        size = count * dims
+        offset = _HEADER.size
+
+        if flags & FLAG_KEYFRAME:
+            values = list(struct.unpack_from(f"<{size}h", payload, offset))
+        else:
+            previous = self._previous.get(stream)
+            if previous is None or len(previous) != size:
+                raise ValueError("delta frame without keyframe")
+            if self._seq.get(stream) != (seq - 1) & 0xFFFF:
+                raise ValueError("pose stream out of sequence")
+            mask = payload[offset:offset + (size + 7) // 8]
+            offset += len(mask)
+            values = []
+            for i, last in enumerate(previous):
+                if not mask[i >> 3] & (1 << (i & 7)):
+                    values.append(last)
+                    continue
+                value = shift = 0
+                while True:
+                    byte = payload[offset]
+                    offset += 1
+                    value |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                values.append(last + ((value >> 1) ^ -(value & 1)))
+
+        self._previous[stream] = values
+        self._seq[stream] = seq
+        return {
+            "stream": stream,
+            "seq": seq,
+            "keyframe": bool(flags & FLAG_KEYFRAME),
+            "keypoints": [[v / SCALE for v in values[i:i + dims]] for i in range(0, size, dims)],
+            "confidence": None if confidence == 255 else confidence / 254,
+        }
@@ -0,0 +1,212 @@
+"""按需性能剖析 - 采样事件循环线程的调用栈，输出 collapsed-stack 格式
+
+collapsed-stack 每行为 "frame1;frame2;...;frameN 次数"，可直接交给
+flamegraph.pl / speedscope 渲染火焰图。
+
+注意: 采样的是事件循环线程，被剖析请求执行期间同一线程上并发运行的
+其他协程也会出现在结果中，低负载时对单个请求的结论最准确。
+"""
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, Optional
+
+from .config import get_settings
+from .security import decode_token
+
+settings = get_settings()
+
+PROFILE_HEADER = b"x-profile"
+
+
+class StackSampler:
+    """后台线程定时采样目标线程的调用栈"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.active = True
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self.started_at = time.perf_counter()
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename.rsplit("/", 1)[-1]
+            label = self._labels[code] = f"{filename}:{code.co_qualname}"
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self) -> float:
+        """停止采样，返回耗时 (毫秒)"""
+        self._stop.set()
+        self._thread.join()
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class _DeviceProfile:
+    """设备 WebSocket 消息循环的剖析任务"""
+
+    __slots__ = ("sampler", "remaining", "messages")
+
+    def __init__(self, sampler: StackSampler, messages: int):
+        self.sampler = sampler
+        self.remaining = messages
+        self.messages = messages
+
+
+class Profiler:
+    """剖析开关、触发条件与结果存储"""
+
+    def __init__(self):
+        self.enabled = settings.PROFILING_ENABLED
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.interval = settings.PROFILING_INTERVAL_MS / 1000
+        self.results: Deque[dict] = deque(maxlen=settings.PROFILING_MAX_RESULTS)
+        # 同一时刻只剖析一个 HTTP 请求，避免采样互相干扰
+        self.http_busy = False
+        # 设备剖析: ws_armed 为 False 时设备循环只做一次判断
+        self.ws_armed = False
+        self._device_profiles: Dict[str, _DeviceProfile] = {}
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None):
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    def store(self, kind: str, target: str, sampler: StackSampler, duration_ms: float, **extra) -> dict:
+        result = {
+            "id": uuid.uuid4().hex[:12],
+            "kind": kind,
+            "target": target,
+            "created_at": datetime.utcnow(),
+            "duration_ms": round(duration_ms, 3),
+            "samples": sampler.samples,
+            "collapsed": sampler.collapsed(),
+            **extra,
+        }
+        self.results.append(result)
+        return result
+
+    def list_results(self) -> list:
+        return [{k: v for k, v in r.items() if k != "collapsed"} for r in reversed(self.results)]
+
+    def get_result(self, profile_id: str) -> Optional[dict]:
+        for result in self.results:
+            if result["id"] == profile_id:
+                return result
+        return None
+
+    # === HTTP ===
+
+    def should_profile_request(self, scope) -> bool:
+        if self.http_busy:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value not in (b"", b"0") and self._is_admin(scope)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @staticmethod
+    def _is_admin(scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer":
+                    return False
+                payload = decode_token(token)
+                return bool(payload and payload.get("is_admin"))
+        return False
+
+    # === WebSocket ===
+
+    def arm_device(self, device_id: str, messages: int):
+        """剖析设备接下来 messages 条消息的处理过程"""
+        previous = self._device_profiles.pop(device_id, None)
+        if previous is not None:
+            previous.sampler.stop()
+        # 由事件循环线程调用，采样的即是设备消息循环所在线程
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.active = False
+        self._device_profiles[device_id] = _DeviceProfile(sampler.start(), messages)
+        self.ws_armed = True
+
+    def disarm_device(self, device_id: str):
+        profile = self._device_profiles.pop(device_id, None)
+        self.ws_armed = bool(self._device_profiles)
+        if profile is not None:
+            profile.sampler.stop()
+
+    def device_profile(self, device_id: str) -> Optional[_DeviceProfile]:
+        return self._device_profiles.get(device_id)
+
+    def finish_device_message(self, device_id: str, profile: _DeviceProfile):
+        profile.sampler.active = False
+        profile.remaining -= 1
+        if profile.remaining > 0:
+            return
+        self._device_profiles.pop(device_id, None)
+        self.ws_armed = bool(self._device_profiles)
+        sampler = profile.sampler
+        busy_ms = sampler.samples * self.interval * 1000
+        sampler.stop()
+        self.store("websocket_device", device_id, sampler, busy_ms, messages=profile.messages)
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """按请求头或采样率剖析单个 HTTP 请求 (关闭时仅一次判断)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["type"] != "http" or not profiler.should_profile_request(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler.http_busy = True
+        sampler = StackSampler(threading.get_ident(), profiler.interval).start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration_ms = sampler.stop()
+            profiler.http_busy = False
+            target = f"{scope['method']} {scope['path']}"
+            profiler.store("http", target, sampler, duration_ms)
@@ -0,0 +1,292 @@
+"""训练会话录制 - 将转发的视频帧与姿态数据写入本地分段文件
+
+目录结构: RECORDING_DIR/<session_id>/
+    00000.seg   记录内容依次追加 (JPEG 原始字节 / 姿态 JSON)
+                姿态统一记录设备上报的姿态数据本身 (pose_data 的 data、
+                video_frame 的 pose)，不含转发消息的外层结构
+    00000.idx   定长索引，每条 INDEX_RECORD.size 字节:
+                (时间戳毫秒 int64, 段内偏移 uint64, 长度 uint32, 类型 uint8)
+
+段文件超过 RECORDING_SEGMENT_BYTES 后切换到下一个编号。写入由后台线程
+完成，事件循环只做一次入队; 队列满时直接丢弃，不阻塞实时转发。
+回放通过 mmap 索引二分查找起始位置，按条读取段文件，不整体加载。
+"""
+import base64
+import binascii
+import json
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import get_settings
+
+settings = get_settings()
+
+INDEX_RECORD = struct.Struct("<qQIB3x")
+
+KIND_JPEG = 1
+KIND_POSE = 2
+
+KIND_CONTENT_TYPES = {
+    KIND_JPEG: "image/jpeg",
+    KIND_POSE: "application/json",
+}
+
+_SESSION_ID = re.compile(r"^[0-9A-Za-z_-]{1,64}$")
+
+# 队列中的关闭会话标记
+_CLOSE = object()
+
+
+def session_dir(root: str, session_id: str) -> Optional[str]:
+    if not _SESSION_ID.match(session_id):
+        return None
+    return os.path.join(root, session_id)
+
+
+class _SegmentWriter:
+    """单个会话当前正在写入的段"""
+
+    __slots__ = ("directory", "number", "data", "index", "size", "last_timestamp", "updated_at")
+
+    def __init__(self, directory: str, number: int):
+        self.directory = directory
+        self.number = number
+        base = os.path.join(directory, f"{number:05d}")
+        self.data = open(base + ".seg", "ab")
+        self.index = open(base + ".idx", "ab")
+        self.size = self.data.tell()
+        self.last_timestamp = 0
+        self.updated_at = time.monotonic()
+
+    def append(self, timestamp: int, kind: int, payload: bytes):
+        # 索引需按时间戳递增 (二分查找)，系统时钟回拨时沿用上一条的时间戳
+        timestamp = self.last_timestamp = max(timestamp, self.last_timestamp)
+        self.data.write(payload)
+        self.index.write(INDEX_RECORD.pack(timestamp, self.size, len(payload), kind))
+        self.size += len(payload)
+        self.updated_at = time.monotonic()
+
+    def flush(self):
+        # 先落盘数据再落盘索引，读者看到的索引项对应的数据一定完整
+        self.data.flush()
+        self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+
+class SessionRecorder:
+    """后台线程写入录制数据"""
+
+    def __init__(self, root: str, segment_bytes: int, queue_size: int, enabled: bool = False):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.enabled = enabled
+        self.dropped = 0
+        self.recorded = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._writers: Dict[str, _SegmentWriter] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="session-recorder", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    # === 事件循环侧: 只入队 ===
+
+    def _enqueue(self, item) -> bool:
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def record_frame(self, session_id: str, frame, pose=None) -> bool:
+        """记录一帧 (frame 为 Base64 字符串，解码在写入线程完成)"""
+        if not isinstance(frame, str):
+            return False
+        timestamp = int(time.time() * 1000)
+        ok = self._enqueue((session_id, timestamp, KIND_JPEG, frame))
+        if pose is not None:
+            self._enqueue((session_id, timestamp, KIND_POSE, pose))
+        return ok
+
+    def record_pose(self, session_id: str, pose) -> bool:
+        """记录姿态 (设备上报的姿态数据，JSON 编码在写入线程完成)"""
+        if pose is None:
+            return False
+        return self._enqueue((session_id, int(time.time() * 1000), KIND_POSE, pose))
+
+    def close_session(self, session_id: str):
+        if self._thread is not None:
+            self._enqueue((session_id, 0, _CLOSE, None))
+
+    # === 写入线程 ===
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                self._close_idle()
+                continue
+            if item is None:
+                break
+            self._write(item)
+            # 把当前积压的数据一次写完再 flush
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._close_all()
+                    return
+                self._write(item)
+            for writer in self._writers.values():
+                writer.flush()
+        self._close_all()
+
+    def _write(self, item):
+        session_id, timestamp, kind, payload = item
+        if kind is _CLOSE:
+            writer = self._writers.pop(session_id, None)
+            if writer is not None:
+                writer.close()
+            return
+        try:
+            data = self._encode(kind, payload)
+        except (binascii.Error, ValueError, TypeError):
+            self.dropped += 1
+            return
+        try:
+            writer = self._writer(session_id)
+            if writer is None:
+                return
+            writer.append(timestamp, kind, data)
+            self.recorded += 1
+        except OSError as e:
+            self.dropped += 1
+            print(f"[REC] 写入失败 {session_id}: {e}")
+
+    @staticmethod
+    def _encode(kind: int, payload) -> bytes:
+        if kind == KIND_JPEG:
+            # 兼容 data URL 形式 (data:image/jpeg;base64,...)
+            return base64.b64decode(payload.rpartition(",")[2])
+        return json.dumps(payload, separators=(",", ":")).encode()
+
+    def _writer(self, session_id: str) -> Optional[_SegmentWriter]:
+        writer = self._writers.get(session_id)
+        if writer is not None and writer.size >= self.segment_bytes:
+            writer.close()
+            writer = self._writers[session_id] = _SegmentWriter(writer.directory, writer.number + 1)
+        if writer is None:
+            directory = session_dir(self.root, session_id)
+            if directory is None:
+                return None
+            os.makedirs(directory, exist_ok=True)
+            segments = list_segments(directory)
+            number = segments[-1] if segments else 0
+            writer = self._writers[session_id] = _SegmentWriter(directory, number)
+        return writer
+
+    def _close_idle(self):
+        deadline = time.monotonic() - 60
+        for session_id in [s for s, w in self._writers.items() if w.updated_at < deadline]:
+            self._writers.pop(session_id).close()
+
+    def _close_all(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "open_sessions": len(self._writers),
+        }
+
+
+def list_segments(directory: str) -> List[int]:
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-4]) for name in names if name.endswith(".idx") and name[:-4].isdigit())
+
+
+def _first_at_or_after(index: mmap.mmap, count: int, timestamp: int) -> int:
+    """索引按时间戳递增，二分查找第一条 >= timestamp 的记录"""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if INDEX_RECORD.unpack_from(index, mid * INDEX_RECORD.size)[0] < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def recording_start(directory: str) -> Optional[int]:
+    """录制的第一条记录时间戳 (毫秒)"""
+    for number in list_segments(directory):
+        with open(os.path.join(directory, f"{number:05d}.idx"), "rb") as f:
+            head = f.read(INDEX_RECORD.size)
+        if len(head) == INDEX_RECORD.size:
+            return INDEX_RECORD.unpack(head)[0]
+    return None
+
+
+def replay(
+    directory: str, start: int, end: Optional[int] = None, kinds: Tuple[int, ...] = (KIND_JPEG, KIND_POSE)
+) -> Iterator[Tuple[int, int, bytes]]:
+    """按时间戳区间逐条读取录制内容，产出 (时间戳, 类型, 内容)"""
+    for number in list_segments(directory):
+        base = os.path.join(directory, f"{number:05d}")
+        with open(base + ".idx", "rb") as idx_file:
+            # 只读取完整的索引项 (写入线程可能正在追加)
+            count = os.fstat(idx_file.fileno()).st_size // INDEX_RECORD.size
+            if count == 0:
+                continue
+            with mmap.mmap(idx_file.fileno(), count * INDEX_RECORD.size, access=mmap.ACCESS_READ) as index:
+                last = INDEX_RECORD.unpack_from(index, (count - 1) * INDEX_RECORD.size)[0]
+                if last < start:
+                    continue
+                position = _first_at_or_after(index, count, start)
+                with open(base + ".seg", "rb") as data:
+                    for i in range(position, count):
+                        timestamp, offset, length, kind = INDEX_RECORD.unpack_from(index, i * INDEX_RECORD.size)
+                        if end is not None and timestamp > end:
+                            return
+                        if kind not in kinds:
+                            continue
+                        data.seek(offset)
+                        yield timestamp, kind, data.read(length)
+
+
+recorder = SessionRecorder(
+    settings.RECORDING_DIR,
+    settings.RECORDING_SEGMENT_BYTES,
+    settings.RECORDING_QUEUE_SIZE,
+    enabled=settings.RECORDING_ENABLED,
+)
@@ -0,0 +1,97 @@
+"""响应序列化快速路径
+
+FastJSONResponse (应用默认响应类): 已安装 orjson 时用 orjson 编码，
+否则退回 Starlette 的 json.dumps。
+
+可信输出: FastAPI 默认会把处理函数返回的模型按 response_model 重新校验
+一遍，再转成 Python 对象、再编码为 JSON。对于服务层自己构造的模型
+(字段已在构造时校验)，这些工作是重复的。用 trusted_output 标记的路由
+(所在 APIRouter 需使用 route_class=TrustedRoute) 直接用 pydantic 的
+model_dump_json 一次生成 JSON，不再校验:
+
+    router = APIRouter(prefix="/training", route_class=TrustedRoute)
+
+    @router.get("/sessions", response_model=ResponseBase[List[TrainingSession]])
+    @trusted_output
+    async def get_training_sessions(...):
+        ...
+
+response_model 仍用于 OpenAPI 文档。仅支持 async 处理函数，且只能用于返回值
+类型与 response_model 一致的路由: 不会再按 response_model 过滤字段
+(如 hashed_password)。
+datetime / Enum 等由 pydantic 按 JSON 模式序列化，与默认路径输出一致。
+"""
+import asyncio
+import copy
+import functools
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute, get_request_handler
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+TRUSTED_ATTR = "__trusted_output__"
+
+
+class RawJSON(str):
+    """已序列化的 JSON 文本
+
+    继承 str 使 FastAPI 的 jsonable_encoder 原样放行，由 FastJSONResponse
+    直接编码为字节。
+    """
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, RawJSON):
+            return content.encode("utf-8")
+        if isinstance(content, BaseModel):
+            return content.model_dump_json(by_alias=True).encode("utf-8")
+        if orjson is not None:
+            try:
+                return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # orjson 不支持的类型 (如超过 64 位的整数) 交给标准库
+                pass
+        return super().render(content)
+
+
+def trusted_output(endpoint: Callable) -> Callable:
+    """标记路由返回服务层构造的可信模型，跳过 response_model 重新校验"""
+    setattr(endpoint, TRUSTED_ATTR, True)
+    return endpoint
+
+
+class TrustedRoute(APIRoute):
+    """支持 trusted_output 的路由类，未标记的路由行为与 APIRoute 相同"""
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if not getattr(self.endpoint, TRUSTED_ATTR, False) or not asyncio.iscoroutinefunction(call):
+            return super().get_route_handler()
+
+        by_alias = self.response_model_by_alias
+
+        @functools.wraps(call)
+        async def serialize(*args, **kwargs):
+            result = await call(*args, **kwargs)
+            if isinstance(result, BaseModel):
+                return RawJSON(result.model_dump_json(by_alias=by_alias))
+            return result
+
+        dependant = copy.copy(self.dependant)
+        dependant.call = serialize
+        # 不传 response_field: 返回值不再按 response_model 校验
+        return get_request_handler(
+            dependant=dependant,
+            body_field=self.body_field,
+            status_code=self.status_code,
+            response_class=self.response_class,
+            response_field=None,
+            dependency_overrides_provider=self.dependency_overrides_provider,
+        )
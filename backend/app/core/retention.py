@@ -0,0 +1,494 @@
+"""InfluxDB 分层保留与降采样
+
+分层:
+    raw   INFLUX_BUCKET，保留 INFLUX_RAW_RETENTION_DAYS 天，原始分辨率
+    1s    INFLUX_DOWNSAMPLED_BUCKET 中的 <measurement>_1s (仅 pose_data)
+    1m    INFLUX_DOWNSAMPLED_BUCKET 中的 <measurement>_1m
+降采样桶保留 INFLUX_DOWNSAMPLED_RETENTION_DAYS 天。
+
+降采样由 Influx 任务持续执行，任务的 Flux 全部由 ROLLUPS 生成 (见
+Rollup.flux)。每个窗口写出 mean / min / max 三行，以 agg 标签区分，字段
+名与原始数据相同，时间戳为窗口起点。会话结束时另写一条
+pose_session_summary (session_id 标签)，汇总整个会话的 mean / min / max。
+
+历史查询经 plan() 选择满足分辨率、且数据仍在保留期内的最粗一层；
+未开启 INFLUX_RETENTION_ENABLED 时降采样层不存在，只查原始层。
+
+本地验证 (内存后端，LocalEngine 代替 Influx 执行同一组降采样/查询定义):
+    python -m app.core.retention check
+打印任务 Flux / 在 Influx 上创建桶与任务:
+    python -m app.core.retention print
+    python -m app.core.retention apply
+"""
+import argparse
+import asyncio
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from influxdb_client import Point
+
+from .config import get_settings
+
+settings = get_settings()
+
+AGGREGATES = ("mean", "min", "max")
+SESSION_SUMMARY = "pose_session_summary"
+# 未指定分辨率时，按单条曲线最多返回的点数推算
+MAX_POINTS = 1000
+# 指定分辨率时单条曲线最多返回的点数 (分辨率不足时调粗，原始数据截断)
+POINT_LIMIT = 10_000
+
+
+class Tier:
+    __slots__ = ("name", "bucket", "suffix", "resolution", "retention_days")
+
+    def __init__(self, name: str, bucket: str, suffix: str, resolution: int, retention_days: int):
+        self.name = name
+        self.bucket = bucket
+        self.suffix = suffix
+        self.resolution = resolution
+        self.retention_days = retention_days
+
+    def measurement(self, source: str) -> str:
+        return source + self.suffix
+
+
+RAW = Tier("raw", settings.INFLUX_BUCKET, "", 0, settings.INFLUX_RAW_RETENTION_DAYS)
+TIER_1S = Tier("1s", settings.INFLUX_DOWNSAMPLED_BUCKET, "_1s", 1, settings.INFLUX_DOWNSAMPLED_RETENTION_DAYS)
+TIER_1M = Tier("1m", settings.INFLUX_DOWNSAMPLED_BUCKET, "_1m", 60, settings.INFLUX_DOWNSAMPLED_RETENTION_DAYS)
+# 会话汇总 (每个会话每种聚合一行)
+SESSION_TIER = Tier("session", settings.INFLUX_DOWNSAMPLED_BUCKET, "", 0, settings.INFLUX_DOWNSAMPLED_RETENTION_DAYS)
+
+
+def _flux_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _flux_time(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class Rollup:
+    """一个降采样任务: 原始 measurement -> 某一层"""
+
+    __slots__ = ("measurement", "tier", "every", "offset")
+
+    def __init__(self, measurement: str, tier: Tier, every: int, offset: int = 30):
+        self.measurement = measurement
+        self.tier = tier
+        # 任务执行周期与延迟 (秒)。Influx 任务中 now() 为计划时间，offset
+        # 让迟到的数据也能落入本次窗口
+        self.every = every
+        self.offset = offset
+
+    @property
+    def name(self) -> str:
+        return f"downsample_{self.measurement}_{self.tier.name}"
+
+    @property
+    def target(self) -> str:
+        return self.tier.measurement(self.measurement)
+
+    def flux(self, org: str = settings.INFLUX_ORG) -> str:
+        aggregates = ",\n".join(
+            f'        data |> aggregateWindow(every: {self.tier.resolution}s, fn: {fn}, createEmpty: false, '
+            f'timeSrc: "_start") |> set(key: "agg", value: "{fn}")'
+            for fn in AGGREGATES
+        )
+        return (
+            f'option task = {{name: "{self.name}", every: {self.every}s, offset: {self.offset}s}}\n\n'
+            f"data = from(bucket: {_flux_string(RAW.bucket)})\n"
+            f"    |> range(start: -task.every)\n"
+            f"    |> filter(fn: (r) => r._measurement == {_flux_string(self.measurement)})\n"
+            f"    |> toFloat()\n\n"
+            f"union(tables: [\n{aggregates},\n])\n"
+            f"    |> set(key: \"_measurement\", value: {_flux_string(self.target)})\n"
+            f"    |> to(bucket: {_flux_string(self.tier.bucket)}, org: {_flux_string(org)})\n"
+        )
+
+
+ROLLUPS = [
+    Rollup("pose_data", TIER_1S, every=60),
+    Rollup("pose_data", TIER_1M, every=600),
+    Rollup("device_heartbeat", TIER_1M, every=600),
+]
+
+
+def tiers_for(measurement: str) -> List[Tier]:
+    """可用的层，从粗到细"""
+    tiers = [r.tier for r in ROLLUPS if r.measurement == measurement]
+    return sorted(tiers, key=lambda t: t.resolution, reverse=True) + [RAW]
+
+
+def session_summary_flux(session_id: str, device_id: str, start: float, stop: float,
+                         org: str = settings.INFLUX_ORG) -> str:
+    """汇总一个会话的姿态数据，写入降采样桶"""
+    aggregates = ",\n".join(
+        f'        data |> {fn}() |> set(key: "agg", value: "{fn}")' for fn in AGGREGATES
+    )
+    return (
+        f"data = from(bucket: {_flux_string(RAW.bucket)})\n"
+        f"    |> range(start: {_flux_time(start)}, stop: {_flux_time(stop)})\n"
+        f'    |> filter(fn: (r) => r._measurement == "pose_data" and r.device_id == {_flux_string(device_id)})\n'
+        f"    |> toFloat()\n\n"
+        f"union(tables: [\n{aggregates},\n])\n"
+        f"    |> map(fn: (r) => ({{r with _time: {_flux_time(stop)}}}))\n"
+        f'    |> set(key: "_measurement", value: "{SESSION_SUMMARY}")\n'
+        f'    |> set(key: "session_id", value: {_flux_string(session_id)})\n'
+        f"    |> to(bucket: {_flux_string(SESSION_TIER.bucket)}, org: {_flux_string(org)})\n"
+    )
+
+
+class HistoryQuery:
+    """一次历史查询: 选定的层 + 回查窗口"""
+
+    __slots__ = ("tier", "measurement", "start", "stop", "tags", "fields", "every", "agg", "limit")
+
+    def __init__(self, tier: Tier, measurement: str, start: float, stop: float, tags: Dict[str, str],
+                 fields: Optional[Tuple[str, ...]], every: int, agg: str, limit: Optional[int] = None):
+        self.tier = tier
+        self.measurement = measurement
+        self.start = start
+        self.stop = stop
+        self.tags = tags
+        self.fields = fields
+        self.every = every
+        self.agg = agg
+        # 返回的最多点数 (None 为不限)
+        self.limit = limit
+
+    @property
+    def source(self) -> str:
+        return self.tier.measurement(self.measurement)
+
+    def flux(self) -> str:
+        lines = [
+            f"from(bucket: {_flux_string(self.tier.bucket)})",
+            f"    |> range(start: {_flux_time(self.start)}, stop: {_flux_time(self.stop)})",
+            f"    |> filter(fn: (r) => r._measurement == {_flux_string(self.source)})",
+        ]
+        for key, value in self.tags.items():
+            lines.append(f"    |> filter(fn: (r) => r.{key} == {_flux_string(value)})")
+        if self.tier is not RAW:
+            lines.append(f'    |> filter(fn: (r) => r.agg == "{self.agg}")')
+        if self.fields:
+            condition = " or ".join(f"r._field == {_flux_string(f)}" for f in self.fields)
+            lines.append(f"    |> filter(fn: (r) => {condition})")
+        if self.every > self.tier.resolution:
+            lines.append(
+                f'    |> aggregateWindow(every: {self.every}s, fn: {self.agg}, createEmpty: false, timeSrc: "_start")'
+            )
+        if self.limit is not None:
+            lines.append(f"    |> limit(n: {self.limit})")
+        lines.append('    |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")')
+        return "\n".join(lines) + "\n"
+
+
+def plan(measurement: str, start: float, stop: float, tags: Dict[str, str],
+         resolution: Optional[int] = None, fields: Optional[Iterable[str]] = None,
+         agg: str = "mean", now: Optional[float] = None, downsampled: Optional[bool] = None) -> HistoryQuery:
+    """选择满足分辨率 (秒) 且覆盖 start 的最粗一层
+
+    分辨率更细的层都已过保留期时，退回仍覆盖 start 的最细一层。降采样层
+    相对原始数据滞后最多一个任务周期 (every + offset)。downsampled 为
+    是否存在降采样层 (默认取 INFLUX_RETENTION_ENABLED)。
+
+    指定的分辨率按 POINT_LIMIT 调粗，原始分辨率的查询最多返回 POINT_LIMIT 个点。
+    """
+    if agg not in AGGREGATES:
+        raise ValueError(f"agg 仅支持 {', '.join(AGGREGATES)}")
+    now = time.time() if now is None else now
+    if resolution is None:
+        resolution = max(1, math.ceil((stop - start) / MAX_POINTS))
+    elif stop - start > POINT_LIMIT * max(resolution, 1):
+        resolution = math.ceil((stop - start) / POINT_LIMIT)
+
+    if downsampled is None:
+        downsampled = settings.INFLUX_RETENTION_ENABLED
+    tiers = tiers_for(measurement) if downsampled else [RAW]
+    covering = [t for t in tiers if start >= now - t.retention_days * 86400]
+    chosen = next((t for t in covering if t.resolution <= resolution), None)
+    if chosen is None:
+        chosen = covering[-1] if covering else tiers[0]
+    every = max(resolution, chosen.resolution)
+    return HistoryQuery(chosen, measurement, start, stop, tags, tuple(fields) if fields else None, every, agg,
+                        POINT_LIMIT)
+
+
+def session_summary_query(session_id: str, start: float, stop: float, agg: str) -> HistoryQuery:
+    """读取会话汇总 (汇总点的时间戳为会话结束时间)"""
+    return HistoryQuery(SESSION_TIER, SESSION_SUMMARY, start, stop + 1, {"session_id": session_id}, None, 0, agg)
+
+
+def parse_tables(tables) -> List[dict]:
+    """pivot 后的 FluxTable -> [{"time": 秒, 字段: 值}]"""
+    rows = []
+    for table in tables:
+        for record in table.records:
+            row = {"time": record.get_time().timestamp()}
+            for key, value in record.values.items():
+                # 跳过 _start/_measurement 等内部列、table 序号与字符串标签
+                if not key.startswith("_") and key != "table" and isinstance(value, (int, float)):
+                    row[key] = value
+            rows.append(row)
+    rows.sort(key=lambda r: r["time"])
+    return rows
+
+
+# ==================== Influx 上的桶与任务 ====================
+
+def apply(client, org: str = settings.INFLUX_ORG) -> List[str]:
+    """创建/更新桶的保留期与降采样任务 (同步调用，返回操作记录)"""
+    from influxdb_client import BucketRetentionRules, TaskCreateRequest
+
+    actions = []
+    buckets_api = client.buckets_api()
+    for tier in (RAW, TIER_1S):
+        rules = [BucketRetentionRules(type="expire", every_seconds=tier.retention_days * 86400)]
+        bucket = buckets_api.find_bucket_by_name(tier.bucket)
+        if bucket is None:
+            buckets_api.create_bucket(bucket_name=tier.bucket, retention_rules=rules, org=org)
+            actions.append(f"create bucket {tier.bucket}")
+        elif [r.every_seconds for r in bucket.retention_rules or []] != [rules[0].every_seconds]:
+            bucket.retention_rules = rules
+            buckets_api.update_bucket(bucket)
+            actions.append(f"update bucket {tier.bucket}")
+
+    tasks_api = client.tasks_api()
+    for rollup in ROLLUPS:
+        flux = rollup.flux(org)
+        existing = tasks_api.find_tasks(name=rollup.name)
+        if not existing:
+            tasks_api.create_task(task_create_request=TaskCreateRequest(
+                org=org, flux=flux, status="active", description="generated by app.core.retention"
+            ))
+            actions.append(f"create task {rollup.name}")
+        elif existing[0].flux != flux:
+            existing[0].flux = flux
+            tasks_api.update_task(existing[0])
+            actions.append(f"update task {rollup.name}")
+    return actions
+
+
+# ==================== 本地执行 (内存后端) ====================
+
+def _point_seconds(point: Point) -> float:
+    value = point._time
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if value is None:
+        return time.time()
+    return value / 1e9
+
+
+class LocalEngine:
+    """在内存后端捕获的写入点上执行同一组降采样/查询定义，代替 Influx"""
+
+    def __init__(self, write_api):
+        self.write_api = write_api
+
+    def _series(self, bucket: str, measurement: str, tags: Dict[str, str], start: float, stop: float):
+        for point_bucket, point in list(self.write_api.points):
+            if point_bucket != bucket or point._name != measurement:
+                continue
+            if any(point._tags.get(k) != v for k, v in tags.items()):
+                continue
+            t = _point_seconds(point)
+            if start <= t < stop:
+                yield t, point
+
+    @staticmethod
+    def _aggregate(groups: Dict[tuple, Dict[str, list]], agg: str) -> Dict[tuple, Dict[str, float]]:
+        fn = {"mean": lambda v: sum(v) / len(v), "min": min, "max": max}[agg]
+        return {key: {f: fn(v) for f, v in fields.items()} for key, fields in groups.items()}
+
+    def run_rollup(self, rollup: Rollup, start: float, stop: float) -> int:
+        """降采样 [start, stop) 内的原始数据，返回写出的点数"""
+        resolution = rollup.tier.resolution
+        groups: Dict[tuple, Dict[str, list]] = defaultdict(lambda: defaultdict(list))
+        for t, point in self._series(RAW.bucket, rollup.measurement, {}, start, stop):
+            key = (tuple(sorted(point._tags.items())), math.floor(t / resolution) * resolution)
+            for field, value in point._fields.items():
+                groups[key][field].append(float(value))
+
+        written = []
+        for agg in AGGREGATES:
+            for (tags, window), fields in self._aggregate(groups, agg).items():
+                point = Point(rollup.target).tag("agg", agg).time(int(window * 1e9))
+                for key, value in tags:
+                    point.tag(key, value)
+                for field, value in fields.items():
+                    point.field(field, value)
+                written.append(point)
+        if written:
+            self.write_api.write(bucket=rollup.tier.bucket, record=written)
+        return len(written)
+
+    def summarize_session(self, session_id: str, device_id: str, start: float, stop: float) -> int:
+        groups: Dict[tuple, Dict[str, list]] = defaultdict(lambda: defaultdict(list))
+        for _, point in self._series(RAW.bucket, "pose_data", {"device_id": device_id}, start, stop):
+            for field, value in point._fields.items():
+                groups[()][field].append(float(value))
+        written = []
+        for agg in AGGREGATES:
+            for fields in self._aggregate(groups, agg).values():
+                point = (
+                    Point(SESSION_SUMMARY).tag("agg", agg).tag("session_id", session_id)
+                    .tag("device_id", device_id).time(int(stop * 1e9))
+                )
+                for field, value in fields.items():
+                    point.field(field, value)
+                written.append(point)
+        if written:
+            self.write_api.write(bucket=SESSION_TIER.bucket, record=written)
+        return len(written)
+
+    def query(self, q: HistoryQuery) -> List[dict]:
+        tags = dict(q.tags)
+        if q.tier is not RAW:
+            tags["agg"] = q.agg
+        groups: Dict[tuple, Dict[str, list]] = defaultdict(lambda: defaultdict(list))
+        for t, point in self._series(q.tier.bucket, q.source, tags, q.start, q.stop):
+            window = math.floor(t / q.every) * q.every if q.every > q.tier.resolution else t
+            for field, value in point._fields.items():
+                if q.fields is None or field in q.fields:
+                    groups[(window,)][field].append(float(value))
+        rows = [{"time": key[0], **fields} for key, fields in self._aggregate(groups, q.agg).items()]
+        rows.sort(key=lambda r: r["time"])
+        return rows if q.limit is None else rows[:q.limit]
+
+
+class LocalScheduler:
+    """内存后端下按 Rollup.every 周期执行降采样 (相当于 Influx 任务)"""
+
+    def __init__(self, engine: LocalEngine):
+        self.engine = engine
+        self._task: Optional[asyncio.Task] = None
+        self._done: Dict[str, float] = {}
+
+    def run_due(self, now: float):
+        for rollup in ROLLUPS:
+            stop = math.floor((now - rollup.offset) / rollup.every) * rollup.every
+            start = self._done.get(rollup.name, stop - rollup.every)
+            if stop > start:
+                self.engine.run_rollup(rollup, start, stop)
+                self._done[rollup.name] = stop
+
+    async def _loop(self):
+        interval = min(r.every for r in ROLLUPS)
+        while True:
+            self.run_due(time.time())
+            await asyncio.sleep(interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# ==================== 命令行 ====================
+
+def _check() -> bool:
+    """在合成数据上验证: 各层聚合与直接聚合原始数据一致，分层选择符合预期"""
+    from .memory_backend import CapturingWriteApi
+
+    write_api = CapturingWriteApi(max_points=1_000_000)
+    engine = LocalEngine(write_api)
+    now = math.floor(time.time() / 3600) * 3600
+    start = now - 600
+
+    # 10 分钟 30Hz 姿态 + 10 秒一次的心跳
+    for i in range(600 * 30):
+        t = start + i / 30
+        point = Point("pose_data").tag("device_id", "check-dev").tag("user_id", "check-user")
+        point.field("confidence", 0.5 + 0.4 * math.sin(i / 50))
+        for k in range(17):
+            point.field(f"kp{k}_x", 0.3 + 0.01 * k + 0.02 * math.sin(i / 30 + k))
+        write_api.write(bucket=RAW.bucket, record=point.time(int(t * 1e9)))
+    for i in range(60):
+        point = Point("device_heartbeat").tag("device_id", "check-dev").field("cpu_usage", 20 + i % 7 * 5)
+        write_api.write(bucket=RAW.bucket, record=point.time(int((start + i * 10) * 1e9)))
+
+    for rollup in ROLLUPS:
+        engine.run_rollup(rollup, start, now)
+    engine.summarize_session("check-session", "check-dev", start, now)
+
+    ok = True
+    tags = {"device_id": "check-dev"}
+    cases = [
+        # (measurement, 分辨率, 起点距今秒数, 期望层)
+        ("pose_data", None, 600, "1s"),
+        ("pose_data", 0, 600, "raw"),
+        ("pose_data", 5, 600, "1s"),
+        ("pose_data", 60, 600, "1m"),
+        ("pose_data", 0, 2 * 3600, "raw"),
+        # 30 天按 POINT_LIMIT 调粗到 260s
+        ("pose_data", 0, 30 * 86400, "1m"),
+        ("device_heartbeat", 60, 600, "1m"),
+        ("device_heartbeat", 10, 600, "raw"),
+    ]
+    for measurement, resolution, age, expected in cases:
+        q = plan(measurement, now - age, now, tags, resolution, now=now, downsampled=True)
+        status = "ok" if q.tier.name == expected else "FAIL"
+        ok &= status == "ok"
+        print(f"[plan] {measurement:<17} res={resolution!s:<5} age={age:>8}s -> {q.tier.name:<4} {status}")
+
+    q = plan("pose_data", now - 3600, now, tags, now=now, downsampled=False)
+    status = "ok" if q.tier is RAW else "FAIL"
+    ok &= status == "ok"
+    print(f"[plan] pose_data without downsampling -> {q.tier.name:<4} {status}")
+
+    # 各层按 1 分钟窗口的 min/max 必须与原始数据完全一致，mean 为各窗口均值的均值 (窗口等长时一致)
+    for agg in AGGREGATES:
+        reference = None
+        for tier in tiers_for("pose_data"):
+            rows = engine.query(HistoryQuery(tier, "pose_data", start, now, tags, ("kp3_x",), 60, agg))
+            values = [round(r["kp3_x"], 9) for r in rows]
+            reference = values if reference is None else reference
+            status = "ok" if values == reference and len(values) == 10 else "FAIL"
+            ok &= status == "ok"
+            print(f"[rollup] pose_data {agg:<4} via {tier.name:<3} {len(values)} windows {status}")
+
+    raw_max = max(r["kp0_x"] for r in engine.query(
+        HistoryQuery(RAW, "pose_data", start, now, tags, ("kp0_x",), 0, "max")))
+    summary = engine.query(session_summary_query("check-session", start, now, "max"))
+    status = "ok" if len(summary) == 1 and summary[0]["kp0_x"] == raw_max else "FAIL"
+    ok &= status == "ok"
+    print(f"[summary] {SESSION_SUMMARY} {status}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Influx 分层保留与降采样")
+    parser.add_argument("command", choices=["print", "apply", "check"])
+    args = parser.parse_args()
+
+    if args.command == "print":
+        for rollup in ROLLUPS:
+            print(f"// ---- {rollup.name} ----")
+            print(rollup.flux())
+    elif args.command == "apply":
+        from influxdb_client import InfluxDBClient
+
+        with InfluxDBClient(url=settings.INFLUX_URL, token=settings.INFLUX_TOKEN, org=settings.INFLUX_ORG,
+                            timeout=settings.INFLUX_TIMEOUT_MS) as client:
+            for action in apply(client) or ["up to date"]:
+                print(action)
+    elif not _check():
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
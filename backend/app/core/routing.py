@@ -0,0 +1,105 @@
+"""连接亲和路由 - 让设备与其观看端落在同一个 worker 上
+
+路由键 (route): 观看端为 user_id，设备为其所属用户 (owner_id，未知时为
+device_id)。设备消息按 user_id 转发给观看端，同一路由键的连接在同一
+进程内即可直接转发，无需跨进程。
+
+两种部署方式使用同一个路由键:
+
+- Ingress 粘性哈希: 客户端连接时带上 ?route=<路由键>，k8s/ingress.yaml 按
+  $arg_route 做一致性哈希，同一路由键总是到同一个 Pod
+- 直连 worker (ROUTING_PEERS 非空): 各 worker 按一致性哈希环判断路由键的
+  归属，连错 worker 的连接收到 {"type": "reconnect", "url"} 后被关闭，
+  客户端按提示重连
+"""
+import bisect
+import hashlib
+import socket
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from .config import get_settings
+
+settings = get_settings()
+
+# 连错 worker 时的关闭码 (4000-4999 为应用自定义)
+RECONNECT_CLOSE_CODE = 4301
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """带虚拟节点的一致性哈希环"""
+
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        self.nodes = sorted(nodes)
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes)
+        )
+        self._keys = [p[0] for p in points]
+        self._nodes = [p[1] for p in points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+def parse_peers(spec: str) -> Dict[str, str]:
+    """解析 "w0=ws://host:8001,w1=ws://host:8002" """
+    peers = {}
+    for item in spec.split(","):
+        name, _, url = item.strip().partition("=")
+        if name and url:
+            peers[name.strip()] = url.strip().rstrip("/")
+    return peers
+
+
+class Routing:
+    """本 worker 的路由视图"""
+
+    def __init__(self, worker_id: str, peers: Dict[str, str], vnodes: int = 64):
+        self.worker_id = worker_id
+        self.peers = peers
+        self.ring = HashRing(list(peers), vnodes)
+        self._owners: Dict[str, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.peers)
+
+    def validate(self):
+        """启动时检查: 配置了 peers 时本 worker 必须在其中，否则所有连接都会被重定向"""
+        if self.enabled and self.worker_id not in self.peers:
+            raise RuntimeError(
+                f"WORKER_ID={self.worker_id!r} 不在 ROUTING_PEERS ({', '.join(self.peers)}) 中"
+            )
+
+    def owner(self, route: str) -> str:
+        """路由键归属的 worker (未配置 peers 时为本 worker)"""
+        if not self.enabled:
+            return self.worker_id
+        owner = self._owners.get(route)
+        if owner is None:
+            if len(self._owners) > 100_000:
+                self._owners.clear()
+            owner = self._owners[route] = self.ring.node_for(route)
+        return owner
+
+    def is_local(self, route: str) -> bool:
+        return self.owner(route) == self.worker_id
+
+    def url_for(self, route: str, path: str) -> str:
+        """路由键对应的连接地址 (带 route 参数，供 Ingress 哈希)"""
+        base = self.peers.get(self.owner(route), "")
+        return f"{base}{path}?route={quote(route, safe='')}"
+
+
+routing = Routing(
+    settings.WORKER_ID or socket.gethostname(),
+    parse_peers(settings.ROUTING_PEERS),
+    settings.ROUTING_VNODES,
+)
@@ -49,3 +49,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
 
     return payload
+
+
+async def get_current_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """获取当前管理员用户"""
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限",
+        )
+
+    return current_user
@@ -0,0 +1,119 @@
+"""DDSketch - 相对误差有界、可合并的分位数草图
+
+值 x 落入下标 ceil(log_gamma(|x|)) 的桶，gamma = (1 + a) / (1 - a)，
+返回的分位数与真实值的相对误差不超过 a。两个草图合并即对应桶计数
+相加，因此可以在 Redis 中用 HINCRBY 跨副本累加。
+
+桶数超过 max_bins 时合并最小的桶 (低分位精度下降，高分位不受影响)。
+"""
+import math
+from typing import Dict, Optional
+
+# 绝对值小于该值的数计入零桶
+MIN_VALUE = 1e-9
+
+
+class DDSketch:
+    __slots__ = ("relative_accuracy", "max_bins", "_log_gamma", "positive", "negative", "zero", "count", "sum")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # 桶 (gamma^(k-1), gamma^k] 内相对误差最小的代表值
+        return 2 * math.exp(key * self._log_gamma) / (1 + math.exp(self._log_gamma))
+
+    def add(self, value: float, weight: int = 1):
+        if value > MIN_VALUE:
+            key = self._key(value)
+            self.positive[key] = self.positive.get(key, 0) + weight
+        elif value < -MIN_VALUE:
+            key = self._key(-value)
+            self.negative[key] = self.negative.get(key, 0) + weight
+        else:
+            self.zero += weight
+        self.count += weight
+        self.sum += value * weight
+        if len(self.positive) + len(self.negative) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        """合并最小的正数桶 (负数值最少见，优先保留)"""
+        bins = self.positive if len(self.positive) > 1 else self.negative
+        excess = len(self.positive) + len(self.negative) - self.max_bins
+        keys = sorted(bins)[:excess + 1]
+        total = sum(bins.pop(k) for k in keys)
+        bins[keys[-1]] = bins.get(keys[-1], 0) + total
+
+    def merge(self, other: "DDSketch"):
+        for key, count in other.positive.items():
+            self.positive[key] = self.positive.get(key, 0) + count
+        for key, count in other.negative.items():
+            self.negative[key] = self.negative.get(key, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        if len(self.positive) + len(self.negative) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    # --- Redis 哈希表示: p<k> / n<k> / z 为桶计数，sum 为总和 ---
+
+    def to_fields(self) -> Dict[str, int]:
+        fields = {f"p{k}": c for k, c in self.positive.items()}
+        fields.update({f"n{k}": c for k, c in self.negative.items()})
+        if self.zero:
+            fields["z"] = self.zero
+        return fields
+
+    def merge_fields(self, fields: Dict[str, str]):
+        """合并 HGETALL 返回的哈希"""
+        for name, value in fields.items():
+            if name == "sum":
+                self.sum += float(value)
+                continue
+            count = int(value)
+            if name == "z":
+                self.zero += count
+            elif name[0] == "p":
+                key = int(name[1:])
+                self.positive[key] = self.positive.get(key, 0) + count
+            elif name[0] == "n":
+                key = int(name[1:])
+                self.negative[key] = self.negative.get(key, 0) + count
+            else:
+                continue
+            self.count += count
+        if len(self.positive) + len(self.negative) > self.max_bins:
+            self._collapse()
@@ -0,0 +1,178 @@
+"""设备遥测分位数聚合
+
+每次心跳把各指标写入内存中的 DDSketch，按 (指标, 设备, 时间桶) 与
+(指标, 全体设备, 时间桶) 分别累计。后台每 TELEMETRY_FLUSH_SECONDS 把
+新增部分用 HINCRBY 合并到 Redis 哈希 tm:<指标>:<设备或 *>:<桶>，各副本
+写入同一组键，查询时合并窗口内的各时间桶。
+
+查询代价只与窗口内的时间桶数和草图桶数 (有上限) 有关，与心跳点数
+无关。单台设备心跳稀疏，按设备的时间桶更宽 (TELEMETRY_DEVICE_BUCKET_SECONDS)
+以控制 Redis 键数。Redis 不可用时新增部分保留到下次刷新 (超出保留窗口
+的时间桶丢弃)，全体设备的查询退化为本副本的数据 (按设备的查询为空)。
+"""
+import asyncio
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import get_settings
+from .database import Database
+from .sketch import DDSketch
+
+settings = get_settings()
+
+METRICS = ("cpu_usage", "memory_usage", "temperature", "battery_level", "network_latency")
+FLEET = "*"
+
+# (指标, 设备或 FLEET, 时间桶起点)
+SketchKey = Tuple[str, str, int]
+
+
+def _redis_key(key: SketchKey) -> str:
+    return f"tm:{key[0]}:{key[1]}:{key[2]}"
+
+
+class TelemetryAggregator:
+    def __init__(self, bucket_seconds: int, device_bucket_seconds: int, retention_minutes: int,
+                 relative_accuracy: float):
+        self.bucket_seconds = bucket_seconds
+        self.device_bucket_seconds = device_bucket_seconds
+        self.retention_seconds = retention_minutes * 60
+        self.relative_accuracy = relative_accuracy
+        # 本副本的全体设备数据 (Redis 不可用时查询用)、尚未刷新到 Redis 的增量
+        # 与正在刷新的增量 (写入完成前查询仍计入)
+        self._local: Dict[SketchKey, DDSketch] = {}
+        self._pending: Dict[SketchKey, DDSketch] = {}
+        self._flushing: Dict[SketchKey, DDSketch] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _sketch(self, store: Dict[SketchKey, DDSketch], key: SketchKey) -> DDSketch:
+        sketch = store.get(key)
+        if sketch is None:
+            sketch = store[key] = DDSketch(self.relative_accuracy)
+        return sketch
+
+    def _width(self, scope: str) -> int:
+        return self.bucket_seconds if scope == FLEET else self.device_bucket_seconds
+
+    def _bucket(self, timestamp: float, width: int) -> int:
+        return int(timestamp // width) * width
+
+    def record(self, device_id: str, values: Dict[str, Optional[float]], timestamp: Optional[float] = None):
+        now = time.time() if timestamp is None else timestamp
+        fleet_bucket = self._bucket(now, self.bucket_seconds)
+        device_bucket = self._bucket(now, self.device_bucket_seconds)
+        for metric in METRICS:
+            value = values.get(metric)
+            if value is None:
+                continue
+            key = (metric, FLEET, fleet_bucket)
+            self._sketch(self._local, key).add(value)
+            self._sketch(self._pending, key).add(value)
+            self._sketch(self._pending, (metric, device_id, device_bucket)).add(value)
+
+    def _prune(self, now: float):
+        oldest = self._bucket(now - self.retention_seconds, self.bucket_seconds)
+        for key in [k for k in self._local if k[2] < oldest]:
+            del self._local[key]
+        # Redis 长时间不可用时，已整体移出保留窗口的增量不再有查询会用到
+        for key in [k for k in self._pending if k[2] + self._width(k[1]) <= now - self.retention_seconds]:
+            del self._pending[key]
+
+    async def flush(self):
+        """把增量合并到 Redis; 失败时保留到下次"""
+        self._prune(time.time())
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._flushing = pending
+        ttl = self.retention_seconds + self.device_bucket_seconds * 2
+        try:
+            pipe = Database.get_redis().pipeline(transaction=False)
+            for key, sketch in pending.items():
+                name = _redis_key(key)
+                for field, count in sketch.to_fields().items():
+                    pipe.hincrby(name, field, count)
+                pipe.hincrbyfloat(name, "sum", sketch.sum)
+                pipe.expire(name, ttl)
+            await pipe.execute()
+        except Exception:
+            for key, sketch in pending.items():
+                self._sketch(self._pending, key).merge(sketch)
+        finally:
+            self._flushing = {}
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(settings.TELEMETRY_FLUSH_SECONDS)
+            await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def _window(self, minutes: float, now: float, width: int) -> List[int]:
+        """覆盖最近 minutes 分钟的时间桶 (含当前未结束的桶)"""
+        last = self._bucket(now, width)
+        count = max(1, math.ceil(minutes * 60 / width))
+        return [last - i * width for i in range(count)]
+
+    async def merged(self, metrics: Iterable[str], minutes: float, device_id: Optional[str] = None,
+                     now: Optional[float] = None) -> Dict[str, DDSketch]:
+        """合并窗口内的时间桶，返回 {指标: 草图}"""
+        scope = device_id or FLEET
+        buckets = self._window(minutes, time.time() if now is None else now, self._width(scope))
+        keys = [(metric, scope, bucket) for metric in metrics for bucket in buckets]
+        result = {metric: DDSketch(self.relative_accuracy) for metric in metrics}
+        try:
+            pipe = Database.get_redis().pipeline(transaction=False)
+            for key in keys:
+                pipe.hgetall(_redis_key(key))
+            hashes = await pipe.execute()
+        except Exception:
+            for key in keys:
+                sketch = self._local.get(key)
+                if sketch is not None:
+                    result[key[0]].merge(sketch)
+            return result
+
+        for key, fields in zip(keys, hashes):
+            if fields:
+                result[key[0]].merge_fields(fields)
+        # 尚未刷新或正在刷新的本地增量
+        for store in (self._pending, self._flushing):
+            for key in keys:
+                sketch = store.get(key)
+                if sketch is not None:
+                    result[key[0]].merge(sketch)
+        return result
+
+    async def summary(self, metrics: Iterable[str], minutes: float, quantiles: Iterable[float],
+                      device_id: Optional[str] = None) -> dict:
+        """窗口内各指标的样本数、均值与分位数"""
+        sketches = await self.merged(list(metrics), minutes, device_id)
+        return {
+            metric: {
+                "count": sketch.count,
+                "mean": sketch.mean,
+                **{f"p{q * 100:g}": sketch.quantile(q) for q in quantiles},
+            }
+            for metric, sketch in sketches.items()
+        }
+
+
+telemetry = TelemetryAggregator(
+    settings.TELEMETRY_BUCKET_SECONDS,
+    settings.TELEMETRY_DEVICE_BUCKET_SECONDS,
+    settings.TELEMETRY_RETENTION_MINUTES,
+    settings.TELEMETRY_RELATIVE_ACCURACY,
+)
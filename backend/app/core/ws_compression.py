@@ -0,0 +1,88 @@
+"""观看端 WebSocket 按消息类型压缩
+
+传输层 permessage-deflate 对连接上的所有消息一视同仁，而 video_frame
+(Base64 JPEG) 几乎压不动，只是白白消耗 CPU。这里改为应用层按类型决定:
+
+- 观看端在握手时声明子协议 SUBPROTOCOL 即视为协商开启
+- pose_update / metrics_update 以二进制帧发送: 1 字节标记 + raw deflate 数据
+  (预置字典 ZDICT + 连接内上下文复用，与 permessage-deflate 相同去掉
+  末尾的 00 00 ff ff)，小消息也能压到原来的几分之一
+- video_frame 及其他消息仍以文本帧原样发送
+
+部署时应关闭传输层压缩 (uvicorn --ws-per-message-deflate false)，否则
+视频帧仍会被传输层重复压缩。
+"""
+import asyncio
+import zlib
+from typing import Optional
+
+from starlette.websockets import WebSocket
+
+from .config import get_settings
+
+settings = get_settings()
+
+SUBPROTOCOL = "svc.deflate.v1"
+
+# 二进制帧首字节: 载荷编码方式
+TAG_DEFLATE_JSON = 0x01
+
+COMPRESSED_TYPES = frozenset(("pose_update", "metrics_update"))
+
+# 窗口 4KB 足以覆盖最近几条姿态消息; 每个连接约占 (1 << 14) + (1 << 14) 字节
+WINDOW_BITS = 12
+MEM_LEVEL = 5
+
+_FLUSH_TAIL = b"\x00\x00\xff\xff"
+
+# 预置字典: 常见消息的键名与取值前缀 (越常见的放越靠后)
+ZDICT = (
+    b'"confidence":0.9,"sent_at":"timestamp":'
+    b'{"type":"metrics_update","device_id":"","data":{"hit_rate":'
+    b',"reaction_time":,"accuracy":,"fatigue_level":,"calories_burned":'
+    b',"total_hits":,"successful_hits":}}'
+    b',0.95],[0.,0.95],[0.3,0.4,0.5,0.6,0.7,-0.00'
+    b'{"type":"pose_update","device_id":"","data":{"keypoints":[[0.'
+)
+
+
+def negotiate(websocket: WebSocket) -> Optional[str]:
+    """观看端声明了压缩子协议时返回该子协议"""
+    if SUBPROTOCOL in websocket.scope.get("subprotocols", ()):
+        return SUBPROTOCOL
+    return None
+
+
+class MessageDeflater:
+    """单个连接的压缩上下文
+
+    消息须按压缩顺序送达: 发送方持有 lock 完成 压缩 + 发送；某一帧发送
+    失败后观看端的解压上下文已与服务端不一致，该连接不能再发送压缩帧。
+    """
+
+    __slots__ = ("_compressor", "lock")
+
+    def __init__(self, level: int = settings.WS_COMPRESSION_LEVEL):
+        self._compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -WINDOW_BITS, MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, ZDICT
+        )
+        self.lock = asyncio.Lock()
+
+    def compress(self, text: str) -> bytes:
+        compressor = self._compressor
+        data = compressor.compress(text.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return bytes((TAG_DEFLATE_JSON,)) + data[:-4]
+
+
+class MessageInflater:
+    """参考解码器 (客户端实现与基准测试使用)"""
+
+    __slots__ = ("_decompressor",)
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(-WINDOW_BITS, ZDICT)
+
+    def decompress(self, payload: bytes) -> str:
+        if not payload or payload[0] != TAG_DEFLATE_JSON:
+            raise ValueError("unknown payload tag")
+        return self._decompressor.decompress(payload[1:] + _FLUSH_TAIL).decode()
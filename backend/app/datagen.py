@@ -0,0 +1,390 @@
+"""合成数据集生成器 - 按规模生成用户、设备、训练会话 (及可选姿态序列)
+
+用户按 --block-users 个一块，每块用 (seed, 块序号) 初始化独立的 NumPy 随机
+数生成器并向量化生成，_id 也由块序号与序号确定，因此同样的参数总是生成
+同样的数据，与 --workers 无关。
+
+指标分布:
+    每个用户有潜在水平 (Beta) 与进步幅度，水平随训练天数按学习曲线提升
+    total_hits ~ Poisson(时长 × 击球频率)，successful_hits ~ Binomial(total_hits, p)，
+    hit_rate 由二者算出；reaction_time 为对数正态，accuracy / fatigue_level /
+    calories_burned 随水平、时长与训练模式变化
+    每天的会话数 ~ Poisson(--sessions-per-day × 用户活跃度)，开始时间集中在早中晚
+
+输出:
+    --target mongo  各 worker 进程独立连接，insert_many(ordered=False) 大批量并发写入；
+                    姿态序列写入 Influx
+    --target files  写出 <集合>-<worker>.jsonl (扩展 JSON) 与 pose_data-<worker>.jsonl，
+                    设置 MEMORY_SEED_DIR 后内存存储后端启动时加载
+
+用法:
+    python -m app.datagen --users 100000 --days 90 --sessions-per-day 1.2 --workers 4
+    python -m app.datagen --users 200 --days 30 --pose-fraction 0.05 --target files --out seed/
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+MODES = ("standard", "intensive", "recovery")
+MODE_WEIGHTS = (0.6, 0.25, 0.15)
+# 训练模式 -> (时长系数, 强度系数)
+MODE_FACTORS = np.array([(1.0, 1.0), (1.2, 1.3), (0.7, 0.6)])
+# 会话开始时刻的高峰 (小时) 及权重
+START_HOURS = np.array([7.5, 12.5, 18.5, 20.5])
+START_HOUR_WEIGHTS = (0.2, 0.15, 0.35, 0.3)
+
+# _id 的第 5 字节区分文档类型
+KIND_USER, KIND_DEVICE, KIND_SESSION = 1, 2, 3
+
+PASSWORD = "demo123"
+
+
+@dataclass
+class GenConfig:
+    users: int = 1000
+    devices_per_user: int = 1
+    days: int = 90
+    sessions_per_day: float = 1.0
+    pose_fraction: float = 0.0
+    pose_hz: float = 1.0
+    seed: int = 42
+    block_users: int = 1000
+    end: float = 0.0  # 数据截止时刻 (Unix 秒，默认为当天 0 点 UTC)
+
+
+def _oid(timestamp: float, kind: int, index: int) -> ObjectId:
+    """确定性的 ObjectId: 4 字节时间 + 1 字节类型 + 7 字节序号"""
+    return ObjectId(int(timestamp).to_bytes(4, "big") + bytes((kind,)) + index.to_bytes(7, "big"))
+
+
+def _utc(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class Block:
+    users: List[dict]
+    devices: List[dict]
+    sessions: List[dict]
+    # 需要生成姿态序列的会话 (device_id, user_id, 开始时刻, 时长秒)
+    pose_sessions: List[Tuple[str, str, float, int]]
+
+
+def generate_block(config: GenConfig, block: int) -> Block:
+    rng = np.random.default_rng([config.seed, block])
+    first = block * config.block_users
+    n = min(config.block_users, config.users - first)
+    days = config.days
+    day0 = config.end - days * 86400
+    password = hashlib.sha256(PASSWORD.encode()).hexdigest()
+
+    # --- 用户与设备 ---
+    skill = rng.beta(2.5, 2.5, n)
+    gain = rng.uniform(0, 0.25, n)
+    activity = rng.gamma(2.0, 0.5, n)
+    # 30% 的用户在窗口内才开始训练
+    join = np.where(rng.random(n) < 0.3, rng.integers(0, days, n), 0)
+    created = day0 + join * 86400 - rng.uniform(0, 30 * 86400, n)
+
+    users, devices, device_ids = [], [], []
+    for i in range(n):
+        index = first + i
+        created_at = _utc(created[i])
+        user_id = _oid(created[i], KIND_USER, index)
+        users.append({
+            "_id": user_id, "username": f"user{index:07d}", "email": f"user{index:07d}@sports.com",
+            "hashed_password": password, "full_name": f"用户{index}", "role": "user",
+            "created_at": created_at, "is_active": True,
+        })
+        owned = []
+        for k in range(config.devices_per_user):
+            device_id = f"SIM-{index:07d}-{k}"
+            owned.append(device_id)
+            devices.append({
+                "_id": _oid(created[i], KIND_DEVICE, (index << 8) | k),
+                "device_id": device_id, "owner_id": str(user_id), "name": f"训练机 {index}-{k}",
+                "type": "orange_pi", "status": "offline", "ip_address": f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+                "firmware_version": "1.2.0",
+                "config": {"ball_speed": 50, "ball_frequency": 2.0, "spin_type": "none",
+                           "angle_horizontal": 0, "angle_vertical": 15},
+                "last_heartbeat": created_at, "created_at": created_at, "updated_at": created_at,
+            })
+        device_ids.append(owned)
+
+    # --- 会话 (向量化) ---
+    counts = rng.poisson(config.sessions_per_day * activity[:, None], (n, days))
+    counts[np.arange(days)[None, :] < join[:, None]] = 0
+    owner, day = np.nonzero(counts)
+    repeats = counts[owner, day]
+    owner, day = np.repeat(owner, repeats), np.repeat(day, repeats)
+    k = len(owner)
+
+    mode = rng.choice(len(MODES), k, p=MODE_WEIGHTS)
+    length_factor, intensity = MODE_FACTORS[mode, 0], MODE_FACTORS[mode, 1]
+    minutes = np.clip(rng.lognormal(math.log(35), 0.3, k) * length_factor, 10, 120)
+    hour = np.clip(rng.choice(START_HOURS, k, p=START_HOUR_WEIGHTS) + rng.normal(0, 1.2, k), 6, 22.5)
+    start = np.floor(day0 + day * 86400 + hour * 3600)
+    duration = np.rint(minutes * 60).astype(np.int64)
+
+    progress = (day - join[owner]) / days
+    level = np.clip(skill[owner] + gain[owner] * (1 - np.exp(-3 * progress)) + rng.normal(0, 0.05, k), 0, 1)
+    total_hits = rng.poisson(minutes * 5 * intensity)
+    successful = rng.binomial(total_hits, 0.35 + 0.6 * level)
+    hit_rate = np.where(total_hits > 0, 100 * successful / np.maximum(total_hits, 1), 0)
+    reaction = np.maximum(rng.lognormal(np.log(480 - 200 * level), 0.12), 150)
+    accuracy = np.clip(rng.normal(60 + 30 * level, 5), 0, 100)
+    fatigue = np.clip(rng.normal(15 + 0.8 * minutes * intensity, 8), 0, 100)
+    calories = np.maximum(minutes * rng.normal(6.5, 1.0, k) * intensity, 0)
+    difficulty = np.clip(np.rint(1 + 9 * level), 1, 10).astype(np.int64)
+    device_pick = rng.integers(0, config.devices_per_user, k)
+
+    columns = zip(
+        owner.tolist(), start.tolist(), duration.tolist(), mode.tolist(), device_pick.tolist(),
+        hit_rate.round(2).tolist(), reaction.round(1).tolist(), accuracy.round(2).tolist(),
+        fatigue.round(2).tolist(), calories.round(1).tolist(), total_hits.tolist(), successful.tolist(),
+        difficulty.tolist(),
+    )
+    sessions = []
+    session_base = block << 32
+    for j, (u, t, d, m, dev, hr, rt, acc, fat, cal, th, sh, lvl) in enumerate(columns):
+        start_time = _utc(t)
+        sessions.append({
+            "_id": _oid(t, KIND_SESSION, session_base + j),
+            "user_id": str(users[u]["_id"]), "device_id": device_ids[u][dev],
+            "status": "completed", "start_time": start_time, "end_time": start_time + timedelta(seconds=d),
+            "duration_seconds": d, "training_mode": MODES[m], "difficulty_level": lvl,
+            "metrics": {"hit_rate": hr, "reaction_time": rt, "accuracy": acc, "fatigue_level": fat,
+                        "calories_burned": cal, "total_hits": th, "successful_hits": sh},
+            "created_at": start_time,
+        })
+
+    pose_sessions = []
+    if config.pose_fraction > 0 and k:
+        for j in np.flatnonzero(rng.random(k) < config.pose_fraction).tolist():
+            s = sessions[j]
+            pose_sessions.append((s["device_id"], s["user_id"], float(start[j]), int(duration[j])))
+
+    return Block(users, devices, sessions, pose_sessions)
+
+
+def pose_points(config: GenConfig, device_id: str, user_id: str, start: float, duration: int) -> Iterator[dict]:
+    """会话的姿态序列 (与 TrainingService.save_pose_data 的字段一致)"""
+    from .loadtest import synthetic_keypoints
+
+    phase = (zlib.crc32(device_id.encode()) % 628) / 100
+    step = 1 / config.pose_hz
+    for i in range(int(duration * config.pose_hz)):
+        t = i * step
+        fields = {"confidence": 0.9}
+        for n, (x, y, z, v) in enumerate(synthetic_keypoints(t, phase)):
+            fields[f"kp{n}_x"], fields[f"kp{n}_y"], fields[f"kp{n}_z"], fields[f"kp{n}_v"] = x, y, z, v
+        yield {"time": int((start + t) * 1e9), "tags": {"device_id": device_id, "user_id": user_id}, "fields": fields}
+
+
+def line_protocol(point: dict) -> str:
+    tags = ",".join(f"{k}={v}" for k, v in point["tags"].items())
+    fields = ",".join(f"{k}={v}" for k, v in point["fields"].items())
+    return f"pose_data,{tags} {fields} {point['time']}"
+
+
+# --- 写入目标 ---
+
+def _ejson(value):
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat() + "Z"}
+    raise TypeError(type(value).__name__)
+
+
+class FileSink:
+    """写出 JSONL (扩展 JSON)，由内存存储后端加载"""
+
+    def __init__(self, out: str, worker: int):
+        os.makedirs(out, exist_ok=True)
+        self.out = out
+        self.worker = worker
+        self._files: Dict[str, object] = {}
+
+    def _file(self, name: str):
+        f = self._files.get(name)
+        if f is None:
+            f = self._files[name] = open(os.path.join(self.out, f"{name}-{self.worker:03d}.jsonl"), "w",
+                                         encoding="utf-8")
+        return f
+
+    async def insert(self, collection: str, docs: List[dict]):
+        f = self._file(collection)
+        dumps = json.dumps
+        f.writelines(dumps(d, default=_ejson, ensure_ascii=False) + "\n" for d in docs)
+
+    def pose(self, points: List[dict]):
+        self._file("pose_data").writelines(json.dumps(p) + "\n" for p in points)
+
+    async def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+class MongoSink:
+    """insert_many(ordered=False) 分批并发写入 Mongo，姿态写入 Influx"""
+
+    def __init__(self, batch_size: int, concurrency: int):
+        from influxdb_client import InfluxDBClient, WriteOptions
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from .core.config import get_settings
+
+        self.settings = get_settings()
+        self.client = AsyncIOMotorClient(self.settings.mongo_uri, maxPoolSize=concurrency + 2)
+        self.db = self.client[self.settings.MONGO_DB]
+        self.batch_size = batch_size
+        self.limit = asyncio.Semaphore(concurrency)
+        self.tasks: set = set()
+        self._influx = None
+        self._influx_factory = lambda: InfluxDBClient(
+            url=self.settings.INFLUX_URL, token=self.settings.INFLUX_TOKEN, org=self.settings.INFLUX_ORG
+        )
+        self._write_options = WriteOptions(batch_size=5000, flush_interval=1000)
+
+    async def _insert(self, collection: str, docs: List[dict]):
+        try:
+            await self.db[collection].insert_many(docs, ordered=False)
+        finally:
+            self.limit.release()
+
+    async def insert(self, collection: str, docs: List[dict]):
+        for i in range(0, len(docs), self.batch_size):
+            await self.limit.acquire()
+            task = asyncio.create_task(self._insert(collection, docs[i:i + self.batch_size]))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def pose(self, points: List[dict]):
+        if self._influx is None:
+            self._influx = self._influx_factory().write_api(write_options=self._write_options)
+        self._influx.write(bucket=self.settings.INFLUX_BUCKET, record=[line_protocol(p) for p in points])
+
+    async def close(self):
+        if self.tasks:
+            await asyncio.gather(*list(self.tasks))
+        if self._influx is not None:
+            self._influx.close()
+        self.client.close()
+
+
+# --- 执行 ---
+
+def _block_ranges(config: GenConfig, workers: int) -> List[range]:
+    blocks = math.ceil(config.users / config.block_users)
+    per_worker = math.ceil(blocks / max(workers, 1))
+    return [range(i, min(i + per_worker, blocks)) for i in range(0, blocks, per_worker)]
+
+
+async def _generate(config: GenConfig, blocks: range, worker: int, target: str, out: str,
+                    batch_size: int, concurrency: int) -> Dict[str, int]:
+    sink = FileSink(out, worker) if target == "files" else MongoSink(batch_size, concurrency)
+    totals = {"users": 0, "devices": 0, "training_sessions": 0, "pose_points": 0}
+    try:
+        for block in blocks:
+            data = generate_block(config, block)
+            for name, docs in (("users", data.users), ("devices", data.devices),
+                               ("training_sessions", data.sessions)):
+                if docs:
+                    await sink.insert(name, docs)
+                    totals[name] += len(docs)
+            for session in data.pose_sessions:
+                points = list(pose_points(config, *session))
+                sink.pose(points)
+                totals["pose_points"] += len(points)
+    finally:
+        await sink.close()
+    return totals
+
+
+def _worker(config: GenConfig, blocks: range, worker: int, target: str, out: str,
+            batch_size: int, concurrency: int) -> Dict[str, int]:
+    return asyncio.run(_generate(config, blocks, worker, target, out, batch_size, concurrency))
+
+
+async def _create_indexes():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from .core.config import get_settings
+
+    settings = get_settings()
+    client = AsyncIOMotorClient(settings.mongo_uri)
+    db = client[settings.MONGO_DB]
+    await db.users.create_index("username", unique=True)
+    await db.devices.create_index("device_id", unique=True)
+    await db.devices.create_index("owner_id")
+    await db.training_sessions.create_index([("user_id", 1), ("start_time", -1)])
+    client.close()
+
+
+def run(config: GenConfig, workers: int, target: str, out: str, batch_size: int, concurrency: int) -> dict:
+    if not config.end:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        config.end = today.timestamp()
+    started_at = time.perf_counter()
+    ranges = _block_ranges(config, workers)
+    args = (target, out, batch_size, concurrency)
+    if workers <= 1:
+        results = [_worker(config, blocks, i, *args) for i, blocks in enumerate(ranges)]
+    else:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_worker, config, blocks, i, *args) for i, blocks in enumerate(ranges)]
+            results = [f.result() for f in futures]
+    if target == "mongo":
+        asyncio.run(_create_indexes())
+
+    elapsed = time.perf_counter() - started_at
+    totals = {key: sum(r[key] for r in results) for key in results[0]} if results else {}
+    totals["seconds"] = round(elapsed, 1)
+    totals["sessions_per_sec"] = round(totals.get("training_sessions", 0) / elapsed) if elapsed else 0
+    return totals
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="合成数据集生成器")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--devices-per-user", type=int, default=1)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--sessions-per-day", type=float, default=1.0, help="每用户每天平均会话数")
+    parser.add_argument("--pose-fraction", type=float, default=0.0, help="生成姿态序列的会话比例")
+    parser.add_argument("--pose-hz", type=float, default=1.0, help="姿态序列采样率")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--block-users", type=int, default=1000, help="每块用户数 (改变它会改变生成的数据)")
+    parser.add_argument("--target", choices=["mongo", "files"], default="mongo")
+    parser.add_argument("--out", default="seed", help="--target files 的输出目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=10_000, help="每次 insert_many 的文档数")
+    parser.add_argument("--concurrency", type=int, default=4, help="每个 worker 的并发写入批次数")
+    args = parser.parse_args(argv)
+    config = GenConfig(
+        users=args.users, devices_per_user=args.devices_per_user, days=args.days,
+        sessions_per_day=args.sessions_per_day, pose_fraction=args.pose_fraction, pose_hz=args.pose_hz,
+        seed=args.seed, block_users=args.block_users,
+    )
+    return config, args
+
+
+def main(argv=None):
+    config, args = parse_args(argv)
+    print(json.dumps(run(config, args.workers, args.target, args.out, args.batch_size, args.concurrency),
+                     ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
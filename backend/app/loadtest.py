@@ -0,0 +1,435 @@
+"""WebSocket 压测工具 - 模拟设备集群与观看端
+
+在本机子进程中以内存存储后端启动完整应用 (或连接 --url 指定的服务)，模拟 N 台 Orange Pi 设备
+按 /ws/device/{device_id} 协议上报 video_frame / pose_data / metrics /
+heartbeat，M 个观看端连接 /ws/user/{user_id} 接收转发，统计端到端转发
+延迟分位数、吞吐量与丢失率。
+
+--workers N 时启动 N 个 worker 进程并开启连接亲和路由 (ROUTING_PEERS)，
+客户端轮流连接各 worker 并按 reconnect 提示重连，验证设备与其观看端
+落在同一 worker 上时转发不丢失。
+
+用法:
+    python -m app.loadtest --devices 50 --viewers 10 --duration 30
+    python -m app.loadtest --devices 50 --viewers 10 --workers 4
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import websockets
+
+STREAM_TYPES = ("video_frame", "pose_update", "metrics_update")
+
+
+def synthetic_jpeg(size: int, rng: random.Random) -> str:
+    """生成指定大小的合成 JPEG (SOI/APP0 头 + 随机熵编码数据 + EOI)，返回 Base64"""
+    header = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    body = rng.randbytes(max(size - len(header) - 2, 0))
+    return base64.b64encode(header + body + b"\xff\xd9").decode("ascii")
+
+
+def synthetic_keypoints(t: float, phase: float) -> List[List[float]]:
+    """17 个归一化关键点 [x, y, z, visibility]，随时间轻微摆动"""
+    sway = math.sin(t * 2 + phase) * 0.02
+    return [
+        [round(0.3 + (i % 5) * 0.1 + sway, 4), round(0.1 + i * 0.05, 4), round(sway / 2, 4), 0.95]
+        for i in range(17)
+    ]
+
+
+def now_ms() -> float:
+    # 同机多进程可比的墙钟时间
+    return time.time_ns() / 1e6
+
+
+@dataclass
+class StreamStats:
+    """单类消息的统计"""
+    sent: int = 0
+    expected: int = 0
+    received: int = 0
+    bytes_received: int = 0
+    latencies_ms: List[float] = field(default_factory=list)
+
+
+@dataclass
+class LoadTestConfig:
+    devices: int = 10
+    viewers: int = 5
+    duration: float = 10.0
+    frame_rate: float = 15.0
+    pose_rate: float = 30.0
+    metrics_rate: float = 2.0
+    heartbeat_interval: float = 5.0
+    frame_bytes: int = 20_000
+    ramp_up: float = 1.0
+    drain: float = 2.0
+    seed: int = 42
+    coalesce: float = 0.0
+    workers: int = 1
+
+
+class LoadTest:
+    """压测运行器"""
+
+    def __init__(self, config: LoadTestConfig, base_urls: List[str]):
+        self.config = config
+        self.base_urls = [url.rstrip("/") for url in base_urls]
+        # 多个 worker 时按路由协议连接 (首条消息为 routed / reconnect)
+        self.routed = len(self.base_urls) > 1
+        self.redirects = 0
+        self.connections_per_worker: Dict[str, int] = {}
+        self.stats: Dict[str, StreamStats] = {t: StreamStats() for t in STREAM_TYPES}
+        self.heartbeat_rtts_ms: List[float] = []
+        self.connect_errors = 0
+        self.send_errors = 0
+        # 观看端实际收到的 WebSocket 消息数 (合并发送时远小于各流消息数之和)
+        self.viewer_messages = 0
+        self._stop = asyncio.Event()
+        # user_id -> 该用户的观看端连接数，用于计算应收消息数
+        self.viewers_per_user: Dict[str, int] = {}
+
+    def user_for_device(self, index: int) -> Optional[str]:
+        if self.config.viewers <= 0:
+            return None
+        return f"loadtest-user-{index % self.config.viewers:04d}"
+
+    async def connect(self, path: str, route: Optional[str], index: int, query: str = ""):
+        """连接 (轮流选择 worker，模拟无亲和的负载均衡)，收到 reconnect 提示时按提示重连"""
+        url = f"{self.base_urls[index % len(self.base_urls)]}{path}"
+        params = ([f"route={quote(route, safe='')}"] if self.routed and route else []) + ([query] if query else [])
+        if params:
+            url += "?" + "&".join(params)
+        for _ in range(3):
+            ws = await websockets.connect(url, max_size=None)
+            if not self.routed:
+                return ws
+            hello = json.loads(await ws.recv())
+            if hello.get("type") != "reconnect":
+                worker = hello.get("worker")
+                self.connections_per_worker[worker] = self.connections_per_worker.get(worker, 0) + 1
+                return ws
+            self.redirects += 1
+            await ws.close()
+            url = hello["url"] + (f"&{query}" if query else "")
+        raise ConnectionError("too many redirects")
+
+    async def run(self) -> dict:
+        cfg = self.config
+        viewer_tasks = [asyncio.create_task(self._viewer(i)) for i in range(cfg.viewers)]
+        # 等观看端全部就绪，避免把建连耗时算成丢失
+        await asyncio.sleep(0.2 + cfg.viewers * 0.002)
+
+        started_at = time.perf_counter()
+        device_tasks = []
+        for i in range(cfg.devices):
+            device_tasks.append(asyncio.create_task(self._device(i)))
+            if cfg.ramp_up > 0:
+                await asyncio.sleep(cfg.ramp_up / max(cfg.devices, 1))
+
+        await asyncio.sleep(max(cfg.duration - (time.perf_counter() - started_at), 0))
+        self._stop.set()
+        elapsed = time.perf_counter() - started_at
+        await asyncio.gather(*device_tasks, return_exceptions=True)
+
+        # 等待在途消息到达观看端
+        await asyncio.sleep(cfg.drain)
+        for task in viewer_tasks:
+            task.cancel()
+        await asyncio.gather(*viewer_tasks, return_exceptions=True)
+
+        return self.report(elapsed)
+
+    async def _device(self, index: int):
+        cfg = self.config
+        device_id = f"loadtest-dev-{index:05d}"
+        user_id = self.user_for_device(index)
+        rng = random.Random(cfg.seed + index)
+        frame = synthetic_jpeg(cfg.frame_bytes, rng)
+        phase = rng.random() * math.pi
+
+        try:
+            ws = await self.connect(f"/ws/device/{device_id}", user_id or device_id, index)
+        except Exception:
+            self.connect_errors += 1
+            return
+
+        pending_heartbeats: List[float] = []
+
+        async def reader():
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") == "heartbeat_ack" and pending_heartbeats:
+                    self.heartbeat_rtts_ms.append(now_ms() - pending_heartbeats.pop(0))
+
+        async def send(message: dict, stream: Optional[str]):
+            try:
+                await ws.send(json.dumps(message, separators=(",", ":")))
+            except Exception:
+                self.send_errors += 1
+                return
+            if stream and user_id:
+                stats = self.stats[stream]
+                stats.sent += 1
+                stats.expected += self.viewers_per_user.get(user_id, 0)
+
+        async def every(interval: float, build, stream: Optional[str]):
+            if interval <= 0:
+                return
+            next_at = time.perf_counter() + rng.random() * interval
+            while not self._stop.is_set():
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), delay)
+                        return
+                    except asyncio.TimeoutError:
+                        pass
+                next_at += interval
+                await send(build(), stream)
+
+        def video_frame():
+            sent_at = now_ms()
+            return {
+                "type": "video_frame", "user_id": user_id, "frame": frame,
+                "pose": synthetic_keypoints(sent_at / 1000, phase),
+                "metrics": {"accuracy": 80.0}, "timestamp": sent_at,
+            }
+
+        def pose_data():
+            sent_at = now_ms()
+            return {
+                "type": "pose_data", "user_id": user_id,
+                "data": {"keypoints": synthetic_keypoints(sent_at / 1000, phase),
+                         "confidence": 0.9, "sent_at": sent_at},
+            }
+
+        def metrics():
+            return {
+                "type": "metrics", "user_id": user_id,
+                "data": {"hit_rate": rng.uniform(50, 95), "reaction_time": rng.uniform(250, 500),
+                         "accuracy": rng.uniform(60, 95), "fatigue_level": rng.uniform(10, 70),
+                         "sent_at": now_ms()},
+            }
+
+        def heartbeat():
+            pending_heartbeats.append(now_ms())
+            return {"type": "heartbeat"}
+
+        reader_task = asyncio.create_task(reader())
+        try:
+            await asyncio.gather(
+                every(1 / cfg.frame_rate if cfg.frame_rate else 0, video_frame, "video_frame"),
+                every(1 / cfg.pose_rate if cfg.pose_rate else 0, pose_data, "pose_update"),
+                every(1 / cfg.metrics_rate if cfg.metrics_rate else 0, metrics, "metrics_update"),
+                every(cfg.heartbeat_interval, heartbeat, None),
+            )
+        finally:
+            reader_task.cancel()
+            await ws.close()
+
+    async def _viewer(self, index: int):
+        user_id = f"loadtest-user-{index:04d}"
+        try:
+            query = f"coalesce={self.config.coalesce:g}" if self.config.coalesce else ""
+            ws = await self.connect(f"/ws/user/{user_id}", user_id, index, query)
+        except Exception:
+            self.connect_errors += 1
+            return
+        self.viewers_per_user[user_id] = self.viewers_per_user.get(user_id, 0) + 1
+
+        try:
+            async for raw in ws:
+                self.on_viewer_message(raw)
+        finally:
+            self.viewers_per_user[user_id] -= 1
+            await ws.close()
+
+    def on_viewer_message(self, raw):
+        received_at = now_ms()
+        self.viewer_messages += 1
+        message = json.loads(raw)
+        if message.get("type") == "batch":
+            updates = message.get("updates") or []
+            for update in updates:
+                self._record(update, len(raw) // len(updates), received_at)
+        else:
+            self._record(message, len(raw), received_at)
+
+    def _record(self, message: dict, size: int, received_at: float):
+        msg_type = message.get("type")
+        stats = self.stats.get(msg_type)
+        if stats is None:
+            return
+        stats.received += 1
+        stats.bytes_received += size
+        if msg_type == "video_frame":
+            sent_at = message.get("timestamp")
+        else:
+            sent_at = (message.get("data") or {}).get("sent_at")
+        if sent_at is not None:
+            stats.latencies_ms.append(received_at - sent_at)
+
+    def report(self, elapsed: float) -> dict:
+        streams = {}
+        for name, stats in self.stats.items():
+            lat = sorted(stats.latencies_ms)
+            streams[name] = {
+                "sent": stats.sent,
+                "expected": stats.expected,
+                "received": stats.received,
+                "drop_rate": round(1 - stats.received / stats.expected, 4) if stats.expected else 0,
+                "msgs_per_sec": round(stats.received / elapsed, 1) if elapsed else 0,
+                "mb_per_sec": round(stats.bytes_received / elapsed / 1e6, 3) if elapsed else 0,
+                "latency_ms": percentiles(lat),
+            }
+        return {
+            "config": self.config.__dict__,
+            "elapsed_sec": round(elapsed, 2),
+            "connect_errors": self.connect_errors,
+            "send_errors": self.send_errors,
+            "viewer_messages": self.viewer_messages,
+            "redirects": self.redirects,
+            "connections_per_worker": self.connections_per_worker,
+            "heartbeat_rtt_ms": percentiles(sorted(self.heartbeat_rtts_ms)),
+            "streams": streams,
+        }
+
+
+def percentiles(sorted_values: List[float]) -> dict:
+    if not sorted_values:
+        return {}
+    n = len(sorted_values)
+
+    def pick(q: float) -> float:
+        return round(sorted_values[min(int(q * n), n - 1)], 2)
+
+    return {"p50": pick(0.5), "p90": pick(0.9), "p95": pick(0.95), "p99": pick(0.99),
+            "max": round(sorted_values[-1], 2)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(port: int, env: Optional[Dict[str, str]] = None):
+    """子进程入口: 完整应用 + 内存存储后端"""
+    os.environ["STORAGE_BACKEND"] = "memory"
+    os.environ.update(env or {})
+    import uvicorn
+    from .main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets")
+
+
+async def _wait_for_port(port: int, timeout: float = 15.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run_local(config: LoadTestConfig) -> dict:
+    """在子进程中启动服务并压测 (压测端与服务端不共用事件循环)
+
+    多个 worker 时每个 worker 一个进程，通过 ROUTING_PEERS 互相知晓。
+    """
+    ports = [_free_port() for _ in range(max(config.workers, 1))]
+    urls = [f"ws://127.0.0.1:{port}" for port in ports]
+    env = {}
+    if len(ports) > 1:
+        env["ROUTING_PEERS"] = ",".join(f"w{i}={url}" for i, url in enumerate(urls))
+
+    context = multiprocessing.get_context("spawn")
+    servers = [
+        context.Process(target=_serve, args=(port, {**env, "WORKER_ID": f"w{i}"}), daemon=True)
+        for i, port in enumerate(ports)
+    ]
+    for server in servers:
+        server.start()
+    try:
+        for port in ports:
+            await _wait_for_port(port)
+        return await LoadTest(config, urls).run()
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.join()
+
+
+def print_report(report: dict):
+    print(f"[LOAD] 运行 {report['elapsed_sec']}s, 建连失败 {report['connect_errors']}, "
+          f"发送失败 {report['send_errors']}, 观看端收到 {report['viewer_messages']} 条WebSocket消息")
+    print(f"[LOAD] 心跳往返(ms): {report['heartbeat_rtt_ms']}")
+    if report["connections_per_worker"]:
+        print(f"[LOAD] 重连提示 {report['redirects']} 次, 各 worker 连接数 {report['connections_per_worker']}")
+    for name, s in report["streams"].items():
+        print(f"[LOAD] {name:15s} 发送 {s['sent']:>8} 应收 {s['expected']:>8} 实收 {s['received']:>8} "
+              f"丢失率 {s['drop_rate']:.2%} {s['msgs_per_sec']:>9} msg/s {s['mb_per_sec']:>8} MB/s")
+        print(f"[LOAD] {'':15s} 延迟(ms) {s['latency_ms']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="设备集群与观看端 WebSocket 压测")
+    parser.add_argument("--devices", type=int, default=10, help="模拟设备数")
+    parser.add_argument("--viewers", type=int, default=5, help="观看端数 (设备按序号轮流分配给观看端)")
+    parser.add_argument("--duration", type=float, default=10.0, help="压测时长(秒)")
+    parser.add_argument("--frame-rate", type=float, default=15.0, help="每台设备视频帧/秒")
+    parser.add_argument("--pose-rate", type=float, default=30.0, help="每台设备姿态消息/秒")
+    parser.add_argument("--metrics-rate", type=float, default=2.0, help="每台设备指标消息/秒")
+    parser.add_argument("--heartbeat-interval", type=float, default=5.0, help="心跳间隔(秒)")
+    parser.add_argument("--frame-bytes", type=int, default=20_000, help="合成JPEG大小(字节)")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="设备逐个建连的总时长(秒)")
+    parser.add_argument("--drain", type=float, default=2.0, help="停止发送后等待在途消息的时间(秒)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--coalesce", type=float, default=0.0,
+                        help="观看端合并发送频率(Hz)，0 为逐条发送 (合并时被覆盖的旧消息计入丢失)")
+    parser.add_argument("--workers", type=int, default=1, help="本地启动的 worker 进程数 (大于 1 时开启连接亲和路由)")
+    parser.add_argument("--url", default=None,
+                        help="压测已运行的服务，如 ws://localhost:8000，多个 worker 用逗号分隔 (默认本机子进程启动)")
+    parser.add_argument("--json", default=None, help="把报告写入JSON文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = LoadTestConfig(
+        devices=args.devices, viewers=args.viewers, duration=args.duration,
+        frame_rate=args.frame_rate, pose_rate=args.pose_rate, metrics_rate=args.metrics_rate,
+        heartbeat_interval=args.heartbeat_interval, frame_bytes=args.frame_bytes,
+        ramp_up=args.ramp_up, drain=args.drain, seed=args.seed, coalesce=args.coalesce,
+        workers=args.workers,
+    )
+    if args.url:
+        report = asyncio.run(LoadTest(config, args.url.split(",")).run())
+    else:
+        report = asyncio.run(run_local(config))
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from .core.config import get_settings
+from .core.compression import CompressionMiddleware
 from .core.database import Database
+from .core.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware
+from .core.profiling import ProfilingMiddleware
+from .core.responses import FastJSONResponse
+from .core.recorder import recorder
+from .core import archive, retention
+from .core.routing import routing
+from .core.telemetry import telemetry
+from .core.executors import executors
+from .services.leaderboard_service import LeaderboardService
 from .api.v1.router import api_router
 from .api.v1.websocket import router as ws_router
 
@@ -88,16 +99,50 @@ async def init_demo_data():
     print("[INIT] 测试账户: demo1/demo123, demo2/demo123, demo3/demo123")
 
 
+async def start_retention():
+    """创建/更新 Influx 保留策略与降采样任务; 内存后端在进程内执行降采样"""
+    if not settings.INFLUX_RETENTION_ENABLED:
+        return None
+    if settings.STORAGE_BACKEND == "memory":
+        scheduler = retention.LocalScheduler(retention.LocalEngine(Database.get_influx_write_api()))
+        scheduler.start()
+        return scheduler
+    try:
+        for action in await executors.run("influx", retention.apply, Database.influx_client):
+            print(f"[RETENTION] {action}")
+    except Exception as e:
+        print(f"[RETENTION] 降采样任务配置失败: {e}")
+    return None
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     print(f"[APP] {settings.APP_NAME} v{settings.APP_VERSION} 启动中...")
+    routing.validate()
     await Database.connect()
+    executors.start()
     await init_demo_data()
+    LeaderboardService.schedule_build()
+    if recorder.enabled:
+        recorder.start()
+        print(f"[REC] 会话录制已开启: {recorder.root}")
+    if settings.ARCHIVE_ENABLED:
+        if archive.available():
+            print(f"[ARCHIVE] 会话归档已开启: {settings.ARCHIVE_DIR}")
+        else:
+            print("[ARCHIVE] 未安装 pyarrow，会话归档未开启")
+    scheduler = await start_retention()
+    telemetry.start()
     print("[APP] 服务已就绪")
 
     yield
 
+    await telemetry.stop()
+    if scheduler is not None:
+        await scheduler.stop()
+    recorder.stop()
+    await executors.stop()
     await Database.disconnect()
     print("[APP] 服务已停止")
 
@@ -108,6 +153,7 @@ app = FastAPI(
     description="运动训练AI可视化云平台",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -119,6 +165,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # 注册路由
 app.include_router(api_router, prefix=settings.API_PREFIX)
@@ -139,6 +188,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标"""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.api_route("/keepalive", methods=["GET", "HEAD"])
 async def keepalive():
     """保活接口 - 查询数据库防止MongoDB休眠"""
@@ -164,5 +219,6 @@ async def reset_demo_data():
     await db.training_sessions.delete_many({})
     
     await init_demo_data()
+    await LeaderboardService.rebuild()
     
     return {"status": "success", "message": "演示数据已重置"}
@@ -28,6 +28,12 @@ class DeviceConfig(BaseModel):
     angle_vertical: int = Field(default=0, ge=-30, le=30, description="垂直角度")
 
 
+class BulkConfigRequest(BaseModel):
+    """批量下发配置"""
+    device_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    config: DeviceConfig
+
+
 class Device(BaseModel):
     """设备模型"""
     id: Optional[str] = Field(default=None, alias="_id")
@@ -35,9 +41,13 @@ class Device(BaseModel):
     name: str
     type: DeviceType
     status: DeviceStatus = DeviceStatus.OFFLINE
+    status_source: Optional[str] = Field(default=None, description="状态来源，anomaly 表示由异常检测写入")
+    status_metric: Optional[str] = Field(default=None, description="触发异常状态的指标")
     ip_address: Optional[str] = None
     firmware_version: Optional[str] = None
     config: DeviceConfig = Field(default_factory=DeviceConfig)
+    config_version: int = Field(default=0, description="配置版本号，每次更新递增")
+    config_applied_version: int = Field(default=0, description="设备已确认的配置版本号")
     owner_id: Optional[str] = None
     last_heartbeat: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -30,11 +30,11 @@ class PoseData(BaseModel):
 
 
 class TrainingMetrics(BaseModel):
-    """训练指标"""
-    hit_rate: float = Field(ge=0, le=100, description="击球回传率%")
-    reaction_time: float = Field(ge=0, description="平均反应时间(ms)")
-    accuracy: float = Field(ge=0, le=100, description="姿态准确率%")
-    fatigue_level: float = Field(ge=0, le=100, description="疲劳度%")
+    """训练指标 (会话中没有样本的指标为空，不计入排行榜)"""
+    hit_rate: Optional[float] = Field(default=None, ge=0, le=100, description="击球回传率%")
+    reaction_time: Optional[float] = Field(default=None, ge=0, description="平均反应时间(ms)")
+    accuracy: Optional[float] = Field(default=None, ge=0, le=100, description="姿态准确率%")
+    fatigue_level: Optional[float] = Field(default=None, ge=0, le=100, description="疲劳度%")
     calories_burned: float = Field(ge=0, description="消耗卡路里")
     total_hits: int = Field(ge=0, description="总击球数")
     successful_hits: int = Field(ge=0, description="成功击球数")
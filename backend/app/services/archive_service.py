@@ -0,0 +1,147 @@
+"""已完成会话归档 (格式与读取见 core/archive.py)
+
+会话结束后等待 ARCHIVE_DELAY_SECONDS (让 Influx 异步写入落盘)，从原始桶取出
+该设备在会话时间范围内的姿态序列，连同会话指标写入归档文件。查询与写
+文件都在 IO 线程池中执行。
+
+漏归档的会话 (服务重启、开启归档前的历史会话等) 用 backfill 补齐，已存在
+的文件跳过；原始数据超过 INFLUX_RAW_RETENTION_DAYS 后已无法归档:
+    python -m app.services.archive_service backfill --days 7
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Set
+
+import numpy as np
+
+from ..core import archive
+from ..core.config import get_settings
+from ..core.database import Database
+from ..core.executors import executors
+from ..core.metrics import ARCHIVE_SESSIONS
+from ..core.retention import RAW, HistoryQuery, parse_tables
+from ..models.training import TrainingSession, TrainingStatus
+from .history_service import HistoryService, _seconds
+
+settings = get_settings()
+
+POSE_FIELDS = [f"kp{i}_{c}" for i in range(archive.KEYPOINTS) for c in "xyzv"]
+
+
+def _to_arrays(rows: List[dict]):
+    times = np.array([round(r["time"] * 1e9) for r in rows], dtype=np.int64)
+    poses = np.array([[r.get(f, 0.0) for f in POSE_FIELDS] for r in rows], dtype=np.float32)
+    confidence = np.array([r.get("confidence", 0.0) for r in rows], dtype=np.float32)
+    return times, poses.reshape(-1, archive.KEYPOINTS, archive.CHANNELS), confidence
+
+
+def _fetch(query_api, flux: str):
+    # 在 IO 线程中查询并转换，大会话的逐行解析不占用事件循环
+    return _to_arrays(parse_tables(query_api.query(flux, org=settings.INFLUX_ORG)))
+
+
+class ArchiveService:
+    """会话归档"""
+
+    # 后台归档任务 (保持引用，避免任务被回收)
+    _tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def path(session: TrainingSession) -> str:
+        return archive.session_path(
+            settings.ARCHIVE_DIR, session.user_id, session.start_time.strftime("%Y-%m"), session.id
+        )
+
+    @classmethod
+    async def _load_pose(cls, session: TrainingSession):
+        query = HistoryQuery(RAW, "pose_data", _seconds(session.start_time), _seconds(session.end_time),
+                             {"device_id": session.device_id}, None, 0, "mean")
+        engine = HistoryService._local_engine()
+        if engine is not None:
+            return _to_arrays(engine.query(query))
+        return await executors.run("influx", _fetch, Database.get_influx_query_api(), query.flux())
+
+    @classmethod
+    async def archive(cls, session: TrainingSession) -> str:
+        """归档一个已完成的会话，返回文件路径"""
+        times, poses, confidence = await cls._load_pose(session)
+        meta = {
+            "session_id": session.id,
+            "user_id": session.user_id,
+            "device_id": session.device_id,
+            "month": session.start_time.strftime("%Y-%m"),
+            "start_time": session.start_time.isoformat(),
+            "end_time": session.end_time.isoformat(),
+            "duration_seconds": session.duration_seconds,
+            "training_mode": session.training_mode,
+            "difficulty_level": session.difficulty_level,
+            "metrics": session.metrics.model_dump() if session.metrics else None,
+        }
+        path = await executors.run("archive", archive.write_session, settings.ARCHIVE_DIR, meta,
+                                   times, poses, confidence)
+        ARCHIVE_SESSIONS.labels("ok" if len(times) else "empty").inc()
+        return path
+
+    @classmethod
+    async def _archive_later(cls, session: TrainingSession):
+        await asyncio.sleep(settings.ARCHIVE_DELAY_SECONDS)
+        try:
+            await cls.archive(session)
+        except Exception as e:
+            ARCHIVE_SESSIONS.labels("error").inc()
+            print(f"[ARCHIVE] 会话归档失败 {session.id}: {e}")
+
+    @classmethod
+    def schedule(cls, session: TrainingSession):
+        """会话结束后在后台归档 (需开启 ARCHIVE_ENABLED 并安装 pyarrow)"""
+        if not settings.ARCHIVE_ENABLED or not archive.available() or session.end_time is None:
+            return
+        task = asyncio.create_task(cls._archive_later(session))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    async def backfill(cls, days: int) -> dict:
+        """归档最近 days 天内结束、尚无归档文件的会话"""
+        collection = Database.get_mongo().training_sessions
+        since = datetime.utcnow() - timedelta(days=days)
+        counts = {"archived": 0, "skipped": 0, "failed": 0}
+        async for doc in collection.find({"status": TrainingStatus.COMPLETED, "end_time": {"$gte": since}}):
+            doc["_id"] = str(doc["_id"])
+            session = TrainingSession(**doc)
+            if os.path.exists(cls.path(session)):
+                counts["skipped"] += 1
+                continue
+            try:
+                await cls.archive(session)
+                counts["archived"] += 1
+            except Exception as e:
+                ARCHIVE_SESSIONS.labels("error").inc()
+                counts["failed"] += 1
+                print(f"[ARCHIVE] 会话归档失败 {session.id}: {e}")
+        return counts
+
+
+async def _run(command: str, days: int):
+    await Database.connect()
+    try:
+        if command == "backfill":
+            print(await ArchiveService.backfill(days))
+    finally:
+        await Database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话归档")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--days", type=int, default=settings.INFLUX_RAW_RETENTION_DAYS)
+    args = parser.parse_args()
+    if not archive.available():
+        parser.error("会话归档需要安装 pyarrow")
+    asyncio.run(_run(args.command, args.days))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from ..core.config import get_settings
+from ..core.database import Database
+from ..core.routing import routing
+from ..models.device import DeviceConfig
+from .device_service import DeviceService
+
+settings = get_settings()
+
+# 下发结果
+ACKED = "acked"
+REJECTED = "rejected"
+# 设备未连接到执行下发的 worker (结果中的 worker 字段)，不代表设备在其他副本上也不在线
+OFFLINE = "offline"
+TIMEOUT = "timeout"
+SUPERSEDED = "superseded"
+NOT_FOUND = "not_found"
+
+# 批量下发任务 (Redis 哈希，各副本都能查询进度)
+JOB_KEY = "cfgjob:{}"
+JOB_TTL = 24 * 3600
+
+
+class ConfigPushService:
+    """设备配置下发
+
+    配置写入 Mongo 后递增 config_version，经设备 WebSocket 发送
+    {"type": "config_update", "version", "config"}，设备回复
+    {"type": "config_ack", "version", "status": "ok" | "error"}。
+    未确认的版本在设备重连时自动补发。
+
+    只能下发到连接在本进程的设备: 多副本部署时设备连在其他 worker 上也会
+    得到 OFFLINE (配置已写入 Mongo，设备下次连接时补发)。结果中的 worker
+    为执行下发的 worker。
+    """
+
+    # device_id -> (等待确认的版本, future)
+    _pending: Dict[str, Tuple[int, asyncio.Future]] = {}
+    # 后台下发任务 (保持引用，避免任务被回收)
+    _tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _manager():
+        # 延迟导入，避免与 api.v1.websocket 循环依赖
+        from ..api.v1.websocket import manager
+        return manager
+
+    @classmethod
+    async def push(cls, device_id: str, config: DeviceConfig, version: int) -> dict:
+        """下发一个配置版本并等待确认，超时按 CONFIG_PUSH_RETRIES 重试 (仅本进程的设备连接)"""
+        manager = cls._manager()
+        message = {"type": "config_update", "version": version, "config": config.model_dump()}
+        result = {"device_id": device_id, "version": version, "attempts": 0, "worker": routing.worker_id}
+
+        previous = cls._pending.get(device_id)
+        if previous is not None and previous[0] < version and not previous[1].done():
+            previous[1].set_result(SUPERSEDED)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        cls._pending[device_id] = (version, future)
+        try:
+            for attempt in range(settings.CONFIG_PUSH_RETRIES + 1):
+                result["attempts"] = attempt + 1
+                if not await manager.send_to_device(device_id, message):
+                    result["status"] = OFFLINE
+                    return result
+                try:
+                    result["status"] = await asyncio.wait_for(
+                        asyncio.shield(future), settings.CONFIG_ACK_TIMEOUT * (2 ** attempt)
+                    )
+                    return result
+                except asyncio.TimeoutError:
+                    continue
+            result["status"] = TIMEOUT
+            return result
+        finally:
+            if cls._pending.get(device_id, (None, None))[1] is future:
+                del cls._pending[device_id]
+
+    @classmethod
+    async def handle_ack(cls, device_id: str, data: dict):
+        """处理设备的 config_ack"""
+        version = data.get("version")
+        if not isinstance(version, int):
+            return
+        ok = data.get("status", "ok") == "ok"
+        if ok:
+            await DeviceService.mark_config_applied(device_id, version)
+
+        pending = cls._pending.get(device_id)
+        if pending is not None and pending[0] == version and not pending[1].done():
+            pending[1].set_result(ACKED if ok else REJECTED)
+
+    @classmethod
+    async def update_and_push(cls, device_id: str, config: DeviceConfig) -> dict:
+        version = await DeviceService.update_config(device_id, config)
+        if version is None:
+            return {"device_id": device_id, "status": NOT_FOUND, "attempts": 0}
+        return await cls.push(device_id, config, version)
+
+    @classmethod
+    async def update_many(
+        cls, device_ids: List[str], config: DeviceConfig, concurrency: Optional[int] = None,
+        on_result: Optional[Callable] = None
+    ) -> List[dict]:
+        """把同一配置应用到多台设备，同时进行中的下发不超过 concurrency 个
+
+        on_result 为协程函数，每台设备下发结束时以结果调用。
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.CONFIG_PUSH_CONCURRENCY)
+
+        async def one(device_id: str) -> dict:
+            async with semaphore:
+                result = await cls.update_and_push(device_id, config)
+            if on_result is not None:
+                await on_result(result)
+            return result
+
+        return await asyncio.gather(*(one(device_id) for device_id in dict.fromkeys(device_ids)))
+
+    @classmethod
+    async def start_bulk(cls, device_ids: List[str], config: DeviceConfig) -> dict:
+        """登记批量下发任务并在后台执行，立即返回任务信息 (进度用 get_bulk 查询)"""
+        device_ids = list(dict.fromkeys(device_ids))
+        job_id = uuid.uuid4().hex
+        key = JOB_KEY.format(job_id)
+        redis = Database.get_redis()
+        await redis.hset(key, mapping={"total": len(device_ids), "done": 0, "created_at": time.time()})
+        await redis.expire(key, JOB_TTL)
+
+        async def on_result(result: dict):
+            try:
+                await redis.hset(key, f"d:{result['device_id']}", json.dumps(result))
+                await redis.hincrby(key, "done", 1)
+            except Exception as e:
+                print(f"[CONFIG] 批量下发进度写入失败 {job_id}: {e}")
+
+        async def run():
+            try:
+                await cls.update_many(device_ids, config, on_result=on_result)
+            except Exception as e:
+                print(f"[CONFIG] 批量下发失败 {job_id}: {e}")
+
+        cls.spawn(run())
+        return {"job_id": job_id, "total": len(device_ids)}
+
+    @classmethod
+    async def get_bulk(cls, job_id: str) -> Optional[dict]:
+        """批量下发任务的进度与已完成设备的结果，任务不存在或已过期时返回 None"""
+        fields = await Database.get_redis().hgetall(JOB_KEY.format(job_id))
+        if not fields:
+            return None
+        total, done = int(fields["total"]), int(fields["done"])
+        results = [json.loads(v) for k, v in fields.items() if k.startswith("d:")]
+        return {
+            "job_id": job_id,
+            "status": "completed" if done >= total else "running",
+            "total": total,
+            "done": done,
+            "results": results,
+        }
+
+    @classmethod
+    def spawn(cls, coro) -> asyncio.Task:
+        """后台执行下发，不阻塞调用方"""
+        task = asyncio.create_task(coro)
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+        return task
+
+    @classmethod
+    async def on_device_connected(cls, device_id: str):
+        """设备连接后补发尚未确认的最新配置"""
+        device = await DeviceService.get_device(device_id)
+        if device is not None and device.config_applied_version < device.config_version:
+            await cls.push(device_id, device.config, device.config_version)
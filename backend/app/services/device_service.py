@@ -2,9 +2,14 @@ from typing import Optional, List
 from datetime import datetime, timedelta
 from bson import ObjectId
 from influxdb_client import Point
+from pymongo import ReturnDocument
 
 from ..core.database import Database
 from ..core.config import get_settings
+from ..core.data_version import DataVersions
+from ..core.telemetry import telemetry
+from ..core.anomaly import SOURCE as ANOMALY_SOURCE, AnomalyEvent, detector
+from ..core.metrics import DEVICE_ANOMALIES
 from ..models.device import Device, DeviceStatus, DeviceConfig, DeviceHeartbeat
 
 settings = get_settings()
@@ -32,6 +37,7 @@ class DeviceService:
 
         result = await collection.insert_one(device_dict)
         device.id = str(result.inserted_id)
+        await DataVersions.bump(device.owner_id)
 
         return device
 
@@ -40,52 +46,123 @@ class DeviceService:
         """更新设备状态"""
         collection = cls._get_collection()
 
-        result = await collection.update_one(
+        # 人工设置的状态去掉异常检测标记，心跳不会自动清除
+        before = await collection.find_one_and_update(
             {"device_id": device_id},
             {
                 "$set": {
                     "status": status,
                     "updated_at": datetime.utcnow()
-                }
-            }
+                },
+                "$unset": {"status_source": "", "status_metric": ""}
+            },
+            projection={"status": 1, "owner_id": 1}
         )
 
-        return result.modified_count > 0
+        if not before:
+            return False
+        if before.get("status") != status:
+            await DataVersions.bump(before.get("owner_id"))
+        return True
 
     @classmethod
-    async def update_config(cls, device_id: str, config: DeviceConfig) -> bool:
-        """更新设备配置"""
+    async def update_config(cls, device_id: str, config: DeviceConfig) -> Optional[int]:
+        """更新设备配置，返回新的配置版本号 (设备不存在时返回 None)"""
         collection = cls._get_collection()
 
-        result = await collection.update_one(
+        device = await collection.find_one_and_update(
             {"device_id": device_id},
             {
                 "$set": {
                     "config": config.model_dump(),
                     "updated_at": datetime.utcnow()
-                }
-            }
+                },
+                "$inc": {"config_version": 1}
+            },
+            projection={"config_version": 1, "owner_id": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+        if not device:
+            return None
+        await DataVersions.bump(device.get("owner_id"))
+        return device["config_version"]
+
+    @classmethod
+    async def mark_config_applied(cls, device_id: str, version: int):
+        """记录设备已确认的配置版本"""
+        collection = cls._get_collection()
+
+        device = await collection.find_one_and_update(
+            {"device_id": device_id},
+            {"$max": {"config_applied_version": version}},
+            projection={"owner_id": 1}
         )
 
-        return result.modified_count > 0
+        if device:
+            await DataVersions.bump(device.get("owner_id"))
 
     @classmethod
     async def heartbeat(cls, heartbeat: DeviceHeartbeat):
-        """处理设备心跳"""
+        """处理设备心跳
+
+        检测器状态在各副本进程内 (重启或淘汰后重新建立基线)，同一设备的
+        心跳可能落到不同副本，因此异常状态连同来源写入设备文档:
+        - 本副本判为异常: 写入异常状态，标记 status_source = "anomaly" 与触发指标
+        - 库中是异常检测写入的状态: 任一副本的检测器 recovered() 时改回在线
+        - 其他情况只把离线改为在线，不覆盖人工设置的维护/故障状态
+        未开启异常检测时心跳总是把设备置为在线。
+        """
         collection = cls._get_collection()
+        event = detector.observe(heartbeat.device_id, heartbeat) if settings.ANOMALY_ENABLED else None
 
-        # 更新设备状态
-        await collection.update_one(
+        before = await collection.find_one_and_update(
             {"device_id": heartbeat.device_id},
-            {
-                "$set": {
-                    "status": DeviceStatus.ONLINE,
-                    "last_heartbeat": heartbeat.timestamp,
-                    "updated_at": datetime.utcnow()
-                }
-            }
+            {"$set": {"last_heartbeat": heartbeat.timestamp, "updated_at": datetime.utcnow()}},
+            projection={"status": 1, "owner_id": 1, "status_source": 1, "status_metric": 1}
         )
 
+        if before:
+            current = before.get("status")
+            raised = before.get("status_source") == ANOMALY_SOURCE
+            online = {
+                "$set": {"status": DeviceStatus.ONLINE},
+                "$unset": {"status_source": "", "status_metric": ""}
+            }
+            update = recovery = None
+            if event is not None and event.status != DeviceStatus.ONLINE:
+                if current != event.status or not raised:
+                    update = {"$set": {
+                        "status": DeviceStatus(event.status),
+                        "status_source": ANOMALY_SOURCE,
+                        "status_metric": event.metric
+                    }}
+            elif not settings.ANOMALY_ENABLED:
+                if current != DeviceStatus.ONLINE:
+                    update = online
+            elif raised and current != DeviceStatus.ONLINE:
+                if detector.recovered(heartbeat.device_id, before.get("status_metric")):
+                    update = online
+                    recovery = AnomalyEvent(heartbeat.device_id, DeviceStatus.ONLINE.value, None, None, None, None)
+            elif current == DeviceStatus.OFFLINE:
+                update = online
+
+            # 仅在状态变化 (如离线 -> 在线、在线 -> 故障) 时使设备列表缓存失效，
+            # 单纯的 last_heartbeat 刷新不改变版本号
+            if update is not None:
+                query = {"device_id": heartbeat.device_id, "status": current}
+                result = await collection.update_one(query, update)
+                if result.modified_count:
+                    await DataVersions.bump(before.get("owner_id"))
+                    if recovery is not None:
+                        await cls._notify_anomaly(before.get("owner_id"), recovery)
+
+            # 异常由本副本判定时推送；恢复只由实际清除状态的副本推送一次
+            if event is not None and event.status != DeviceStatus.ONLINE:
+                await cls._notify_anomaly(before.get("owner_id"), event)
+
+        telemetry.record(heartbeat.device_id, heartbeat.model_dump())
+
         # 保存心跳数据到InfluxDB
         write_api = Database.get_influx_write_api()
 
@@ -104,6 +181,18 @@ class DeviceService:
 
         write_api.write(bucket=settings.INFLUX_BUCKET, record=point)
 
+    @staticmethod
+    async def _notify_anomaly(owner_id: Optional[str], event):
+        """把异常/恢复事件推送到设备所有者的 WebSocket (仅本进程的连接)"""
+        DEVICE_ANOMALIES.labels(event.metric or "none", event.status).inc()
+        if not owner_id:
+            return
+        # 延迟导入，避免与 api.v1.websocket 循环依赖
+        from ..api.v1.websocket import manager
+        message = event.to_message()
+        message["timestamp"] = datetime.utcnow().isoformat()
+        await manager.send_to_user(owner_id, message)
+
     @classmethod
     async def get_device(cls, device_id: str) -> Optional[Device]:
         """获取设备信息"""
@@ -116,6 +205,14 @@ class DeviceService:
         device["_id"] = str(device["_id"])
         return Device(**device)
 
+    @classmethod
+    async def is_owner(cls, device_id: str, user_id: str) -> bool:
+        """设备是否属于该用户"""
+        device = await cls._get_collection().find_one(
+            {"device_id": device_id, "owner_id": user_id}, projection={"_id": 1}
+        )
+        return device is not None
+
     @classmethod
     async def get_user_devices(cls, user_id: str) -> List[Device]:
         """获取用户设备列表"""
@@ -155,12 +252,14 @@ class DeviceService:
         """检测离线设备"""
         collection = cls._get_collection()
         timeout = datetime.utcnow() - timedelta(minutes=5)
+        stale = {
+            "status": DeviceStatus.ONLINE,
+            "last_heartbeat": {"$lt": timeout}
+        }
 
+        owners = await collection.distinct("owner_id", stale)
         await collection.update_many(
-            {
-                "status": DeviceStatus.ONLINE,
-                "last_heartbeat": {"$lt": timeout}
-            },
+            stale,
             {
                 "$set": {
                     "status": DeviceStatus.OFFLINE,
@@ -168,3 +267,4 @@ class DeviceService:
                 }
             }
         )
+        await DataVersions.bump(*owners)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from ..core.config import get_settings
+from ..core.database import Database
+from ..core.executors import executors
+from ..core.retention import (
+    AGGREGATES, HistoryQuery, LocalEngine, parse_tables, plan, session_summary_flux, session_summary_query
+)
+from ..models.training import TrainingSession
+
+settings = get_settings()
+
+
+def _seconds(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class HistoryService:
+    """Influx 历史数据查询，按分辨率路由到原始/降采样层 (见 core/retention.py)"""
+
+    # 后台会话汇总任务 (保持引用，避免任务被回收)
+    _tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _local_engine() -> Optional[LocalEngine]:
+        # 内存后端没有 Flux 引擎，在捕获的写入点上执行同一查询
+        if settings.STORAGE_BACKEND == "memory":
+            return LocalEngine(Database.get_influx_write_api())
+        return None
+
+    @classmethod
+    async def run(cls, query: HistoryQuery) -> List[dict]:
+        engine = cls._local_engine()
+        if engine is not None:
+            return engine.query(query)
+        query_api = Database.get_influx_query_api()
+        tables = await executors.run("influx", query_api.query, query.flux(), org=settings.INFLUX_ORG)
+        return parse_tables(tables)
+
+    @classmethod
+    async def _history(cls, measurement: str, tags: Dict[str, str], hours: float,
+                       resolution: Optional[int], fields: Optional[List[str]], agg: str) -> dict:
+        stop = time.time()
+        query = plan(measurement, stop - hours * 3600, stop, tags, resolution, fields, agg, now=stop)
+        return {
+            "tier": query.tier.name,
+            "resolution": query.every,
+            "agg": agg,
+            "points": await cls.run(query),
+        }
+
+    @classmethod
+    async def get_pose_history(cls, device_id: str, hours: float = 1, resolution: Optional[int] = None,
+                               fields: Optional[List[str]] = None, agg: str = "mean") -> dict:
+        """设备姿态历史，resolution 为秒 (不指定时按时间跨度自动选择)"""
+        return await cls._history("pose_data", {"device_id": device_id}, hours, resolution, fields, agg)
+
+    @classmethod
+    async def get_heartbeat_history(cls, device_id: str, hours: float = 24, resolution: Optional[int] = None,
+                                    agg: str = "mean") -> dict:
+        """设备心跳指标历史"""
+        return await cls._history("device_heartbeat", {"device_id": device_id}, hours, resolution, None, agg)
+
+    @classmethod
+    async def get_session_pose_summary(cls, session: TrainingSession) -> Dict[str, dict]:
+        """会话姿态汇总 {agg: {字段: 值}}，尚未生成时为空"""
+        if session.end_time is None:
+            return {}
+        start, stop = _seconds(session.start_time), _seconds(session.end_time)
+        results = await asyncio.gather(*(
+            cls.run(session_summary_query(session.id, start, stop, agg)) for agg in AGGREGATES
+        ))
+        summary = {}
+        for agg, rows in zip(AGGREGATES, results):
+            if rows:
+                row = dict(rows[-1])
+                row.pop("time", None)
+                summary[agg] = row
+        return summary
+
+    @classmethod
+    async def _summarize(cls, session_id: str, device_id: str, start: float, stop: float):
+        engine = cls._local_engine()
+        if engine is not None:
+            engine.summarize_session(session_id, device_id, start, stop)
+            return
+        try:
+            query_api = Database.get_influx_query_api()
+            await executors.run(
+                "influx", query_api.query, session_summary_flux(session_id, device_id, start, stop),
+                org=settings.INFLUX_ORG
+            )
+        except Exception as e:
+            print(f"[RETENTION] 会话汇总失败 {session_id}: {e}")
+
+    @classmethod
+    def summarize_session(cls, session: TrainingSession):
+        """会话结束后在后台生成姿态汇总 (需开启 INFLUX_RETENTION_ENABLED)"""
+        if not settings.INFLUX_RETENTION_ENABLED or session.end_time is None:
+            return
+        task = asyncio.create_task(cls._summarize(
+            session.id, session.device_id, _seconds(session.start_time), _seconds(session.end_time)
+        ))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
@@ -0,0 +1,291 @@
+"""训练排行榜 (Redis 有序集合)
+
+每个排行榜是一个有序集合 lb:<指标>:<范围>:<周期>，成员为 user_id，分数为
+该用户在此范围/周期内各会话指标的平均值；对应的哈希 lba:<...> 保存各用户
+的累计值 (<user_id>:s) 与会话数 (<user_id>:n)。
+
+- 指标: hit_rate / accuracy (越高越好)，reaction_time (越低越好)
+- 范围: * (全部训练模式) 或某个 training_mode
+- 周期: all (全部) 或 ISO 周，如 2026-W42 (保留 LEADERBOARD_WEEKS 周后过期)
+
+会话结束时增量更新 (两次 Redis 往返)，查询前 N 名、本人名次及前后相邻
+用户均为 O(log n + N)。Redis 数据丢失后用
+``python -m app.services.leaderboard_service rebuild`` 从 Mongo 重建
+(服务启动后发现排行榜未建立也会在后台自动重建；各副本/进程通过 Redis
+锁保证同一时间只有一个重建)。
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from ..core.config import get_settings
+from ..core.database import Database
+from ..models.training import TrainingSession
+
+settings = get_settings()
+
+# 指标 -> 是否越高越好
+METRICS = {"hit_rate": True, "accuracy": True, "reaction_time": False}
+ALL_MODES = "*"
+ALL_TIME = "all"
+# 排行榜已建立的标记 (不存在时启动时重建)
+BUILT_KEY = "lb:built"
+# 重建锁 (SET NX)，持有者异常退出时按过期时间释放
+REBUILD_LOCK_KEY = "lb:rebuild-lock"
+REBUILD_LOCK_SECONDS = 600
+
+# (指标, 范围, 周期)
+Board = Tuple[str, str, str]
+
+
+def week_of(value: datetime) -> str:
+    year, week, _ = value.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _week_start(week: str) -> datetime:
+    return datetime.strptime(f"{week}-1", "%G-W%V-%u")
+
+
+def _week_ttl(week: str, now: Optional[datetime] = None) -> int:
+    """周榜在该周结束后再保留 LEADERBOARD_WEEKS 周"""
+    expires = _week_start(week) + timedelta(weeks=settings.LEADERBOARD_WEEKS + 1)
+    return max(int((expires - (now or datetime.utcnow())).total_seconds()), 1)
+
+
+def _key(board: Board) -> str:
+    return "lb:{}:{}:{}".format(*board)
+
+
+def _agg_key(board: Board) -> str:
+    return "lba:{}:{}:{}".format(*board)
+
+
+def _boards(metric: str, mode: str, week: str) -> List[Board]:
+    return [(metric, scope, period) for scope in (ALL_MODES, mode) for period in (ALL_TIME, week)]
+
+
+class LeaderboardService:
+    """训练排行榜"""
+
+    # 后台重建任务 (保持引用，避免任务被回收)
+    _tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def board(metric: str, mode: Optional[str] = None, week: Optional[str] = None) -> Board:
+        """week 为 None 时为总榜，"current" 为本周"""
+        if week == "current":
+            week = week_of(datetime.utcnow())
+        return metric, mode or ALL_MODES, week or ALL_TIME
+
+    @classmethod
+    async def record(cls, session: TrainingSession):
+        """会话结束后累计到各排行榜"""
+        if session.metrics is None:
+            return
+        week = week_of(session.end_time or datetime.utcnow())
+        values = session.metrics.model_dump()
+        # 会话中没有样本的指标不计入
+        boards = [
+            board for metric in METRICS if values[metric] is not None
+            for board in _boards(metric, session.training_mode, week)
+        ]
+        if not boards:
+            return
+        try:
+            redis = Database.get_redis()
+            pipe = redis.pipeline(transaction=False)
+            for board in boards:
+                pipe.hincrbyfloat(_agg_key(board), f"{session.user_id}:s", values[board[0]])
+                pipe.hincrby(_agg_key(board), f"{session.user_id}:n", 1)
+            results = await pipe.execute()
+
+            pipe = redis.pipeline(transaction=False)
+            for i, board in enumerate(boards):
+                total, count = float(results[2 * i]), int(results[2 * i + 1])
+                pipe.zadd(_key(board), {session.user_id: total / count})
+                if board[2] != ALL_TIME:
+                    ttl = _week_ttl(board[2])
+                    pipe.expire(_key(board), ttl)
+                    pipe.expire(_agg_key(board), ttl)
+            await pipe.execute()
+        except Exception as e:
+            print(f"[LEADERBOARD] 更新失败 {session.id}: {e}")
+
+    @staticmethod
+    async def _usernames(user_ids: Iterable[str]) -> Dict[str, str]:
+        ids = [ObjectId(u) for u in user_ids if ObjectId.is_valid(u)]
+        if not ids:
+            return {}
+        cursor = Database.get_mongo()["users"].find({"_id": {"$in": ids}}, projection={"username": 1})
+        return {str(u["_id"]): u.get("username") async for u in cursor}
+
+    @classmethod
+    async def _entries(cls, board: Board, first_rank: int, members: List[Tuple[str, float]]) -> List[dict]:
+        if not members:
+            return []
+        user_ids = [m for m, _ in members]
+        counts = await Database.get_redis().hmget(_agg_key(board), [f"{u}:n" for u in user_ids])
+        names = await cls._usernames(user_ids)
+        return [
+            {
+                "rank": first_rank + i,
+                "user_id": user_id,
+                "username": names.get(user_id),
+                "score": round(score, 2),
+                "sessions": int(count or 0),
+            }
+            for i, ((user_id, score), count) in enumerate(zip(members, counts))
+        ]
+
+    @staticmethod
+    async def _range(board: Board, start: int, end: int) -> List[Tuple[str, float]]:
+        return await Database.get_redis().zrange(
+            _key(board), start, end, desc=METRICS[board[0]], withscores=True
+        )
+
+    @staticmethod
+    async def _rank(board: Board, user_id: str) -> Optional[int]:
+        """0 起的名次，不在榜上为 None"""
+        redis = Database.get_redis()
+        if METRICS[board[0]]:
+            return await redis.zrevrank(_key(board), user_id)
+        return await redis.zrank(_key(board), user_id)
+
+    @classmethod
+    async def top(cls, board: Board, limit: int = 10) -> dict:
+        """前 limit 名"""
+        total = await Database.get_redis().zcard(_key(board))
+        return {
+            "metric": board[0],
+            "mode": board[1],
+            "period": board[2],
+            "total": total,
+            "entries": await cls._entries(board, 1, await cls._range(board, 0, limit - 1)),
+        }
+
+    @classmethod
+    async def around(cls, board: Board, user_id: str, radius: int = 5) -> dict:
+        """用户本人名次及前后各 radius 名"""
+        rank = await cls._rank(board, user_id)
+        result = {"metric": board[0], "mode": board[1], "period": board[2], "rank": None, "entries": []}
+        if rank is None:
+            return result
+        start = max(rank - radius, 0)
+        result["rank"] = rank + 1
+        result["entries"] = await cls._entries(board, start + 1, await cls._range(board, start, rank + radius))
+        return result
+
+    @classmethod
+    async def rebuild(cls) -> Optional[int]:
+        """从 Mongo 中已完成的会话重建全部排行榜，返回会话数
+
+        新数据写入临时键后 RENAME 覆盖，查询不会看到半成品；重建期间结束的
+        会话可能被覆盖，必要时再执行一次。其他进程正在重建时直接返回 None。
+        """
+        redis = Database.get_redis()
+        token = uuid.uuid4().hex
+        if not await redis.set(REBUILD_LOCK_KEY, token, nx=True, ex=REBUILD_LOCK_SECONDS):
+            return None
+        try:
+            return await cls._rebuild()
+        finally:
+            if await redis.get(REBUILD_LOCK_KEY) == token:
+                await redis.delete(REBUILD_LOCK_KEY)
+
+    @classmethod
+    async def _rebuild(cls) -> int:
+        oldest_week = week_of(datetime.utcnow() - timedelta(weeks=settings.LEADERBOARD_WEEKS))
+        totals: Dict[Board, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(lambda: [0.0, 0]))
+        sessions = 0
+        cursor = Database.get_mongo()["training_sessions"].find(
+            {"end_time": {"$ne": None}, "metrics": {"$ne": None}},
+            projection={"user_id": 1, "end_time": 1, "training_mode": 1, "metrics": 1},
+        )
+        async for doc in cursor:
+            metrics = doc.get("metrics") or {}
+            week = week_of(doc["end_time"])
+            sessions += 1
+            for metric in METRICS:
+                value = metrics.get(metric)
+                if value is None:
+                    continue
+                for board in _boards(metric, doc.get("training_mode") or "standard", week):
+                    # ISO 周字符串按字典序即时间顺序
+                    if board[2] != ALL_TIME and board[2] < oldest_week:
+                        continue
+                    acc = totals[board][doc["user_id"]]
+                    acc[0] += value
+                    acc[1] += 1
+
+        redis = Database.get_redis()
+        old_keys = {key async for key in redis.scan_iter(match="lb:*:*:*", count=1000)}
+        old_keys |= {key async for key in redis.scan_iter(match="lba:*", count=1000)}
+        suffix = f":rebuild:{int(time.time())}"
+        pipe = redis.pipeline(transaction=False)
+        for board, users in totals.items():
+            pipe.zadd(_key(board) + suffix, {user_id: s / n for user_id, (s, n) in users.items()})
+            pipe.hset(_agg_key(board) + suffix, mapping={
+                field: value for user_id, (s, n) in users.items()
+                for field, value in ((f"{user_id}:s", s), (f"{user_id}:n", n))
+            })
+            for key in (_key(board), _agg_key(board)):
+                pipe.rename(key + suffix, key)
+                if board[2] != ALL_TIME:
+                    pipe.expire(key, _week_ttl(board[2]))
+        await pipe.execute()
+
+        new_keys = {key for board in totals for key in (_key(board), _agg_key(board))}
+        stale = old_keys - new_keys
+        if stale:
+            await redis.delete(*stale)
+        await redis.set(BUILT_KEY, int(time.time()))
+        return sessions
+
+    @classmethod
+    async def ensure_built(cls):
+        """排行榜未建立 (新部署或 Redis 数据丢失) 时重建"""
+        try:
+            if not await Database.get_redis().exists(BUILT_KEY):
+                sessions = await cls.rebuild()
+                if sessions is not None:
+                    print(f"[LEADERBOARD] 已从 {sessions} 条会话重建排行榜")
+        except Exception as e:
+            print(f"[LEADERBOARD] 重建失败: {e}")
+
+    @classmethod
+    def schedule_build(cls):
+        """在后台执行 ensure_built，不阻塞服务启动"""
+        task = asyncio.create_task(cls.ensure_built())
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+
+async def _run(command: str):
+    await Database.connect()
+    try:
+        if command == "rebuild":
+            sessions = await LeaderboardService.rebuild()
+            if sessions is None:
+                print("another rebuild is in progress")
+            else:
+                print(f"rebuilt from {sessions} sessions")
+    finally:
+        await Database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练排行榜")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+    asyncio.run(_run(args.command))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import math
+import time
+from typing import Dict, Optional
+from datetime import datetime
+
+from ..core.config import get_settings
+from ..models.training import TrainingSession, TrainingMetrics
+
+settings = get_settings()
+
+# 取样本均值的瞬时指标
+MEAN_FIELDS = ("hit_rate", "reaction_time", "accuracy", "fatigue_level")
+# 设备上报的累计值 (取最大值)
+CUMULATIVE_FIELDS = ("total_hits", "successful_hits", "calories_burned")
+
+
+def _finite(value) -> bool:
+    return isinstance(value, (int, float)) and math.isfinite(value)
+
+
+def _clamp(value: Optional[float], upper: float = math.inf) -> Optional[float]:
+    return None if value is None else min(max(value, 0), upper)
+
+
+class SessionAccumulator:
+    """单个进行中会话的实时指标累加器 (每个样本 O(1) 合并)"""
+
+    __slots__ = (
+        "session_id", "user_id", "device_id", "start_time", "samples",
+        "sums", "counts", "maxima", "latest", "cumulative", "updated_at"
+    )
+
+    def __init__(self, session_id: str, user_id: str, device_id: str, start_time: datetime):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.device_id = device_id
+        self.start_time = start_time
+        self.samples = 0
+        self.sums = dict.fromkeys(MEAN_FIELDS, 0.0)
+        # 每个指标各自的样本数，样本中缺少的指标不拉低均值
+        self.counts = dict.fromkeys(MEAN_FIELDS, 0)
+        self.maxima: Dict[str, float] = {}
+        self.latest: Dict[str, float] = {}
+        self.cumulative = dict.fromkeys(CUMULATIVE_FIELDS, 0.0)
+        self.updated_at = time.monotonic()
+
+    def fold(self, sample: dict):
+        """合并一个实时指标样本 (跳过非数值与 NaN / Infinity)"""
+        counted = False
+        for field in MEAN_FIELDS:
+            value = sample.get(field)
+            if not _finite(value):
+                continue
+            self.sums[field] += value
+            self.counts[field] += 1
+            self.latest[field] = value
+            if value > self.maxima.get(field, float("-inf")):
+                self.maxima[field] = value
+            counted = True
+        for field in CUMULATIVE_FIELDS:
+            value = sample.get(field)
+            if _finite(value) and value > self.cumulative[field]:
+                self.cumulative[field] = value
+        if counted:
+            self.samples += 1
+        self.updated_at = time.monotonic()
+
+    def mean(self, field: str) -> Optional[float]:
+        """该指标的样本均值，没有样本时为 None"""
+        count = self.counts[field]
+        return self.sums[field] / count if count else None
+
+    def to_metrics(self) -> TrainingMetrics:
+        """由累计状态生成最终训练指标 (没有样本的指标为空)"""
+        total_hits = int(self.cumulative["total_hits"])
+        successful_hits = min(int(self.cumulative["successful_hits"]), total_hits)
+        # 有击球计数时按计数计算回传率，比样本均值更准确
+        hit_rate = successful_hits / total_hits * 100 if total_hits else self.mean("hit_rate")
+
+        return TrainingMetrics(
+            hit_rate=_clamp(hit_rate, 100),
+            reaction_time=_clamp(self.mean("reaction_time")),
+            accuracy=_clamp(self.mean("accuracy"), 100),
+            # 疲劳度取会话结束时的最新值
+            fatigue_level=_clamp(self.latest.get("fatigue_level"), 100),
+            calories_burned=max(self.cumulative["calories_burned"], 0),
+            total_hits=total_hits,
+            successful_hits=successful_hits
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "device_id": self.device_id,
+            "start_time": self.start_time,
+            "duration_seconds": int((datetime.utcnow() - self.start_time).total_seconds()),
+            "samples": self.samples,
+            "averages": {f: self.mean(f) for f in MEAN_FIELDS},
+            "maxima": dict(self.maxima),
+            "latest": dict(self.latest),
+            "totals": {f: self.cumulative[f] for f in CUMULATIVE_FIELDS},
+        }
+
+
+class LiveSessionService:
+    """进行中会话的进程内状态
+
+    会话开始时登记，设备 WebSocket 的 metrics 消息与 /training/metrics
+    上报的样本实时合并，结束时据此生成最终指标; 实时看板直接读取这里，
+    无需查询 InfluxDB。
+    """
+
+    _sessions: Dict[str, SessionAccumulator] = {}
+    # device_id -> 该设备当前的 session_id
+    _device_sessions: Dict[str, str] = {}
+    _last_purge = 0.0
+
+    @classmethod
+    def open(cls, session: TrainingSession) -> SessionAccumulator:
+        """登记新开始的会话"""
+        cls._purge_idle()
+        accumulator = SessionAccumulator(session.id, session.user_id, session.device_id, session.start_time)
+        cls._sessions[session.id] = accumulator
+        cls._device_sessions[session.device_id] = session.id
+        return accumulator
+
+    @classmethod
+    def get(cls, session_id: str) -> Optional[SessionAccumulator]:
+        return cls._sessions.get(session_id)
+
+    @classmethod
+    def session_for_device(cls, device_id: str) -> Optional[str]:
+        return cls._device_sessions.get(device_id)
+
+    @classmethod
+    def ingest(cls, session_id: str, sample: dict, user_id: Optional[str] = None) -> bool:
+        """合并样本; 指定 user_id 时只接受该用户自己的会话"""
+        accumulator = cls._sessions.get(session_id)
+        if accumulator is None or (user_id is not None and accumulator.user_id != user_id):
+            return False
+        accumulator.fold(sample)
+        return True
+
+    @classmethod
+    def ingest_device(cls, device_id: str, sample: dict) -> bool:
+        """按设备当前会话合并样本"""
+        session_id = cls._device_sessions.get(device_id)
+        if session_id is None or not isinstance(sample, dict):
+            return False
+        return cls.ingest(session_id, sample)
+
+    @classmethod
+    def close(cls, session_id: str) -> Optional[SessionAccumulator]:
+        accumulator = cls._sessions.pop(session_id, None)
+        if accumulator is not None and cls._device_sessions.get(accumulator.device_id) == session_id:
+            del cls._device_sessions[accumulator.device_id]
+        return accumulator
+
+    @classmethod
+    def _purge_idle(cls):
+        """清理长时间无数据、也未正常结束的会话"""
+        now = time.monotonic()
+        if now - cls._last_purge < 60:
+            return
+        cls._last_purge = now
+        deadline = now - settings.LIVE_SESSION_IDLE_TIMEOUT
+        for session_id in [s for s, acc in cls._sessions.items() if acc.updated_at < deadline]:
+            cls.close(session_id)
@@ -0,0 +1,271 @@
+"""训练计划批量生成
+
+按 _id 顺序把用户分成每批 PLAN_CHUNK_USERS 个，每批:
+
+1. 一次查询取出这批用户最近 PLAN_WINDOW_DAYS 天已完成的会话，按列装入 NumPy 数组
+2. core/planner.py 向量化计算全部用户的趋势、薄弱项与目标
+3. 以 user_id 为键 upsert 到 training_plans (bulk_write，无序)
+
+内存只与单批会话数有关。workers > 1 时各批分发到子进程 (spawn，各自建立
+数据库连接)，主进程只遍历用户 _id 并保留批次边界。内存后端的数据只在
+本进程内，始终在进程内执行。管理接口触发的生成在后台执行，进度与结果
+记录在 Redis 哈希 planjob:<任务 ID> 中 (保留 24 小时)。
+
+用法:
+    python -m app.services.plan_service --workers 4 --chunk-size 2000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from ..core.config import get_settings
+from ..core.database import Database
+from ..core.executors import executors
+from ..core.planner import (
+    FIELDS, FOCUS_TABLE, STARTER_FOCUS, STARTER_RECOMMENDATIONS, STARTER_TARGETS, PlanArrays, SessionBatch, compute
+)
+from ..models.training import TrainingPlan, TrainingStatus
+
+settings = get_settings()
+
+PLAN_NAME = "个性化训练计划"
+
+# 后台生成任务 (Redis 哈希，各副本都能查询结果)
+JOB_KEY = "planjob:{}"
+JOB_TTL = 24 * 3600
+
+
+class PlanService:
+    """训练计划"""
+
+    # 后台生成任务 (保持引用，避免任务被回收)
+    _tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _get_collection():
+        return Database.get_mongo()["training_plans"]
+
+    @classmethod
+    async def get_user_plan(cls, user_id: str) -> Optional[TrainingPlan]:
+        """获取预先生成的训练计划"""
+        plan = await cls._get_collection().find_one({"user_id": user_id})
+        if not plan:
+            return None
+        plan["_id"] = str(plan["_id"])
+        return TrainingPlan(**plan)
+
+    # --- 批量生成 ---
+
+    @staticmethod
+    async def _load_sessions(user_ids: List[str], since: datetime, now: datetime) -> SessionBatch:
+        """一次查询取出这批用户的会话，按列装入数组"""
+        index = {user_id: i for i, user_id in enumerate(user_ids)}
+        cursor = Database.get_mongo()["training_sessions"].find(
+            {"user_id": {"$in": user_ids}, "status": TrainingStatus.COMPLETED, "start_time": {"$gte": since}},
+            projection={"_id": 0, "user_id": 1, "start_time": 1, "duration_seconds": 1, "metrics": 1},
+        ).batch_size(10_000)
+
+        owners, ages, rows = [], [], []
+        metric_fields = FIELDS[:-1]
+        async for doc in cursor:
+            metrics = doc.get("metrics")
+            if not metrics:
+                continue
+            owners.append(index[doc["user_id"]])
+            ages.append((now - doc["start_time"]).total_seconds() / 86400)
+            rows.append([metrics.get(f, 0) or 0 for f in metric_fields] + [doc.get("duration_seconds") or 0])
+
+        return SessionBatch(
+            np.array(owners, dtype=np.int64),
+            np.array(ages, dtype=np.float64),
+            np.array(rows, dtype=np.float64).reshape(len(rows), len(FIELDS)),
+        )
+
+    @staticmethod
+    def _documents(user_ids: List[str], result: PlanArrays, now: datetime) -> List[dict]:
+        keys = list(STARTER_TARGETS)
+        integer = {"total_hits", "successful_hits"}
+        targets = result.targets.round(1).tolist()
+        docs = []
+        for i, user_id in enumerate(user_ids):
+            sessions = int(result.sessions[i])
+            if sessions:
+                focus, recommendations = FOCUS_TABLE[result.weakness_mask[i]]
+                hit, reaction, accuracy = result.trends[i]
+                description = (
+                    f"基于最近 {settings.PLAN_WINDOW_DAYS} 天 {sessions} 次训练: "
+                    f"回传率每周 {hit:+.1f}%，反应时间每周 {reaction:+.0f}ms，准确率每周 {accuracy:+.1f}%"
+                )
+            else:
+                focus, recommendations = STARTER_FOCUS, STARTER_RECOMMENDATIONS
+                description = "暂无训练记录，从入门计划开始"
+            docs.append({
+                "user_id": user_id,
+                "name": PLAN_NAME,
+                "description": description,
+                "target_metrics": {
+                    k: int(v) if k in integer else v for k, v in zip(keys, targets[i])
+                },
+                "weekly_sessions": int(result.weekly_sessions[i]),
+                "session_duration_minutes": int(result.duration_minutes[i]),
+                "focus_areas": list(focus),
+                "ai_recommendations": list(recommendations),
+                "created_at": now,
+            })
+        return docs
+
+    @classmethod
+    async def generate_range(cls, first_id: ObjectId, last_id: ObjectId, now: datetime) -> int:
+        """为 _id 在 [first_id, last_id] 内的用户生成计划，返回用户数"""
+        cursor = Database.get_mongo()["users"].find(
+            {"_id": {"$gte": first_id, "$lte": last_id}}, projection={"_id": 1}
+        )
+        user_ids = [str(u["_id"]) async for u in cursor]
+        if not user_ids:
+            return 0
+        batch = await cls._load_sessions(user_ids, now - timedelta(days=settings.PLAN_WINDOW_DAYS), now)
+        # 服务内 (管理接口) 经共享执行器的进程池计算；命令行工具与其子进程中直接计算
+        result = await executors.run("plan_compute", compute, batch, len(user_ids), settings.PLAN_HALF_LIFE_DAYS)
+        docs = cls._documents(user_ids, result, now)
+        await cls._get_collection().bulk_write(
+            [UpdateOne({"user_id": d["user_id"]}, {"$set": d}, upsert=True) for d in docs],
+            ordered=False,
+        )
+        return len(user_ids)
+
+    @staticmethod
+    async def _ranges(chunk_size: int):
+        """按 _id 顺序遍历用户，产出每批的 (首个 _id, 末个 _id)"""
+        cursor = Database.get_mongo()["users"].find({}, projection={"_id": 1}).sort("_id", 1).batch_size(chunk_size)
+        first = last = None
+        count = 0
+        async for user in cursor:
+            if first is None:
+                first = user["_id"]
+            last = user["_id"]
+            count += 1
+            if count == chunk_size:
+                yield first, last
+                first, count = None, 0
+        if first is not None:
+            yield first, last
+
+    @classmethod
+    async def generate_all(cls, workers: int = 0, chunk_size: Optional[int] = None) -> dict:
+        """为全部用户生成训练计划"""
+        chunk_size = chunk_size or settings.PLAN_CHUNK_USERS
+        if settings.STORAGE_BACKEND == "memory":
+            workers = 0
+        started_at = time.perf_counter()
+        now = datetime.utcnow()
+        await cls._get_collection().create_index("user_id", unique=True)
+
+        users = chunks = 0
+        if workers <= 1:
+            async for first, last in cls._ranges(chunk_size):
+                users += await cls.generate_range(first, last, now)
+                chunks += 1
+        else:
+            loop = asyncio.get_running_loop()
+            # 在途批次有上限，主进程不会积压批次边界
+            limit = asyncio.Semaphore(workers * 2)
+            pending = set()
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_worker_init) as pool:
+                async for first, last in cls._ranges(chunk_size):
+                    await limit.acquire()
+                    future = loop.run_in_executor(pool, _worker_generate, first, last, now)
+                    future.add_done_callback(lambda _: limit.release())
+                    pending.add(future)
+                    chunks += 1
+                users = sum(await asyncio.gather(*pending))
+
+        return {
+            "users": users,
+            "chunks": chunks,
+            "workers": workers,
+            "seconds": round(time.perf_counter() - started_at, 2),
+        }
+
+    @classmethod
+    async def start_generate(cls, chunk_size: Optional[int] = None) -> dict:
+        """登记生成任务并在后台执行 generate_all，立即返回任务信息 (结果用 get_job 查询)"""
+        job_id = uuid.uuid4().hex
+        key = JOB_KEY.format(job_id)
+        redis = Database.get_redis()
+        await redis.hset(key, mapping={"status": "running", "created_at": time.time()})
+        await redis.expire(key, JOB_TTL)
+
+        async def run():
+            try:
+                fields = {"status": "completed", "result": json.dumps(await cls.generate_all(chunk_size=chunk_size))}
+            except Exception as e:
+                print(f"[PLAN] 训练计划生成失败 {job_id}: {e}")
+                fields = {"status": "failed", "error": str(e)}
+            try:
+                await redis.hset(key, mapping=fields)
+            except Exception as e:
+                print(f"[PLAN] 生成任务状态写入失败 {job_id}: {e}")
+
+        task = asyncio.create_task(run())
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+        return {"job_id": job_id, "status": "running"}
+
+    @classmethod
+    async def get_job(cls, job_id: str) -> Optional[dict]:
+        """生成任务的状态与结果，任务不存在或已过期时返回 None"""
+        fields = await Database.get_redis().hgetall(JOB_KEY.format(job_id))
+        if not fields:
+            return None
+        return {
+            "job_id": job_id,
+            "status": fields["status"],
+            "result": json.loads(fields["result"]) if "result" in fields else None,
+            "error": fields.get("error"),
+        }
+
+
+# --- 子进程 (spawn 启动，各自持有事件循环与数据库连接) ---
+
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _worker_init():
+    global _worker_loop
+    _worker_loop = asyncio.new_event_loop()
+    _worker_loop.run_until_complete(Database.connect())
+
+
+def _worker_generate(first_id: ObjectId, last_id: ObjectId, now: datetime) -> int:
+    return _worker_loop.run_until_complete(PlanService.generate_range(first_id, last_id, now))
+
+
+async def _run(workers: int, chunk_size: int):
+    await Database.connect()
+    try:
+        print(await PlanService.generate_all(workers, chunk_size))
+    finally:
+        await Database.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成训练计划")
+    parser.add_argument("--workers", type=int, default=settings.PLAN_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=settings.PLAN_CHUNK_USERS)
+    args = parser.parse_args()
+    asyncio.run(_run(args.workers, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
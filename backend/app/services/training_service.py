@@ -2,13 +2,20 @@ from typing import Optional, List
 from datetime import datetime, timedelta
 from bson import ObjectId
 from influxdb_client import Point
+from pymongo import ReturnDocument
 
 from ..core.database import Database
 from ..core.config import get_settings
+from ..core.recorder import recorder
+from ..core.data_version import DataVersions
+from .archive_service import ArchiveService
+from .history_service import HistoryService
+from .leaderboard_service import LeaderboardService
 from ..models.training import (
     TrainingSession, TrainingMetrics, PoseData,
     TrainingStatus, AIAnalysis, TrainingPlan
 )
+from .live_session_service import LiveSessionService
 
 settings = get_settings()
 
@@ -39,40 +46,79 @@ class TrainingService:
 
         result = await collection.insert_one(session.model_dump(exclude={"id"}))
         session.id = str(result.inserted_id)
+        LiveSessionService.open(session)
+        await DataVersions.bump(user_id)
 
         return session
 
     @classmethod
-    async def end_session(cls, session_id: str, metrics: TrainingMetrics) -> TrainingSession:
-        """结束训练会话"""
+    async def end_session(
+        cls, session_id: str, metrics: Optional[TrainingMetrics] = None
+    ) -> TrainingSession:
+        """结束训练会话
+
+        优先使用服务端实时累计的指标; 本进程没有收到该会话的实时样本时
+        (如设备只在结束时上报) 才使用客户端提交的指标。两者都没有时 (会话
+        在其他 worker 或重启前开始，且客户端未提交指标) 沿用会话已保存的
+        指标，仍没有则指标为空，不计入排行榜。
+
+        只有进行中的会话会被结束; 重复结束 (客户端重试、多个 worker 同时
+        处理) 直接返回已结束的会话，不重复计入排行榜。实时累加器在数据库
+        更新成功后才关闭，更新失败时可以重试。
+        """
         collection = cls._get_collection()
-        end_time = datetime.utcnow()
-
-        session = await collection.find_one({"_id": ObjectId(session_id)})
-        if not session:
+        if not ObjectId.is_valid(session_id):
             raise ValueError("训练会话不存在")
+        end_time = datetime.utcnow()
 
-        start_time = session["start_time"]
-        duration = int((end_time - start_time).total_seconds())
+        live = LiveSessionService.get(session_id)
+        if live is not None and (live.samples or metrics is None):
+            metrics = live.to_metrics()
 
-        await collection.update_one(
-            {"_id": ObjectId(session_id)},
-            {
-                "$set": {
-                    "status": TrainingStatus.COMPLETED,
-                    "end_time": end_time,
-                    "duration_seconds": duration,
-                    "metrics": metrics.model_dump()
-                }
-            }
+        fields = {
+            "status": TrainingStatus.COMPLETED,
+            "end_time": end_time,
+            "duration_seconds": {
+                "$toInt": {"$divide": [{"$subtract": [end_time, "$start_time"]}, 1000]}
+            },
+        }
+        if metrics is not None:
+            fields["metrics"] = {"$literal": metrics.model_dump()}
+
+        # 单次往返: 用更新管道在服务端计算时长并返回更新后的文档
+        session = await collection.find_one_and_update(
+            {"_id": ObjectId(session_id), "status": TrainingStatus.ACTIVE},
+            [{"$set": fields}],
+            return_document=ReturnDocument.AFTER
         )
+        if not session:
+            session = await collection.find_one({"_id": ObjectId(session_id)})
+            if not session or session.get("status") != TrainingStatus.COMPLETED:
+                raise ValueError("训练会话不存在或未在进行中")
+            LiveSessionService.close(session_id)
+            recorder.close_session(session_id)
+            session["_id"] = str(session["_id"])
+            return TrainingSession(**session)
+        LiveSessionService.close(session_id)
+        recorder.close_session(session_id)
+        await DataVersions.bump(session.get("user_id"))
 
         session["_id"] = str(session["_id"])
-        session["status"] = TrainingStatus.COMPLETED
-        session["end_time"] = end_time
-        session["duration_seconds"] = duration
-        session["metrics"] = metrics
+        ended = TrainingSession(**session)
+        HistoryService.summarize_session(ended)
+        ArchiveService.schedule(ended)
+        await LeaderboardService.record(ended)
+        return ended
 
+    @classmethod
+    async def get_user_session(cls, user_id: str, session_id: str) -> Optional[TrainingSession]:
+        """获取属于该用户的训练会话"""
+        if not ObjectId.is_valid(session_id):
+            return None
+        session = await cls._get_collection().find_one({"_id": ObjectId(session_id), "user_id": user_id})
+        if not session:
+            return None
+        session["_id"] = str(session["_id"])
         return TrainingSession(**session)
 
     @classmethod
@@ -100,6 +146,8 @@ class TrainingService:
     @classmethod
     async def save_realtime_metrics(cls, user_id: str, session_id: str, metrics: dict):
         """保存实时指标到InfluxDB"""
+        LiveSessionService.ingest(session_id, metrics, user_id)
+
         write_api = Database.get_influx_write_api()
 
         point = (
@@ -0,0 +1,93 @@
+"""会话归档基准 - 写入速度与跨会话扫描 (关节角度) 的吞吐
+
+写出 --sessions 个各 --frames 帧的会话到临时目录 (按 --users 个用户、3 个月
+分区)，然后:
+    rows   按 Influx 查询结果的形式 (每帧一个字典) 逐会话转换为数组再计算，
+           作为现有逐行路径的参照 (不含网络与 Flux 执行)
+    mmap   core/archive.py 内存映射扫描
+两者计算同一个关节角度分布。
+
+用法:
+    python -m benchmarks.archive --sessions 200 --frames 3000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from .common import print_table
+
+from app.core import archive  # noqa: E402
+from app.services.archive_service import POSE_FIELDS, _to_arrays  # noqa: E402
+
+MONTHS = ("2026-07", "2026-08", "2026-09")
+
+
+def synthetic_session(rng: np.random.Generator, frames: int):
+    t = np.arange(frames) / 30
+    base = rng.random((17, 4), dtype=np.float32)
+    sway = (np.sin(t * 2)[:, None, None] * 0.02).astype(np.float32)
+    poses = base[None] + sway
+    times = (1_780_000_000 + t).astype(np.float64) * 1e9
+    return times.astype(np.int64), poses, np.full(frames, 0.9, np.float32)
+
+
+def run(sessions: int, frames: int, users: int, seed: int) -> list:
+    if not archive.available():
+        raise SystemExit("需要安装 pyarrow")
+    rng = np.random.default_rng(seed)
+    root = tempfile.mkdtemp(prefix="archive-bench-")
+    rows_per_session = []
+    try:
+        started_at = time.perf_counter()
+        for i in range(sessions):
+            times, poses, confidence = synthetic_session(rng, frames)
+            meta = {"session_id": f"s{i:06d}", "user_id": f"u{i % users:04d}", "month": MONTHS[i % 3],
+                    "metrics": {"hit_rate": float(rng.uniform(40, 95))}}
+            archive.write_session(root, meta, times, poses, confidence)
+            if len(rows_per_session) < 10:
+                flat = poses.reshape(frames, -1).tolist()
+                rows_per_session.append([{"time": t / 1e9, "confidence": 0.9, **dict(zip(POSE_FIELDS, row))}
+                                         for t, row in zip(times.tolist(), flat)])
+        write_s = time.perf_counter() - started_at
+        size = sum(os.path.getsize(p) for p in archive.session_files(root))
+
+        # 逐行参照: 只测前 10 个会话，按会话数外推
+        started_at = time.perf_counter()
+        for rows in rows_per_session:
+            _, poses, _ = _to_arrays(rows)
+            archive.joint_angles(poses, 5, 7, 9)
+        rows_s = (time.perf_counter() - started_at) * sessions / len(rows_per_session)
+
+        started_at = time.perf_counter()
+        result = archive.stats(root, None, None, None, (5, 7, 9))
+        mmap_s = time.perf_counter() - started_at
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    total_frames = sessions * frames
+    return [
+        {"case": "write", "seconds": round(write_s, 2), "frames_per_sec": round(total_frames / write_s),
+         "mb": round(size / 1e6, 1)},
+        {"case": "scan/rows (est)", "seconds": round(rows_s, 2), "frames_per_sec": round(total_frames / rows_s),
+         "mb": ""},
+        {"case": "scan/mmap", "seconds": round(mmap_s, 2), "frames_per_sec": round(total_frames / mmap_s),
+         "mb": result["mb"]},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话归档基准")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print_table(run(args.sessions, args.frames, args.users, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""基准测试公共工具"""
+import os
+import time
+from typing import Awaitable, Callable, List
+
+
+def use_memory_backend():
+    """在导入 app 之前调用，使 Database 使用内存存储后端"""
+    os.environ["STORAGE_BACKEND"] = "memory"
+
+
+def summarize(name: str, durations: List[float]) -> dict:
+    durations = sorted(durations)
+    n = len(durations)
+    total = sum(durations)
+    return {
+        "name": name,
+        "runs": n,
+        "ops_per_sec": round(n / total, 1) if total else 0,
+        "p50_us": round(durations[n // 2] * 1e6, 1),
+        "p99_us": round(durations[min(int(n * 0.99), n - 1)] * 1e6, 1),
+    }
+
+
+def bench(name: str, fn: Callable[[], object], runs: int) -> dict:
+    durations = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started_at)
+    return summarize(name, durations)
+
+
+async def bench_async(name: str, fn: Callable[[], Awaitable[object]], runs: int) -> dict:
+    durations = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        await fn()
+        durations.append(time.perf_counter() - started_at)
+    return summarize(name, durations)
+
+
+def print_table(rows: List[dict]):
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
@@ -0,0 +1,103 @@
+"""共享执行器基准 - CPU 任务对事件循环的阻塞，以及大数组参数的传递开销
+
+两部分:
+    loop_lag   并发执行 --tasks 个 CPU 任务时，每 10ms 的心跳任务观测到的最大延迟
+               (inline 为直接在事件循环中执行，pool 为经进程池执行)
+    transfer   把 (frames, 17, 3) 的姿态数组交给子进程求和: 共享内存 vs pickle
+
+loop_lag 需要至少 2 个 CPU 核: 单核时子进程与事件循环争用同一个核，
+进程池无法降低延迟。
+
+用法:
+    python -m benchmarks.executors --tasks 8 --frames 200000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from .common import print_table, use_memory_backend
+
+use_memory_backend()
+os.environ.setdefault("EXECUTOR_CPU_QUEUE", "1024")
+
+from app.core import executors as executors_module  # noqa: E402
+from app.core.executors import TASK_ROUTES, executors  # noqa: E402
+
+TASK_ROUTES.setdefault("bench", "cpu")
+
+
+def pose_work(frames: np.ndarray) -> float:
+    """模拟姿态分析: 逐帧关节角度统计"""
+    a, b, c = frames[:, 5], frames[:, 7], frames[:, 9]
+    u, v = a - b, c - b
+    cos = (u * v).sum(axis=1) / (np.linalg.norm(u, axis=1) * np.linalg.norm(v, axis=1) + 1e-9)
+    return float(np.degrees(np.arccos(np.clip(cos, -1, 1))).mean())
+
+
+async def _lag_probe(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - started - 0.01)
+    return worst
+
+
+async def loop_lag(mode: str, tasks: int, frames: np.ndarray) -> dict:
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_lag_probe(stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    if mode == "inline":
+        for _ in range(tasks):
+            pose_work(frames)
+            await asyncio.sleep(0)
+    else:
+        await asyncio.gather(*(executors.run("bench", pose_work, frames) for _ in range(tasks)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return {"case": f"loop_lag/{mode}", "tasks": tasks, "total_ms": round(elapsed * 1000, 1),
+            "max_loop_lag_ms": round(await probe * 1000, 1)}
+
+
+async def transfer(mode: str, runs: int, frames: np.ndarray) -> dict:
+    # 调整阈值切换共享内存与 pickle
+    executors_module.settings.EXECUTOR_SHM_MIN_BYTES = 64 * 1024 if mode == "shm" else 1 << 62
+    started = time.perf_counter()
+    for _ in range(runs):
+        await executors.run("bench", np.sum, frames)
+    elapsed = time.perf_counter() - started
+    return {"case": f"transfer/{mode}", "tasks": runs, "total_ms": round(elapsed * 1000, 1),
+            "max_loop_lag_ms": "", "mb": round(frames.nbytes / 1e6, 1)}
+
+
+async def run(tasks: int, frame_count: int):
+    frames = np.random.default_rng(7).random((frame_count, 17, 3))
+    executors.start()
+    try:
+        # 等子进程启动完成
+        await asyncio.gather(*(executors.run("bench", os.getpid) for _ in range(4)))
+        rows = [
+            await loop_lag("inline", tasks, frames),
+            await loop_lag("pool", tasks, frames),
+            await transfer("pickle", 20, frames),
+            await transfer("shm", 20, frames),
+        ]
+    finally:
+        await executors.stop()
+    print_table(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享执行器基准")
+    parser.add_argument("--tasks", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.tasks, args.frames))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""HTTP 响应压缩基准 - 各类响应在不同编码/级别下节省的字节与 CPU 开销
+
+载荷:
+    sessions      /training/sessions?limit=N 的 JSON
+    overview      /dashboard/overview 的 JSON (含设备列表)
+    replay_pose   会话回放 (kind=pose) 的 multipart 流
+    replay_all    会话回放 (kind=all，JPEG 帧与姿态交错)
+
+用法:
+    python -m benchmarks.http_compression --sessions 500 --runs 50
+"""
+import argparse
+import base64
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from .common import print_table
+
+from app.core.compression import brotli, compress_body  # noqa: E402
+from app.loadtest import synthetic_jpeg, synthetic_keypoints  # noqa: E402
+
+
+def build_sessions(count: int, rng: random.Random) -> bytes:
+    now = datetime(2024, 1, 1)
+    sessions = []
+    for i in range(count):
+        start = now - timedelta(hours=i * 7)
+        sessions.append({
+            "_id": f"{rng.getrandbits(96):024x}", "user_id": "65a0c0ffee0000000000beef",
+            "device_id": "OP-001", "start_time": start.isoformat(),
+            "end_time": (start + timedelta(seconds=1800)).isoformat(), "duration_seconds": 1800,
+            "training_mode": rng.choice(["standard", "intensive", "recovery"]), "status": "completed",
+            "metrics": {"hit_rate": rng.uniform(50, 95), "reaction_time": rng.uniform(250, 500),
+                        "accuracy": rng.uniform(60, 95), "fatigue_level": rng.uniform(10, 70),
+                        "calories_burned": rng.uniform(200, 600), "total_hits": rng.randint(100, 300),
+                        "successful_hits": rng.randint(60, 200)},
+        })
+    return json.dumps({"code": 0, "message": "success", "data": sessions}, ensure_ascii=False).encode()
+
+
+def build_overview(devices: int, rng: random.Random) -> bytes:
+    return json.dumps({
+        "user": {"username": "demo1", "full_name": "张三"},
+        "devices": [{
+            "device_id": f"OP-{i:03d}", "name": f"训练机{i}号", "type": "orange_pi", "status": "online",
+            "ip_address": f"192.168.1.{100 + i}", "firmware_version": "1.2.0",
+            "config": {"ball_speed": 50 + i, "ball_frequency": 2.0, "spin_type": "none",
+                       "angle_horizontal": 0, "angle_vertical": 15},
+        } for i in range(devices)],
+        "today": {"sessions": 3, "duration": 5400, "hit_rate": rng.uniform(50, 95)},
+    }, ensure_ascii=False).encode()
+
+
+def build_replay(frames: int, frame_bytes: int, include_jpeg: bool, rng: random.Random) -> bytes:
+    boundary = "0123456789abcdef0123456789abcdef"
+    out = bytearray()
+    for i in range(frames):
+        parts = [("application/json", json.dumps({"keypoints": synthetic_keypoints(i / 30, 0.3),
+                                                  "confidence": 0.9}).encode())]
+        if include_jpeg:
+            parts.append(("image/jpeg", base64.b64decode(synthetic_jpeg(frame_bytes, rng))))
+        for content_type, payload in parts:
+            out += (f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\nX-Timestamp: {i * 33}\r\n\r\n").encode()
+            out += payload + b"\r\n"
+    out += f"--{boundary}--\r\n".encode()
+    return bytes(out)
+
+
+def strategies():
+    yield "gzip", 1
+    yield "gzip", 6
+    yield "gzip", 9
+    if brotli is not None:
+        yield "br", 1
+        yield "br", 4
+        yield "br", 9
+
+
+def run(name: str, body: bytes, encoding: str, level: int, runs: int) -> dict:
+    started_at = time.process_time()
+    for _ in range(runs):
+        compressed = compress_body(encoding, level, body)
+    cpu = (time.process_time() - started_at) / runs
+    return {
+        "payload": name,
+        "encoding": f"{encoding}-{level}",
+        "raw_kb": round(len(body) / 1024, 1),
+        "wire_kb": round(len(compressed) / 1024, 1),
+        "saved_pct": round((1 - len(compressed) / len(body)) * 100, 1),
+        "cpu_ms": round(cpu * 1000, 3),
+        "saved_kb_per_cpu_ms": round((len(body) - len(compressed)) / 1024 / (cpu * 1000), 1) if cpu else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP 响应压缩基准")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--frame-bytes", type=int, default=30_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = {
+        "sessions": build_sessions(args.sessions, rng),
+        "overview": build_overview(args.devices, rng),
+        "replay_pose": build_replay(args.frames, args.frame_bytes, False, rng),
+        "replay_all": build_replay(args.frames // 10, args.frame_bytes, True, rng),
+    }
+    rows = []
+    for name, body in payloads.items():
+        for encoding, level in strategies():
+            rows.append(run(name, body, encoding, level, args.runs))
+    if brotli is None:
+        print("(未安装 brotli，仅测试 gzip)")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
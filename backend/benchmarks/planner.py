@@ -0,0 +1,67 @@
+"""训练计划批量计算基准 - 向量化计算每批用户的耗时与峰值内存
+
+只测 core/planner.py 的计算部分 (不含 Mongo 读写)，按 --users 模拟
+全部用户、每批 --chunk-size 个，每用户在窗口内约 --sessions 次训练。
+
+用法:
+    python -m benchmarks.planner --users 1000000 --chunk-size 2000 --sessions 40
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from .common import print_table
+
+from app.core.planner import FIELDS, SessionBatch, compute  # noqa: E402
+
+
+def synthetic_batch(users: int, sessions: int, rng: np.random.Generator) -> SessionBatch:
+    counts = rng.poisson(sessions, users)
+    idx = np.repeat(np.arange(users), counts)
+    k = len(idx)
+    values = np.column_stack([
+        rng.uniform(40, 95, k), rng.uniform(250, 600, k), rng.uniform(55, 95, k), rng.uniform(10, 80, k),
+        rng.uniform(100, 500, k), rng.integers(100, 300, k), rng.integers(60, 200, k), rng.integers(1200, 3600, k),
+    ]).astype(np.float64)
+    assert values.shape[1] == len(FIELDS)
+    return SessionBatch(idx, rng.uniform(0, 90, k), values)
+
+
+def run(users: int, chunk_size: int, sessions: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    batch = synthetic_batch(chunk_size, sessions, rng)
+    chunks = -(-users // chunk_size)
+
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    compute(batch, chunk_size)
+    elapsed = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "chunk_users": chunk_size,
+        "chunk_sessions": len(batch.user_index),
+        "chunk_ms": round(elapsed * 1000, 1),
+        "peak_mb": round(peak / 1e6, 1),
+        "users_per_sec": round(chunk_size / elapsed),
+        "est_total_s": round(elapsed * chunks, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练计划批量计算基准")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = [run(args.users, size, args.sessions, args.seed) for size in sorted({500, args.chunk_size, 10_000})]
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
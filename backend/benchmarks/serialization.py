@@ -0,0 +1,116 @@
+"""响应序列化基准 - ResponseBase[List[...]] 列表响应在各序列化路径下的 CPU 开销
+
+路径:
+    fastapi       FastAPI 默认: 按 response_model 校验 + 转 Python 对象 + JSONResponse
+    fast_class    同上，但用 FastJSONResponse 编码 (已安装 orjson 时更快)
+    trusted       trusted_output: model_dump_json 一次生成 JSON，不再校验
+
+用法:
+    python -m benchmarks.serialization --sizes 50,500,5000 --runs 20
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from starlette.responses import JSONResponse
+
+from .common import print_table
+
+from app.core.responses import FastJSONResponse, RawJSON, orjson  # noqa: E402
+from app.models.device import Device, DeviceStatus, DeviceType  # noqa: E402
+from app.models.training import TrainingMetrics, TrainingSession, TrainingStatus  # noqa: E402
+from app.schemas.response import ResponseBase  # noqa: E402
+
+
+def build_sessions(count: int, rng: random.Random) -> List[TrainingSession]:
+    now = datetime(2024, 1, 1)
+    sessions = []
+    for i in range(count):
+        start = now - timedelta(hours=i * 7)
+        total_hits = rng.randint(100, 300)
+        sessions.append(TrainingSession(
+            _id=f"{rng.getrandbits(96):024x}", user_id="bench-user", device_id="OP-001",
+            start_time=start, end_time=start + timedelta(seconds=1800), duration_seconds=1800,
+            status=TrainingStatus.COMPLETED,
+            metrics=TrainingMetrics(
+                hit_rate=rng.uniform(50, 95), reaction_time=rng.uniform(250, 500),
+                accuracy=rng.uniform(60, 95), fatigue_level=rng.uniform(10, 70),
+                calories_burned=rng.uniform(100, 500), total_hits=total_hits,
+                successful_hits=rng.randint(0, total_hits),
+            ),
+        ))
+    return sessions
+
+
+def build_devices(count: int, rng: random.Random) -> List[Device]:
+    return [
+        Device(_id=f"{rng.getrandbits(96):024x}", device_id=f"OP-{i:05d}", name=f"训练机{i}号",
+               type=DeviceType.ORANGE_PI, status=rng.choice(list(DeviceStatus)),
+               owner_id="bench-user", last_heartbeat=datetime(2024, 1, 1))
+        for i in range(count)
+    ]
+
+
+async def default_path(field, content, response_class) -> bytes:
+    value = await serialize_response(field=field, response_content=content)
+    return response_class(value).body
+
+
+async def trusted_path(field, content, response_class) -> bytes:
+    value = await serialize_response(
+        field=None, response_content=RawJSON(content.model_dump_json(by_alias=True))
+    )
+    return response_class(value).body
+
+
+PATHS = {
+    "fastapi": (default_path, JSONResponse),
+    "fast_class": (default_path, FastJSONResponse),
+    "trusted": (trusted_path, FastJSONResponse),
+}
+
+
+async def run(name: str, model, items: list, runs: int) -> List[dict]:
+    field = create_response_field(name="response", type_=ResponseBase[List[model]])
+    content = ResponseBase(data=items)
+    rows = []
+    baseline = None
+    for path, (serialize, response_class) in PATHS.items():
+        body = await serialize(field, content, response_class)
+        started_at = time.process_time()
+        for _ in range(runs):
+            await serialize(field, content, response_class)
+        cpu = (time.process_time() - started_at) / runs
+        baseline = baseline or cpu
+        rows.append({
+            "payload": f"{name} x{len(items)}",
+            "path": path,
+            "cpu_ms": round(cpu * 1000, 3),
+            "us_per_item": round(cpu / len(items) * 1e6, 2),
+            "speedup": round(baseline / cpu, 2) if cpu else 0,
+            "kb": round(len(body) / 1024, 1),
+        })
+    return rows
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows += await run("sessions", TrainingSession, build_sessions(size, rng), args.runs)
+        rows += await run("devices", Device, build_devices(size, rng), args.runs)
+    print(f"[BENCH] orjson: {'已安装' if orjson is not None else '未安装 (标准库 json)'}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="响应序列化基准")
+    parser.add_argument("--sizes", default="50,500,5000")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
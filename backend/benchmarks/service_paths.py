@@ -0,0 +1,85 @@
+"""服务层基准测试 - 在内存存储后端上运行真实的 TrainingService / DeviceService
+
+用法:
+    python -m benchmarks.service_paths --users 20 --sessions 200 --runs 200
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime
+
+from .common import use_memory_backend, bench_async, print_table
+
+use_memory_backend()
+
+from app.core.database import Database  # noqa: E402
+from app.models.device import Device, DeviceType, DeviceHeartbeat  # noqa: E402
+from app.models.training import TrainingMetrics  # noqa: E402
+from app.services.device_service import DeviceService  # noqa: E402
+from app.services.training_service import TrainingService  # noqa: E402
+
+
+def random_metrics(rng: random.Random) -> TrainingMetrics:
+    total_hits = rng.randint(100, 300)
+    return TrainingMetrics(
+        hit_rate=rng.uniform(50, 95), reaction_time=rng.uniform(250, 500),
+        accuracy=rng.uniform(60, 95), fatigue_level=rng.uniform(10, 70),
+        calories_burned=rng.uniform(100, 500), total_hits=total_hits,
+        successful_hits=rng.randint(0, total_hits),
+    )
+
+
+async def seed(users: int, sessions: int, rng: random.Random):
+    for u in range(users):
+        user_id = f"bench-user-{u:04d}"
+        device_id = f"bench-dev-{u:04d}"
+        await DeviceService.register_device(Device(
+            device_id=device_id, name=device_id, type=DeviceType.ORANGE_PI, owner_id=user_id
+        ))
+        for _ in range(sessions):
+            session = await TrainingService.start_session(user_id, device_id, rng.choice(["standard", "intensive"]))
+            await TrainingService.end_session(session.id, random_metrics(rng))
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    await Database.connect()
+    await seed(args.users, args.sessions, rng)
+
+    def any_user() -> str:
+        return f"bench-user-{rng.randrange(args.users):04d}"
+
+    async def start_and_end():
+        session = await TrainingService.start_session(any_user(), "bench-dev-0000")
+        await TrainingService.end_session(session.id, random_metrics(rng))
+
+    async def heartbeat():
+        await DeviceService.heartbeat(DeviceHeartbeat(
+            device_id=f"bench-dev-{rng.randrange(args.users):04d}", timestamp=datetime.utcnow(),
+            cpu_usage=40, memory_usage=50, temperature=55, network_latency=20,
+        ))
+
+    rows = [
+        await bench_async("start+end_session", start_and_end, args.runs),
+        await bench_async("get_user_sessions", lambda: TrainingService.get_user_sessions(any_user()), args.runs),
+        await bench_async("get_session_stats", lambda: TrainingService.get_session_stats(any_user(), 30), args.runs),
+        await bench_async("get_trend_data", lambda: TrainingService.get_trend_data(any_user(), 30), args.runs),
+        await bench_async("get_user_devices", lambda: DeviceService.get_user_devices(any_user()), args.runs),
+        await bench_async("device heartbeat", heartbeat, args.runs),
+    ]
+    print(f"[BENCH] {args.users} 用户 x {args.sessions} 会话 (内存后端)")
+    print_table(rows)
+    await Database.disconnect()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="服务层基准测试 (内存存储后端)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=100, help="每个用户预置的会话数")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,116 @@
+"""WebSocket 压缩基准 - 各消息类型在不同压缩策略下的线上字节数与 CPU 开销
+
+策略:
+    none          不压缩
+    deflate       每条消息独立压缩 (相当于 permessage-deflate 不复用上下文)
+    takeover      连接内复用压缩上下文 (permessage-deflate 默认行为)
+    app           应用层压缩: 预置字典 + 上下文复用 (app.core.ws_compression)
+
+用法:
+    python -m benchmarks.ws_compression --messages 2000 --frame-bytes 30000
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+
+from .common import print_table
+
+from app.core.ws_compression import MessageDeflater, MessageInflater  # noqa: E402
+from app.loadtest import synthetic_jpeg, synthetic_keypoints  # noqa: E402
+
+
+def build_messages(kind: str, count: int, frame_bytes: int, rng: random.Random) -> list:
+    messages = []
+    for i in range(count):
+        t = i / 30
+        if kind == "video_frame":
+            message = {
+                "type": "video_frame", "device_id": "bench-dev-0001",
+                "frame": synthetic_jpeg(frame_bytes, rng), "pose": None,
+                "metrics": {"accuracy": 80.0}, "timestamp": 1_700_000_000_000 + i * 33,
+            }
+        elif kind == "pose_update":
+            message = {
+                "type": "pose_update", "device_id": "bench-dev-0001",
+                "data": {"keypoints": synthetic_keypoints(t, 0.3), "confidence": 0.9,
+                         "sent_at": 1_700_000_000_000 + i * 33},
+            }
+        else:
+            message = {
+                "type": "metrics_update", "device_id": "bench-dev-0001",
+                "data": {"hit_rate": rng.uniform(50, 95), "reaction_time": rng.uniform(250, 500),
+                         "accuracy": rng.uniform(60, 95), "fatigue_level": rng.uniform(10, 70)},
+            }
+        messages.append(json.dumps(message, separators=(",", ":")))
+    return messages
+
+
+def _independent(text: str) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(text.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)[:-4]
+
+
+def _takeover():
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+
+    def compress(text: str) -> bytes:
+        return (compressor.compress(text.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+    return compress
+
+
+def _app():
+    return MessageDeflater().compress
+
+
+STRATEGIES = {
+    "none": lambda: str.encode,
+    "deflate": lambda: _independent,
+    "takeover": _takeover,
+    "app": _app,
+}
+
+
+def run(kind: str, strategy: str, messages: list) -> dict:
+    compress = STRATEGIES[strategy]()
+    raw = sum(len(m) for m in messages)
+    started_at = time.process_time()
+    wire = sum(len(compress(m)) for m in messages)
+    cpu = time.process_time() - started_at
+    return {
+        "type": kind,
+        "strategy": strategy,
+        "bytes_per_msg": round(wire / len(messages), 1),
+        "ratio": round(raw / wire, 2),
+        "cpu_us_per_msg": round(cpu / len(messages) * 1e6, 2),
+    }
+
+
+def verify(messages: list):
+    """应用层压缩可被参考解码器逐条还原"""
+    deflater, inflater = MessageDeflater(), MessageInflater()
+    for text in messages:
+        assert inflater.decompress(deflater.compress(text)) == text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket 压缩基准")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--frame-bytes", type=int, default=30_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = []
+    for kind in ("video_frame", "pose_update", "metrics_update"):
+        count = max(args.messages // 20, 10) if kind == "video_frame" else args.messages
+        messages = build_messages(kind, count, args.frame_bytes, rng)
+        verify(messages)
+        for strategy in STRATEGIES:
+            rows.append(run(kind, strategy, messages))
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()